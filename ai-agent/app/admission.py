@@ -0,0 +1,174 @@
+"""
+Admission control for LLM and upstream-service work
+Each pool bounds how much work runs at once and how much may queue behind it.
+When a pool is saturated, callers either degrade (skip the LLM and use the
+rule-based path) or fail fast with Overloaded, which the API turns into
+503 + Retry-After. Routes that need neither pool (checklists, suggestions)
+never wait on them, so they stay fast during an LLM brownout. Cheap upstream
+routes (booking lookups, weather) have their own "priority" pool, so a burst
+of searches filling "upstream" cannot queue them.
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+# pool -> (max in flight, max queued, seconds a queued request may wait)
+POOL_DEFAULTS = {
+    "llm": (16, 32, 5.0),
+    "upstream": (64, 128, 2.0),
+    "priority": (16, 32, 2.0),
+}
+
+REJECTED_TOTAL = metrics.counter(
+    "admission_rejected_total", "Requests refused by admission control"
+)
+DEGRADED_TOTAL = metrics.counter(
+    "admission_degraded_total", "Requests that skipped a saturated pool and used a fallback path"
+)
+
+
+class Overloaded(Exception):
+    """Raised when a pool cannot admit more work; retry_after is in seconds"""
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"{pool} pool overloaded, retry after {retry_after}s")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class AdmissionPool:
+    """Concurrency limit with a bounded, time-limited wait queue"""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        # Moving average of how long admitted work holds a slot
+        self.avg_seconds = 1.0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    def pending(self) -> int:
+        """Work admitted plus work already waiting for a slot"""
+        return self.in_flight + self.waiting
+
+    def saturated(self) -> bool:
+        return self.pending() >= self.max_in_flight
+
+    def retry_after(self) -> int:
+        """Rough time until the queue ahead of a new request drains"""
+        backlog = (self.waiting + 1) / self.max_in_flight
+        return max(1, math.ceil(backlog * self.avg_seconds))
+
+    def _reject(self, reason: str) -> Overloaded:
+        REJECTED_TOTAL.inc(pool=self.name, reason=reason)
+        return Overloaded(self.name, self.retry_after())
+
+    async def _acquire(self, degrade: bool) -> None:
+        if self.saturated():
+            if degrade:
+                DEGRADED_TOTAL.inc(pool=self.name)
+                raise Overloaded(self.name, self.retry_after())
+            if self.pending() >= self.max_in_flight + self.max_queue:
+                raise self._reject("queue_full")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("queue_timeout")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def _release(self, started: float) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+        self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def slot(self, degrade: bool = False):
+        """
+        Hold one slot for the duration of the block. With degrade=True the caller
+        has a cheaper alternative, so a saturated pool raises at once instead of
+        queueing.
+        """
+        await self._acquire(degrade)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(started)
+
+    async def run_in_thread(self, func: Callable[..., Any], *args: Any, degrade: bool = False) -> Any:
+        """
+        func(*args) in a worker thread, holding a slot until the thread returns.
+        A thread cannot be interrupted: cancelling the caller abandons the call,
+        which keeps running (and, for the LLM, keeps being billed). The slot is
+        released when the thread really finishes, not when the caller gives up,
+        so abandoned calls still count against max_in_flight.
+        """
+        await self._acquire(degrade)
+        started = time.perf_counter()
+
+        def finished(future: asyncio.Future) -> None:
+            self._release(started)
+            # Retrieve the exception of an abandoned call so asyncio doesn't warn about it
+            future.cancelled() or future.exception()
+
+        work = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        work.add_done_callback(finished)
+        return await asyncio.shield(work)
+
+
+_pools: Dict[str, AdmissionPool] = {}
+
+
+def get_pool(name: str) -> AdmissionPool:
+    """
+    Get or create a pool. Limits come from <NAME>_MAX_IN_FLIGHT, <NAME>_MAX_QUEUE
+    and <NAME>_QUEUE_TIMEOUT.
+    """
+    pool = _pools.get(name)
+    if pool is None:
+        default_in_flight, default_queue, default_timeout = POOL_DEFAULTS.get(name, (32, 64, 2.0))
+        env_prefix = name.upper()
+        pool = AdmissionPool(
+            name,
+            max_in_flight=int(os.getenv(f"{env_prefix}_MAX_IN_FLIGHT", default_in_flight)),
+            max_queue=int(os.getenv(f"{env_prefix}_MAX_QUEUE", default_queue)),
+            queue_timeout=float(os.getenv(f"{env_prefix}_QUEUE_TIMEOUT", default_timeout)),
+        )
+        _pools[name] = pool
+        metrics.gauge(
+            f"admission_{name}_in_flight", f"Work currently admitted to the {name} pool",
+            callback=lambda: pool.in_flight,
+        )
+        metrics.gauge(
+            f"admission_{name}_queue_depth", f"Requests waiting for the {name} pool",
+            callback=lambda: pool.waiting,
+        )
+    return pool
+
+
+def admission_stats() -> Dict[str, Dict[str, float]]:
+    return {
+        name: {
+            "in_flight": pool.in_flight,
+            "waiting": pool.waiting,
+            "max_in_flight": pool.max_in_flight,
+            "max_queue": pool.max_queue,
+            "avg_seconds": round(pool.avg_seconds, 3),
+        }
+        for name, pool in _pools.items()
+    }
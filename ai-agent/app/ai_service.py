@@ -2,10 +2,19 @@
 AI Service using OpenAI for chat and recommendations
 """
 import os
-from openai import OpenAI
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Callable
 import json
 
+try:
+    from .admission import get_pool, Overloaded
+    from .nlp_parser import parse_search_query
+    from .model_router import get_route, classify_error
+except ImportError:
+    from admission import get_pool, Overloaded
+    from nlp_parser import parse_search_query
+    from model_router import get_route, classify_error
+
 # Initialize OpenAI client lazily
 _client = None
 
@@ -16,9 +25,54 @@ def get_client():
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set")
+        # Imported on first use - the openai package is the slowest import in the service
+        from openai import OpenAI
         _client = OpenAI(api_key=api_key)
     return _client
 
+def create_completion(
+    task: str,
+    messages: List[Dict[str, str]],
+    queued_at: Optional[float] = None,
+    parse: Optional[Callable[[Any], Any]] = None,
+):
+    """
+    Blocking OpenAI call using the model, max_tokens and timeout routed for the task.
+    queued_at is when the caller started waiting for the call (perf_counter), so
+    admission and thread-pool wait are accounted separately from provider time.
+    With parse, returns parse(response); a ValueError from it is recorded as a
+    parse failure and re-raised.
+    """
+    client = get_client()
+    route = get_route(task)
+    model = route.choose_model()
+    started = time.perf_counter()
+    queue_seconds = started - queued_at if queued_at is not None else 0.0
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=route.temperature,
+            max_tokens=route.max_tokens,
+            timeout=route.timeout
+        )
+    except Exception as e:
+        route.record(model, time.perf_counter() - started, classify_error(e), queue_seconds=queue_seconds)
+        raise
+    provider_seconds = time.perf_counter() - started
+    usage = getattr(response, "usage", None)
+    if parse is None:
+        route.record(model, provider_seconds, "success", usage, queue_seconds)
+        return response
+    try:
+        result = parse(response)
+    except ValueError:
+        # The call was paid for even though its answer is unusable
+        route.record(model, provider_seconds, "parse_failure", usage, queue_seconds)
+        raise
+    route.record(model, provider_seconds, "success", usage, queue_seconds)
+    return result
+
 SYSTEM_PROMPT = """You are a helpful AI travel assistant for KAYAK, a travel booking platform. 
 Your role is to help users with all aspects of travel planning and booking.
 
@@ -54,12 +108,29 @@ You can handle:
 - Suggestion queries: "Suggest a trip", "Where should I go?"
 - General questions: Travel advice, destination info, etc."""
 
+# Canned replies returned when the OpenAI call fails - never worth caching
+SEARCH_RESULTS_FALLBACK_RESPONSE = "I found some results for you. Please review them below."
+CHAT_ERROR_RESPONSE = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+FALLBACK_RESPONSES = {SEARCH_RESULTS_FALLBACK_RESPONSE, CHAT_ERROR_RESPONSE}
+
 async def get_chat_response(
     messages: List[Dict[str, str]],
     user_context: Optional[Dict[str, Any]] = None,
     search_results: Optional[str] = None
 ) -> str:
-    """Get AI response from OpenAI"""
+    """
+    Get AI response from OpenAI. Waits for a slot in the "llm" admission pool
+    and raises Overloaded if none frees up in time.
+    """
+    queued_at = time.perf_counter()
+    return await _get_chat_response(messages, user_context, search_results, queued_at)
+
+async def _get_chat_response(
+    messages: List[Dict[str, str]],
+    user_context: Optional[Dict[str, Any]],
+    search_results: Optional[str],
+    queued_at: Optional[float] = None
+) -> str:
     try:
         # Build context-aware messages
         system_message = SYSTEM_PROMPT
@@ -92,33 +163,66 @@ async def get_chat_response(
         ] + messages
         
         import sys
-        print(f"🔍 [OPENAI] Calling OpenAI API with model: {os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')}", flush=True)
+        print(f"🔍 [OPENAI] Calling OpenAI API for chat (primary model: {get_route('chat').model})", flush=True)
         print(f"🔍 [OPENAI] Messages count: {len(openai_messages)}", flush=True)
         sys.stdout.flush()
         
-        client = get_client()
-        response = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
-            messages=openai_messages,
-            temperature=0.7,
-            max_tokens=500
-        )
+        # The OpenAI client is synchronous - run it in a thread so the event loop keeps serving.
+        # The llm slot is held until the thread returns, even if this turn is cancelled first.
+        response = await get_pool("llm").run_in_thread(create_completion, "chat", openai_messages, queued_at)
         
         result = response.choices[0].message.content
         print(f"✅ [OPENAI] Got response: {result[:100]}...", flush=True)
         sys.stdout.flush()
         return result
         
+    except Overloaded:
+        raise
     except Exception as e:
         import traceback
         print(f"Error getting AI response: {e}")
         traceback.print_exc()
         # If we have search results, provide a basic response
         if search_results:
-            return f"I found some results for you. Please review them below."
-        return "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+            return SEARCH_RESULTS_FALLBACK_RESPONSE
+        return CHAT_ERROR_RESPONSE
+
+async def extract_search_intent_async(message: str) -> Dict[str, Any]:
+    """
+    extract_search_intent in a worker thread. When the "llm" pool is saturated the
+    rule-based parser answers instead of queueing behind slow LLM calls.
+    """
+    queued_at = time.perf_counter()
+    try:
+        return await get_pool("llm").run_in_thread(extract_search_intent, message, queued_at, degrade=True)
+    except Overloaded:
+        print("⚠️ [ADMISSION] LLM pool saturated, using rule-based intent parser", flush=True)
+        return _rule_based_intent(message, "overloaded")
+
+def _rule_based_intent(message: str, reason: str) -> Dict[str, Any]:
+    """Intent from the rule-based parser, accounted as a rule fallback of the intent route"""
+    get_route("intent").record_rule_fallback(reason)
+    result = parse_search_query(message)
+    return result if result and isinstance(result, dict) else {"type": None, "params": {}}
 
-def extract_search_intent(message: str) -> Dict[str, Any]:
+def _parse_intent(response) -> Any:
+    """JSON object from an intent completion (raises json.JSONDecodeError, a ValueError)"""
+    result_text = response.choices[0].message.content.strip()
+    # Remove markdown code blocks if present
+    if result_text.startswith("```"):
+        parts = result_text.split("```")
+        if len(parts) > 1:
+            result_text = parts[1]
+            if result_text.startswith("json"):
+                result_text = result_text[4:]
+            result_text = result_text.strip()
+    try:
+        return json.loads(result_text)
+    except json.JSONDecodeError as e:
+        print(f"JSON decode error: {e}, raw response: {result_text}")
+        raise
+
+def extract_search_intent(message: str, queued_at: Optional[float] = None) -> Dict[str, Any]:
     """Extract search intent from user message using OpenAI"""
     # First try OpenAI, but if it fails, fallback immediately
     try:
@@ -126,7 +230,7 @@ def extract_search_intent(message: str) -> Dict[str, Any]:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             print("OpenAI API key not found, using fallback parser")
-            raise ValueError("No API key")
+            return _rule_based_intent(message, "no_api_key")
         prompt = f"""Analyze this user message and extract search parameters in JSON format:
 "{message}"
 
@@ -146,56 +250,33 @@ Return a JSON object with:
 IMPORTANT: For flights, if the message mentions a destination city (like "to Paris", "flights to Paris"), extract it as the "to" field.
 Only include fields that are explicitly mentioned or can be inferred. Return only valid JSON, no markdown."""
 
-        client = get_client()
-        response = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
-            messages=[
-                {"role": "system", "content": "You are a JSON extraction assistant. Always return valid JSON only, no markdown code blocks, no explanations."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,  # Lower temperature for more consistent extraction
-            max_tokens=200
-        )
+        # Low temperature and a small token budget - see TASK_DEFAULTS in model_router
+        parsed = create_completion("intent", [
+            {"role": "system", "content": "You are a JSON extraction assistant. Always return valid JSON only, no markdown code blocks, no explanations."},
+            {"role": "user", "content": prompt}
+        ], queued_at, parse=_parse_intent)
         
-        result_text = response.choices[0].message.content.strip()
-        # Remove markdown code blocks if present
-        if result_text.startswith("```"):
-            parts = result_text.split("```")
-            if len(parts) > 1:
-                result_text = parts[1]
-                if result_text.startswith("json"):
-                    result_text = result_text[4:]
-                result_text = result_text.strip()
-        
-        parsed = json.loads(result_text)
         if parsed is None:
             parsed = {}
         print(f"OpenAI extracted intent: {parsed}")
         return parsed if isinstance(parsed, dict) else {"type": None, "params": {}}
         
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}, raw response: {result_text}")
+    except json.JSONDecodeError:
         # Fallback to basic parsing
-        from .nlp_parser import parse_search_query
-        result = parse_search_query(message)
-        return result if result and isinstance(result, dict) else {"type": None, "params": {}}
+        return _rule_based_intent(message, "parse_failure")
     except ValueError as e:
-        # API key missing or other value error - use fallback
+        # Other value error - use fallback
         print(f"ValueError in extract_search_intent: {e}, using fallback parser")
-        from .nlp_parser import parse_search_query
-        result = parse_search_query(message)
-        return result if result and isinstance(result, dict) else {"type": None, "params": {}}
+        return _rule_based_intent(message, "parse_failure")
     except Exception as e:
-        error_str = str(e).lower()
+        reason = classify_error(e)
         # Check for quota/rate limit errors
-        if "quota" in error_str or "429" in error_str or "rate limit" in error_str or "insufficient_quota" in error_str:
+        if reason == "quota":
             print(f"⚠️ OpenAI quota exceeded, using fallback parser")
         else:
             print(f"Error extracting search intent: {e}")
             import traceback
             traceback.print_exc()
         # Fallback to basic parsing
-        from .nlp_parser import parse_search_query
-        result = parse_search_query(message)
-        return result if result and isinstance(result, dict) else {"type": None, "params": {}}
+        return _rule_based_intent(message, reason)
 
@@ -0,0 +1,207 @@
+"""
+Progressive chat over a WebSocket (/ws/chat)
+/api/chat answers once every search and the LLM have finished. On the socket,
+each chat message is answered with typed JSON frames as soon as each part is
+known, so the UI can fill in within one upstream round-trip:
+
+    {"type": "intent",  "turn": 1, "query_type": ..., "search_type": ..., "params": {...}}
+    {"type": "results", "turn": 1, "search_type": "flights", "results": [...], "count": 42}
+    {"type": "message", "turn": 1, "response": "...", "search_type": ..., "next_cursor": ...}
+
+A whole-trip search sends one "results" frame per vertical, in the order the
+upstream services answer. Failures end the turn with {"type": "error", "status", "detail"}
+(503 frames also carry "retry_after").
+
+Clients send ChatRequest-shaped JSON ({"message", "conversation_history",
+"user_id", "cursor"}), or {"type": "cancel"} to stop the current turn. A new
+message supersedes the turn in flight; frames carry the turn number so stale
+ones can be ignored. Browsers cannot set headers on a WebSocket, so the bearer
+token may also be passed as ?token=...
+
+Backpressure: frames go through a bounded queue, so a turn waits for a slow
+client instead of buffering without limit, and a client that does not accept a
+frame within WS_CHAT_SEND_TIMEOUT seconds is disconnected. Closing the socket
+cancels the turn, including its in-flight upstream searches. An OpenAI call
+already running in its worker thread cannot be interrupted: it is abandoned,
+runs to completion (and is billed), and keeps its "llm" pool slot until it
+returns, so rapid messages cannot push more calls through than the pool allows.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    from . import metrics
+    from .admission import Overloaded
+except ImportError:
+    import metrics
+    from admission import Overloaded
+
+# Frames buffered per socket before a turn has to wait for the client
+WS_CHAT_QUEUE_SIZE = int(os.getenv("WS_CHAT_QUEUE_SIZE", 8))
+# Seconds a single frame may take to reach a slow client before it is dropped
+WS_CHAT_SEND_TIMEOUT = float(os.getenv("WS_CHAT_SEND_TIMEOUT", 10.0))
+
+# Close code for a client that stopped reading (RFC 6455 "Try Again Later")
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+# progress(frame_type, **fields) - awaited by handle_chat for each partial frame
+Progress = Callable[..., Awaitable[None]]
+# run_turn(payload, authorization, progress) -> ChatResponse
+TurnHandler = Callable[[Dict[str, Any], Optional[str], Progress], Awaitable[Any]]
+
+FRAME_SECONDS = metrics.histogram(
+    "chat_stream_frame_seconds", "Time from a chat message to each frame reaching the socket, by frame type",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0),
+)
+TURNS_TOTAL = metrics.counter(
+    "chat_stream_turns_total", "Chat turns handled over /ws/chat, by outcome"
+)
+SLOW_CLIENTS_TOTAL = metrics.counter(
+    "chat_stream_slow_clients_total", "Sockets closed because the client stopped reading frames"
+)
+
+_open_sessions = 0
+
+
+def _encode(frame: Dict[str, Any]) -> str:
+    # Listings come from JSON services, but may carry dates from the snapshot
+    return json.dumps(frame, default=str)
+
+
+class ChatSession:
+    """One /ws/chat connection: a receive loop, a send loop and at most one running turn"""
+
+    def __init__(self, websocket: WebSocket, run_turn: TurnHandler, authorization: Optional[str]):
+        self.websocket = websocket
+        self.run_turn = run_turn
+        self.authorization = authorization
+        # (frame, turn start time or None)
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=WS_CHAT_QUEUE_SIZE)
+        self.turn: Optional[asyncio.Task] = None
+        self.turn_id = 0
+
+    async def run(self) -> None:
+        receiver = asyncio.ensure_future(self._receive_loop())
+        sender = asyncio.ensure_future(self._send_loop())
+        try:
+            # Either side ending (client closed, or stopped reading) ends the session
+            await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.cancel_turn()
+            receiver.cancel()
+            sender.cancel()
+
+    def cancel_turn(self) -> None:
+        """Stop the turn in flight; an LLM call already in its thread is abandoned, not stopped"""
+        if self.turn is not None and not self.turn.done():
+            self.turn.cancel()
+            TURNS_TOTAL.inc(outcome="cancelled")
+            print(f"⚠️ [WS] Turn {self.turn_id} cancelled", flush=True)
+            try:
+                self.outbox.put_nowait(({"type": "cancelled", "turn": self.turn_id}, None))
+            except asyncio.QueueFull:
+                pass
+        self.turn = None
+
+    async def push(self, frame: Dict[str, Any], started: Optional[float] = None) -> None:
+        """Queue a frame for the client, waiting while the queue is full"""
+        await self.outbox.put((frame, started))
+
+    async def _receive_loop(self) -> None:
+        while True:
+            try:
+                text = await self.websocket.receive_text()
+            except WebSocketDisconnect:
+                return
+            try:
+                payload = json.loads(text)
+                if not isinstance(payload, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                await self.push({"type": "error", "turn": None, "status": 400, "detail": f"Invalid frame: {e}"})
+                continue
+            # A cancel, or a newer message, stops the turn in flight
+            self.cancel_turn()
+            if payload.get("type") == "cancel":
+                continue
+            self.turn_id += 1
+            self.turn = asyncio.ensure_future(self._run_turn(self.turn_id, payload))
+
+    async def _send_loop(self) -> None:
+        while True:
+            frame, started = await self.outbox.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(_encode(frame)), WS_CHAT_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                SLOW_CLIENTS_TOTAL.inc()
+                print(f"⚠️ [WS] Client not reading frames for {WS_CHAT_SEND_TIMEOUT:.0f}s, closing socket", flush=True)
+                try:
+                    await self.websocket.close(code=SLOW_CLIENT_CLOSE_CODE)
+                except Exception:
+                    pass
+                return
+            except Exception as e:
+                print(f"⚠️ [WS] Send failed, closing session: {e}", flush=True)
+                return
+            if started is not None:
+                FRAME_SECONDS.observe(time.perf_counter() - started, frame=frame["type"])
+
+    async def _run_turn(self, turn_id: int, payload: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+
+        async def progress(frame_type: str, **fields) -> None:
+            await self.push({"type": frame_type, "turn": turn_id, **fields}, started)
+
+        try:
+            response = await self.run_turn(payload, self.authorization, progress)
+        except Overloaded as e:
+            TURNS_TOTAL.inc(outcome="overloaded")
+            print(f"⚠️ [ADMISSION] {e}", flush=True)
+            await progress(
+                "error", status=503, retry_after=e.retry_after,
+                detail="The assistant is busy right now. Please try again shortly.",
+            )
+            return
+        except ValueError as e:
+            # Includes pydantic validation errors for malformed chat requests
+            TURNS_TOTAL.inc(outcome="invalid")
+            await progress("error", status=400, detail=str(e))
+            return
+        except Exception as e:
+            TURNS_TOTAL.inc(outcome="error")
+            print(f"❌ [WS] Turn {turn_id} failed: {e}", flush=True)
+            await progress("error", status=500, detail="Something went wrong answering that message.")
+            return
+        TURNS_TOTAL.inc(outcome="completed")
+        await progress(
+            "message", response=response.response, search_type=response.search_type,
+            next_cursor=response.next_cursor,
+        )
+
+
+def socket_authorization(websocket: WebSocket) -> Optional[str]:
+    """Authorization header, or a bearer header built from the ?token= query param"""
+    authorization = websocket.headers.get("authorization")
+    if authorization:
+        return authorization
+    token = websocket.query_params.get("token")
+    return f"Bearer {token}" if token else None
+
+
+async def serve_chat_socket(websocket: WebSocket, run_turn: TurnHandler) -> None:
+    """Accept a /ws/chat connection and answer its messages until it closes"""
+    global _open_sessions
+    await websocket.accept()
+    _open_sessions += 1
+    try:
+        await ChatSession(websocket, run_turn, socket_authorization(websocket)).run()
+    finally:
+        _open_sessions -= 1
+
+
+metrics.gauge("chat_stream_open_sockets", "Open /ws/chat connections", callback=lambda: _open_sessions)
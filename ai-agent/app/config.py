@@ -0,0 +1,42 @@
+"""
+One-time configuration loading
+main.py calls load_config() before importing the other modules, so values
+that modules read from the environment at import time (service URLs, cache
+sizes) already see the .env file.
+"""
+import os
+import pathlib
+from typing import Optional
+
+AGENT_DIR = pathlib.Path(__file__).parent.parent
+
+# Checked in order; only the first .env found is read
+ENV_CANDIDATES = (
+    AGENT_DIR / ".env",
+    pathlib.Path.cwd() / ".env",
+    AGENT_DIR.parent / ".env",
+)
+
+_loaded_from: Optional[pathlib.Path] = None
+_loaded = False
+
+
+def load_config() -> Optional[pathlib.Path]:
+    """Load the .env file once per process; returns the file used (None if there was none)"""
+    global _loaded, _loaded_from
+    if _loaded:
+        return _loaded_from
+    _loaded = True
+    for candidate in ENV_CANDIDATES:
+        if candidate.is_file():
+            from dotenv import load_dotenv
+
+            # Real environment variables (docker, CI) win over the file
+            load_dotenv(candidate, override=False)
+            _loaded_from = candidate
+            break
+    return _loaded_from
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,185 @@
+"""
+Popular-destinations index for trip suggestions
+A background task periodically ranks destinations by booking volume (admin
+analytics) and flight inventory, so suggest_trip can answer from memory
+instead of calling the flight service on every request.
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+try:
+    from . import metrics
+    from .http_client import http_session
+except ImportError:
+    import metrics
+    from http_client import http_session
+
+if TYPE_CHECKING:
+    import httpx
+
+FLIGHT_SERVICE_URL = os.getenv("FLIGHT_SERVICE_URL", "http://localhost:5002")
+ADMIN_SERVICE_URL = os.getenv("ADMIN_SERVICE_URL", "http://localhost:5006")
+
+# How much booking volume counts versus available flight inventory
+BOOKING_WEIGHT = 0.7
+INVENTORY_WEIGHT = 0.3
+
+REFRESH_DURATION = metrics.histogram(
+    "destination_index_refresh_duration_seconds", "Time taken to rebuild the popular-destinations index"
+)
+REFRESH_TOTAL = metrics.counter(
+    "destination_index_refresh_total", "Popular-destinations index refreshes by outcome"
+)
+
+
+class DestinationIndex:
+    """Ranked destinations, rebuilt in the background and read without I/O"""
+
+    def __init__(self, refresh_seconds: int = 600, sample_size: int = 200):
+        self.refresh_seconds = refresh_seconds
+        self.sample_size = sample_size
+        self.destinations: List[Dict[str, Any]] = []
+        self.last_refresh: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def top(self, limit: int = 5) -> List[Dict[str, Any]]:
+        """Top destinations from the last refresh (empty until the first refresh succeeds)"""
+        return self.destinations[:limit]
+
+    def age_seconds(self) -> float:
+        """Seconds since the last successful refresh (-1 if it never succeeded)"""
+        if self.last_refresh is None:
+            return -1.0
+        return time.time() - self.last_refresh
+
+    async def _fetch_booking_volume(self, client: "httpx.AsyncClient") -> Dict[str, float]:
+        """Revenue per city from the admin analytics (reflects real bookings)"""
+        response = await client.get(f"{ADMIN_SERVICE_URL}/api/admin/analytics")
+        if response.status_code != 200:
+            return {}
+        data = (response.json() or {}).get("data") or {}
+        return {
+            item["city"]: float(item.get("revenue") or 0)
+            for item in data.get("cityWiseRevenue", []) or []
+            if item.get("city")
+        }
+
+    async def _fetch_inventory(self, client: "httpx.AsyncClient") -> Dict[str, Dict[str, Any]]:
+        """Flights available per arrival city, with the cheapest fare seen"""
+        response = await client.get(
+            f"{FLIGHT_SERVICE_URL}/api/flights",
+            params={"limit": self.sample_size, "sortBy": "ticketPrice", "sortOrder": "asc"},
+        )
+        if response.status_code != 200:
+            return {}
+        data = response.json() or {}
+        flights = data.get("data", []) if data.get("success") else []
+        inventory: Dict[str, Dict[str, Any]] = {}
+        for flight in flights if isinstance(flights, list) else []:
+            city = (flight.get("arrivalAirport") or {}).get("city")
+            if not city:
+                continue
+            entry = inventory.setdefault(city, {"flights": 0, "min_fare": None})
+            entry["flights"] += 1
+            fare = flight.get("ticketPrice")
+            if isinstance(fare, (int, float)) and (entry["min_fare"] is None or fare < entry["min_fare"]):
+                entry["min_fare"] = fare
+        return inventory
+
+    async def refresh(self) -> bool:
+        """Rebuild the ranking; keeps the previous ranking if every source fails"""
+        started = time.perf_counter()
+        async with http_session() as client:
+            volume_result, inventory_result = await asyncio.gather(
+                self._fetch_booking_volume(client),
+                self._fetch_inventory(client),
+                return_exceptions=True,
+            )
+        volume = volume_result if isinstance(volume_result, dict) else {}
+        inventory = inventory_result if isinstance(inventory_result, dict) else {}
+        REFRESH_DURATION.observe(time.perf_counter() - started)
+
+        if not volume and not inventory:
+            REFRESH_TOTAL.inc(outcome="empty")
+            print(f"⚠️ [DESTINATIONS] Refresh returned no data, keeping {len(self.destinations)} cached destinations", flush=True)
+            sys.stdout.flush()
+            return False
+
+        max_volume = max(volume.values(), default=0) or 1
+        max_flights = max((entry["flights"] for entry in inventory.values()), default=0) or 1
+        ranked = []
+        for city in set(volume) | set(inventory):
+            stock = inventory.get(city, {"flights": 0, "min_fare": None})
+            score = (
+                BOOKING_WEIGHT * volume.get(city, 0) / max_volume
+                + INVENTORY_WEIGHT * stock["flights"] / max_flights
+            )
+            ranked.append({
+                "city": city,
+                "score": round(score, 4),
+                "booking_volume": volume.get(city, 0),
+                "flights": stock["flights"],
+                "min_fare": stock["min_fare"],
+            })
+        ranked.sort(key=lambda d: (-d["score"], d["city"]))
+
+        self.destinations = ranked
+        self.last_refresh = time.time()
+        REFRESH_TOTAL.inc(outcome="success")
+        print(f"✅ [DESTINATIONS] Ranked {len(ranked)} destinations: {[d['city'] for d in ranked[:5]]}", flush=True)
+        sys.stdout.flush()
+        return True
+
+    async def run(self) -> None:
+        """Refresh loop - runs until cancelled"""
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                REFRESH_TOTAL.inc(outcome="error")
+                print(f"❌ [DESTINATIONS] Refresh failed: {e}", flush=True)
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+_destination_index = None
+
+
+def get_destination_index() -> DestinationIndex:
+    """Get or create the process-wide destination index"""
+    global _destination_index
+    if _destination_index is None:
+        _destination_index = DestinationIndex(
+            refresh_seconds=int(os.getenv("DESTINATION_INDEX_REFRESH_SECONDS", 600)),
+            sample_size=int(os.getenv("DESTINATION_INDEX_SAMPLE_SIZE", 200)),
+        )
+        metrics.gauge(
+            "destination_index_refresh_interval_seconds", "Configured refresh interval of the destinations index",
+            callback=lambda: _destination_index.refresh_seconds,
+        )
+        metrics.gauge(
+            "destination_index_age_seconds", "Seconds since the destinations index was last refreshed (-1 = never)",
+            callback=lambda: _destination_index.age_seconds(),
+        )
+        metrics.gauge(
+            "destination_index_size", "Number of ranked destinations in memory",
+            callback=lambda: len(_destination_index.destinations),
+        )
+    return _destination_index
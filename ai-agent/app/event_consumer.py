@@ -0,0 +1,230 @@
+"""
+Cache invalidation driven by the platform's Kafka events
+Consumes the booking stream (and user updates) and evicts exactly the cache
+entries an event makes stale, so caches can use long TTLs without serving old
+bookings, profiles or seat availability.
+
+Enable with CACHE_INVALIDATION_CONSUMER=kafka (requires aiokafka and
+KAFKA_BROKERS). CACHE_INVALIDATION_CONSUMER=local uses an in-process broker
+instead, for tests and local development without Kafka.
+"""
+import asyncio
+import json
+import os
+import sys
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from . import metrics
+    from .shared_cache import get_cache
+    from .response_cache import get_response_cache
+    from .services import invalidate_user_context
+    from .inventory_snapshot import get_inventory_snapshot
+except ImportError:
+    import metrics
+    from shared_cache import get_cache
+    from response_cache import get_response_cache
+    from services import invalidate_user_context
+    from inventory_snapshot import get_inventory_snapshot
+
+# Topic names match kafka/config/kafka.config.js and kafka/topics/topics.config.js
+BOOKINGS_TOPIC = "bookings"
+USER_EVENTS_TOPIC = "user-events"
+DEFAULT_TOPICS = (BOOKINGS_TOPIC, USER_EVENTS_TOPIC)
+
+EVENTS_TOTAL = metrics.counter(
+    "cache_invalidation_events_total", "Events received by the cache invalidation consumer"
+)
+EVICTIONS_TOTAL = metrics.counter(
+    "cache_invalidation_evictions_total", "Cache entries evicted because of an event"
+)
+
+
+class InProcessBroker:
+    """Minimal stand-in for Kafka: every subscriber receives every event on its topics"""
+
+    def __init__(self):
+        self._subscribers: List[Tuple[frozenset, asyncio.Queue]] = []
+
+    def subscribe(self, topics: Iterable[str]) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append((frozenset(topics), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers = [(topics, q) for topics, q in self._subscribers if q is not queue]
+
+    async def publish(self, topic: str, event: Dict[str, Any]) -> None:
+        for topics, queue in self._subscribers:
+            if topic in topics:
+                await queue.put((topic, event))
+
+
+class InProcessEventSource:
+    """Event source reading from an InProcessBroker"""
+
+    def __init__(self, broker: InProcessBroker, topics: Iterable[str] = DEFAULT_TOPICS):
+        self.broker = broker
+        self.topics = tuple(topics)
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def start(self) -> None:
+        self._queue = self.broker.subscribe(self.topics)
+
+    async def stop(self) -> None:
+        if self._queue is not None:
+            self.broker.unsubscribe(self._queue)
+            self._queue = None
+
+    async def messages(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        while self._queue is not None:
+            yield await self._queue.get()
+
+
+class KafkaEventSource:
+    """Event source reading from Kafka through aiokafka"""
+
+    def __init__(self, brokers: str, topics: Iterable[str] = DEFAULT_TOPICS):
+        self.brokers = brokers
+        self.topics = tuple(topics)
+        self._consumer = None
+
+    async def start(self) -> None:
+        from aiokafka import AIOKafkaConsumer
+
+        # No consumer group: every worker must see every event to clear its own local caches
+        self._consumer = AIOKafkaConsumer(
+            *self.topics,
+            bootstrap_servers=self.brokers,
+            group_id=None,
+            auto_offset_reset="latest",
+            client_id=f"kayak-ai-agent-{os.getpid()}",
+        )
+        await self._consumer.start()
+
+    async def stop(self) -> None:
+        if self._consumer is not None:
+            await self._consumer.stop()
+            self._consumer = None
+
+    async def messages(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        async for record in self._consumer:
+            try:
+                event = json.loads(record.value)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(event, dict):
+                yield record.topic, event
+
+
+def _event_user_id(event: Dict[str, Any]) -> Optional[str]:
+    for key in ("userId", "user_id", "_id"):
+        if event.get(key):
+            return str(event[key])
+    return None
+
+
+async def invalidate_for_event(topic: str, event: Dict[str, Any]) -> Dict[str, int]:
+    """Evict the cache entries made stale by one event; returns evictions per cache"""
+    evicted = {"user": 0, "response": 0, "search": 0}
+    user_id = _event_user_id(event)
+
+    if user_id:
+        # Profile, bookings and favourites for the user, under every auth scope
+        evicted["user"] = await invalidate_user_context(user_id)
+        response_cache = get_response_cache()
+        if response_cache is not None:
+            evicted["response"] = response_cache.invalidate_user(user_id)
+
+    if topic == BOOKINGS_TOPIC and event.get("itemId"):
+        # Only searches that returned the booked flight/hotel/car
+        evicted["search"] = await get_cache("search").delete_tag(f"item:{event['itemId']}")
+        snapshot = get_inventory_snapshot()
+        if snapshot is not None and event.get("type"):
+            # Seats/rooms/availability of the booked item changed
+            await snapshot.refresh_item(f"{event['type']}s", str(event["itemId"]))
+
+    for cache_name, count in evicted.items():
+        if count:
+            EVICTIONS_TOTAL.inc(count, cache=cache_name)
+    return evicted
+
+
+class CacheInvalidationConsumer:
+    """Background task feeding events from a source into invalidate_for_event"""
+
+    def __init__(self, source):
+        self.source = source
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        async for topic, event in self.source.messages():
+            event_type = event.get("eventType", "unknown")
+            EVENTS_TOTAL.inc(topic=topic, event_type=event_type)
+            try:
+                evicted = await invalidate_for_event(topic, event)
+                if any(evicted.values()):
+                    print(f"🧹 [EVENTS] {topic}/{event_type} evicted {evicted}", flush=True)
+            except Exception as e:
+                print(f"❌ [EVENTS] Failed to handle {topic}/{event_type}: {e}", flush=True)
+                sys.stdout.flush()
+
+    async def start(self) -> None:
+        await self.source.start()
+        self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.source.stop()
+
+
+_local_broker: Optional[InProcessBroker] = None
+_consumer: Optional[CacheInvalidationConsumer] = None
+
+
+def get_local_broker() -> InProcessBroker:
+    """In-process broker used when CACHE_INVALIDATION_CONSUMER=local"""
+    global _local_broker
+    if _local_broker is None:
+        _local_broker = InProcessBroker()
+    return _local_broker
+
+
+async def start_cache_invalidation_consumer() -> Optional[CacheInvalidationConsumer]:
+    """Start the consumer configured by CACHE_INVALIDATION_CONSUMER (off by default)"""
+    global _consumer
+    mode = os.getenv("CACHE_INVALIDATION_CONSUMER", "off").lower()
+    if mode == "kafka":
+        try:
+            import aiokafka  # noqa: F401
+        except ImportError:
+            print("⚠️ [EVENTS] CACHE_INVALIDATION_CONSUMER=kafka but aiokafka is not installed", flush=True)
+            return None
+        source = KafkaEventSource(os.getenv("KAFKA_BROKERS", "localhost:9092"))
+    elif mode == "local":
+        source = InProcessEventSource(get_local_broker())
+    else:
+        return None
+
+    consumer = CacheInvalidationConsumer(source)
+    try:
+        await consumer.start()
+    except Exception as e:
+        print(f"❌ [EVENTS] Could not start cache invalidation consumer: {e}", flush=True)
+        return None
+    _consumer = consumer
+    print(f"✅ [EVENTS] Cache invalidation consumer started ({mode})", flush=True)
+    return consumer
+
+
+async def stop_cache_invalidation_consumer() -> None:
+    global _consumer
+    if _consumer is not None:
+        await _consumer.stop()
+        _consumer = None
@@ -0,0 +1,45 @@
+"""
+Shared HTTP client for calls to the platform services
+One pooled httpx.AsyncClient per worker keeps connections alive between
+requests (and lets warm-up open them ahead of traffic). httpx is imported on
+first use so it does not count against startup time.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+HTTP_TIMEOUT = 10.0
+
+_client = None
+_client_loop = None
+
+
+def get_http_client():
+    """Get or create the pooled client for the running event loop"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        import httpx
+
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _client_loop = loop
+    return _client
+
+
+@asynccontextmanager
+async def http_session():
+    """Borrow the shared client for a block - unlike httpx.AsyncClient(), leaving it doesn't close it"""
+    yield get_http_client()
+
+
+async def close_http_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        try:
+            await _client.aclose()
+        except Exception:
+            pass
+        _client = None
+        _client_loop = None
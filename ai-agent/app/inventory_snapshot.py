@@ -0,0 +1,442 @@
+"""
+In-process columnar snapshot of flight, hotel and car inventory
+Keeps every listing in NumPy column arrays (prices, dictionary-encoded
+cities/companies, ratings, timestamps) so searches are answered with
+vectorized filters and sorts instead of an HTTP round trip. Only queries the
+snapshot can answer exactly as the upstream service would are served here;
+anything else returns None and run_search falls back to HTTP.
+
+Refresh is incremental: listings are read newest-updatedAt first until the
+last watermark is reached, booking events refetch the booked item, and a
+periodic full resync drops deleted or sold-out listings.
+
+Optional - requires numpy and INVENTORY_SNAPSHOT_ENABLED=true.
+"""
+import asyncio
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from . import metrics
+    from .config import env_flag
+    from .http_client import http_session
+except ImportError:
+    import metrics
+    from config import env_flag
+    from http_client import http_session
+
+# numpy is imported when the snapshot is enabled (see _load_numpy) so it
+# costs nothing at startup for deployments that don't use it
+np = None
+
+FLIGHT_SERVICE_URL = os.getenv("FLIGHT_SERVICE_URL", "http://localhost:5002")
+HOTEL_SERVICE_URL = os.getenv("HOTEL_SERVICE_URL", "http://localhost:5003")
+CAR_SERVICE_URL = os.getenv("CAR_SERVICE_URL", "http://localhost:5004")
+
+# Listings requested per upstream page while refreshing
+REFRESH_PAGE_SIZE = 200
+# Same default page size as the Node services
+DEFAULT_LIMIT = 20
+
+SNAPSHOT_QUERIES = metrics.counter(
+    "inventory_snapshot_queries_total", "Searches by vertical and whether the snapshot answered them"
+)
+SNAPSHOT_QUERY_SECONDS = metrics.histogram(
+    "inventory_snapshot_query_seconds", "Time to answer a search from the snapshot",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05),
+)
+SNAPSHOT_REFRESH_SECONDS = metrics.histogram(
+    "inventory_snapshot_refresh_seconds", "Time taken by a snapshot refresh, by vertical and kind"
+)
+
+
+def _get(doc: Dict[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _epoch(value: Any) -> float:
+    """ISO timestamp (as returned by the services) to UTC epoch seconds"""
+    if not value:
+        return float("nan")
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return float("nan")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _day_range(value: str) -> Optional[Tuple[float, float]]:
+    """UTC start/end of a YYYY-MM-DD day, as the services filter departureDate"""
+    try:
+        day = datetime.strptime(value.strip(), "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except (AttributeError, ValueError):
+        return None
+    start = day.timestamp()
+    return start, start + 86400 - 0.001
+
+
+class ColumnarTable:
+    """Immutable column arrays for one vertical, built from a list of listings"""
+
+    def __init__(self, docs: List[Dict[str, Any]], numeric: Dict[str, str], categorical: Dict[str, str], times: Dict[str, str]):
+        self.docs = docs
+        self.columns: Dict[str, Any] = {}
+        # categorical column -> list of lowercase values (index = code)
+        self.vocab: Dict[str, List[str]] = {}
+        for name, path in numeric.items():
+            self.columns[name] = np.array([_number(_get(d, path)) for d in docs], dtype=np.float64)
+        for name, path in times.items():
+            self.columns[name] = np.array([_epoch(_get(d, path)) for d in docs], dtype=np.float64)
+        for name, path in categorical.items():
+            codes: Dict[str, int] = {}
+            values = [str(_get(d, path) or "").strip().lower() for d in docs]
+            self.columns[name] = np.array([codes.setdefault(v, len(codes)) for v in values], dtype=np.int32)
+            self.vocab[name] = list(codes)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def match_codes(self, column: str, predicate: Callable[[str], bool]):
+        """Rows whose categorical value satisfies predicate (evaluated once per distinct value)"""
+        codes = [code for code, value in enumerate(self.vocab[column]) if predicate(value)]
+        return np.isin(self.columns[column], np.array(codes, dtype=np.int32))
+
+
+def _regex_predicate(pattern: str, anchored: bool = False) -> Callable[[str], bool]:
+    """Case-insensitive JS-style RegExp test on a lowercase value"""
+    compiled = re.compile(("^" if anchored else "") + pattern, re.IGNORECASE)
+    return lambda value: compiled.search(value) is not None
+
+
+class VerticalSpec:
+    """How one vertical maps listings to columns and query params to filters"""
+
+    def __init__(self, name: str, url: str, numeric: Dict[str, str], categorical: Dict[str, str],
+                 times: Dict[str, str], sort_columns: Dict[str, str], default_sort: Tuple[str, str],
+                 params: Tuple[str, ...], ignored_params: Tuple[str, ...] = ()):
+        self.name = name
+        self.url = url
+        self.numeric = numeric
+        self.categorical = categorical
+        self.times = times
+        # upstream sortBy value -> column
+        self.sort_columns = sort_columns
+        self.default_sort = default_sort
+        # params the snapshot evaluates; ignored_params are ones the service ignores too
+        self.params = set(params) | {"sortBy", "sortOrder", "page", "limit"}
+        self.ignored_params = set(ignored_params)
+
+
+FLIGHTS = VerticalSpec(
+    "flights", f"{FLIGHT_SERVICE_URL}/api/flights",
+    numeric={"price": "ticketPrice", "seats": "availableSeats", "rating": "flightRating.average"},
+    categorical={"from_city": "departureAirport.city", "from_code": "departureAirport.code",
+                 "to_city": "arrivalAirport.city", "to_code": "arrivalAirport.code",
+                 "flight_class": "flightClass", "airline": "airline"},
+    times={"departure": "departureDateTime", "arrival": "arrivalDateTime"},
+    sort_columns={"departureDateTime": "departure", "arrivalDateTime": "arrival",
+                  "ticketPrice": "price", "flightRating.average": "rating"},
+    default_sort=("departureDateTime", "asc"),
+    params=("from", "to", "departureDate", "flightClass", "minPrice", "maxPrice"),
+    ignored_params=("returnDate",),
+)
+HOTELS = VerticalSpec(
+    "hotels", f"{HOTEL_SERVICE_URL}/api/hotels",
+    numeric={"price": "pricePerNight", "stars": "starRating", "rooms": "availableRooms", "rating": "hotelRating.average"},
+    categorical={"city": "city", "state": "state"},
+    times={},
+    sort_columns={"pricePerNight": "price", "starRating": "stars", "hotelRating.average": "rating"},
+    default_sort=("hotelRating.average", "desc"),
+    params=("city", "state", "starRating", "minPrice", "maxPrice"),
+    ignored_params=("checkIn", "checkOut", "guests"),
+)
+CARS = VerticalSpec(
+    "cars", f"{CAR_SERVICE_URL}/api/cars",
+    numeric={"price": "dailyRentalPrice", "rating": "carRating.average", "year": "year"},
+    categorical={"city": "location.city", "company": "company", "car_type": "carType", "status": "availabilityStatus"},
+    times={},
+    sort_columns={"dailyRentalPrice": "price", "carRating.average": "rating", "year": "year"},
+    default_sort=("dailyRentalPrice", "asc"),
+    # pickupDate/returnDate need per-booking overlap checks - left to the car service
+    params=("city", "carType", "minPrice", "maxPrice", "make"),
+)
+VERTICALS = {spec.name: spec for spec in (FLIGHTS, HOTELS, CARS)}
+
+
+def _has_active_booking(car: Dict[str, Any], now: float) -> bool:
+    return any(_epoch(b.get("returnDate")) >= now for b in car.get("bookings") or [])
+
+
+class InventorySnapshot:
+    """Snapshot of all three verticals with background incremental refresh"""
+
+    def __init__(self, refresh_seconds: int = 60, full_resync_seconds: int = 1800):
+        self.refresh_seconds = refresh_seconds
+        self.full_resync_seconds = full_resync_seconds
+        self.tables: Dict[str, ColumnarTable] = {}
+        self._docs: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in VERTICALS}
+        self._watermarks: Dict[str, float] = {}
+        self._last_full_sync: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # -- queries -----------------------------------------------------------
+
+    def search(self, search_type: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Results as the upstream service would return them, or None to fall back to HTTP"""
+        spec = VERTICALS.get(search_type)
+        table = self.tables.get(search_type)
+        clean = {k: v for k, v in (params or {}).items() if v is not None and v != ""}
+        if spec is None or table is None or not set(clean) <= spec.params | spec.ignored_params:
+            SNAPSHOT_QUERIES.inc(vertical=search_type, outcome="fallback")
+            return None
+        started = time.perf_counter()
+        try:
+            mask = self._filter(spec, table, clean)
+            if mask is None:
+                SNAPSHOT_QUERIES.inc(vertical=search_type, outcome="fallback")
+                return None
+            results = self._sort_and_page(spec, table, mask, clean)
+        except (re.error, ValueError, TypeError):
+            SNAPSHOT_QUERIES.inc(vertical=search_type, outcome="fallback")
+            return None
+        SNAPSHOT_QUERY_SECONDS.observe(time.perf_counter() - started)
+        SNAPSHOT_QUERIES.inc(vertical=search_type, outcome="hit")
+        return results
+
+    def _filter(self, spec: VerticalSpec, table: ColumnarTable, params: Dict[str, Any]):
+        col = table.columns
+        mask = np.ones(len(table), dtype=bool)
+        if "minPrice" in params:
+            mask &= col["price"] >= float(params["minPrice"])
+        if "maxPrice" in params:
+            mask &= col["price"] <= float(params["maxPrice"])
+
+        if spec is FLIGHTS:
+            mask &= col["seats"] > 0
+            for param, city_col, code_col in (("from", "from_city", "from_code"), ("to", "to_city", "to_code")):
+                value = str(params.get(param, "")).strip()
+                if not value:
+                    continue
+                # Like the service: any three letters are treated as an airport code
+                if len(value) == 3 and value.isascii() and value.isalpha():
+                    mask &= table.match_codes(code_col, lambda code, v=value.lower(): code == v)
+                else:
+                    mask &= table.match_codes(city_col, _regex_predicate(value))
+            if "departureDate" in params:
+                day = _day_range(str(params["departureDate"]))
+                if day is None:
+                    return None
+                mask &= (col["departure"] >= day[0]) & (col["departure"] <= day[1])
+            if "flightClass" in params:
+                mask &= table.match_codes("flight_class", lambda v, c=str(params["flightClass"]).lower(): v == c)
+
+        elif spec is HOTELS:
+            mask &= col["rooms"] > 0
+            if "city" in params:
+                mask &= table.match_codes("city", _regex_predicate(re.escape(str(params["city"]).strip()), anchored=True))
+            if "state" in params:
+                mask &= table.match_codes("state", _regex_predicate(str(params["state"])))
+            if "starRating" in params:
+                mask &= col["stars"] == float(params["starRating"])
+
+        elif spec is CARS:
+            mask &= table.match_codes("status", lambda v: v == "available")
+            if "city" in params:
+                mask &= table.match_codes("city", _regex_predicate(re.escape(str(params["city"]).strip()), anchored=True))
+            if "carType" in params:
+                mask &= table.match_codes("car_type", lambda v, t=str(params["carType"]).lower(): v == t)
+            if "make" in params:
+                mask &= table.match_codes("company", lambda v, m=str(params["make"]).strip().lower(): v == m)
+        return mask
+
+    def _sort_and_page(self, spec: VerticalSpec, table: ColumnarTable, mask, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        sort_by = params.get("sortBy", spec.default_sort[0])
+        sort_order = params.get("sortOrder", spec.default_sort[1])
+        column = spec.sort_columns.get(sort_by)
+        if column is None:
+            raise ValueError(f"unsupported sortBy {sort_by}")
+        rows = np.flatnonzero(mask)
+        keys = table.columns[column][rows]
+        order = np.argsort(-keys if sort_order == "desc" else keys, kind="stable")
+        rows = rows[order]
+
+        page = max(int(params.get("page", 1)), 1)
+        limit = max(int(params.get("limit", DEFAULT_LIMIT)), 1)
+        start = (page - 1) * limit
+        if spec is CARS:
+            # The car service drops cars with an active booking after paging;
+            # checking only the rows of this page keeps that behaviour
+            now = time.time()
+            return [table.docs[i] for i in rows[start:start + limit] if not _has_active_booking(table.docs[i], now)]
+        return [table.docs[i] for i in rows[start:start + limit]]
+
+    # -- refresh -----------------------------------------------------------
+
+    def _rebuild(self, name: str) -> None:
+        spec = VERTICALS[name]
+        # _id order, so ties in the stable sort break like the services' (sort key, _id)
+        docs = sorted(self._docs[name].values(), key=lambda d: d["_id"])
+        self.tables[name] = ColumnarTable(docs, spec.numeric, spec.categorical, spec.times)
+
+    async def _fetch_page(self, spec: VerticalSpec, page: int, sort_by: str, sort_order: str) -> List[Dict[str, Any]]:
+        async with http_session() as client:
+            response = await client.get(spec.url, params={
+                "page": page, "limit": REFRESH_PAGE_SIZE, "sortBy": sort_by, "sortOrder": sort_order,
+            })
+        if response.status_code != 200:
+            raise RuntimeError(f"{spec.name} service returned {response.status_code}")
+        data = response.json() or {}
+        items = data.get("data", []) if data.get("success") else []
+        return items if isinstance(items, list) else []
+
+    async def full_sync(self, name: str) -> int:
+        """Reload every listing of a vertical (drops deleted and sold-out ones)"""
+        spec = VERTICALS[name]
+        started = time.perf_counter()
+        docs: Dict[str, Dict[str, Any]] = {}
+        page = 1
+        while True:
+            items = await self._fetch_page(spec, page, "createdAt", "asc")
+            docs.update((item["_id"], item) for item in items if item.get("_id"))
+            if len(items) < REFRESH_PAGE_SIZE:
+                break
+            page += 1
+        self._docs[name] = docs
+        self._watermarks[name] = max((_epoch(d.get("updatedAt")) for d in docs.values()), default=0.0)
+        self._last_full_sync[name] = time.time()
+        self._rebuild(name)
+        SNAPSHOT_REFRESH_SECONDS.observe(time.perf_counter() - started, vertical=name, kind="full")
+        return len(docs)
+
+    async def incremental_sync(self, name: str) -> int:
+        """Fetch listings updated since the watermark, newest first"""
+        spec = VERTICALS[name]
+        started = time.perf_counter()
+        watermark = self._watermarks.get(name, 0.0)
+        changed = 0
+        page = 1
+        while True:
+            items = await self._fetch_page(spec, page, "updatedAt", "desc")
+            fresh = [item for item in items if item.get("_id") and _epoch(item.get("updatedAt")) > watermark]
+            for item in fresh:
+                self._docs[name][item["_id"]] = item
+                self._watermarks[name] = max(self._watermarks.get(name, 0.0), _epoch(item.get("updatedAt")))
+            changed += len(fresh)
+            if len(fresh) < len(items) or len(items) < REFRESH_PAGE_SIZE:
+                break
+            page += 1
+        if changed:
+            self._rebuild(name)
+        SNAPSHOT_REFRESH_SECONDS.observe(time.perf_counter() - started, vertical=name, kind="incremental")
+        return changed
+
+    async def refresh_item(self, name: str, item_id: str) -> None:
+        """Refetch one listing (after a booking changed its seats/rooms/availability)"""
+        spec = VERTICALS.get(name)
+        if spec is None or name not in self.tables:
+            return
+        async with http_session() as client:
+            response = await client.get(f"{spec.url}/{item_id}")
+        if response.status_code == 404:
+            self._docs[name].pop(item_id, None)
+        elif response.status_code == 200:
+            item = (response.json() or {}).get("data")
+            if isinstance(item, dict):
+                self._docs[name][item_id] = item
+        self._rebuild(name)
+
+    async def refresh(self) -> None:
+        for name in VERTICALS:
+            try:
+                due = time.time() - self._last_full_sync.get(name, 0) >= self.full_resync_seconds
+                if name not in self.tables or due:
+                    count = await self.full_sync(name)
+                    print(f"✅ [INVENTORY] Loaded {count} {name}", flush=True)
+                else:
+                    changed = await self.incremental_sync(name)
+                    if changed:
+                        print(f"✅ [INVENTORY] Updated {changed} {name}", flush=True)
+            except Exception as e:
+                print(f"❌ [INVENTORY] Refresh of {name} failed: {e}", flush=True)
+                sys.stdout.flush()
+
+    async def run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "rows": len(table),
+                "last_full_sync_age_seconds": round(time.time() - self._last_full_sync.get(name, 0), 1),
+            }
+            for name, table in self.tables.items()
+        }
+
+
+_snapshot: Optional[InventorySnapshot] = None
+_configured = False
+
+
+def _load_numpy() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # optional dependency
+            return False
+        np = numpy
+    return True
+
+
+def get_inventory_snapshot() -> Optional[InventorySnapshot]:
+    """The process-wide snapshot, or None when disabled or numpy is missing"""
+    global _snapshot, _configured
+    if not _configured:
+        _configured = True
+        if not env_flag("INVENTORY_SNAPSHOT_ENABLED", False):
+            return None
+        if not _load_numpy():
+            print("⚠️ [INVENTORY] INVENTORY_SNAPSHOT_ENABLED=true but numpy is not installed", flush=True)
+            return None
+        _snapshot = InventorySnapshot(
+            refresh_seconds=int(os.getenv("INVENTORY_REFRESH_SECONDS", 60)),
+            full_resync_seconds=int(os.getenv("INVENTORY_FULL_RESYNC_SECONDS", 1800)),
+        )
+        for name in VERTICALS:
+            metrics.gauge(
+                f"inventory_snapshot_{name}_rows", f"{name.title()} held in the inventory snapshot",
+                callback=lambda name=name: len(_snapshot.tables[name]) if name in _snapshot.tables else 0,
+            )
+    return _snapshot
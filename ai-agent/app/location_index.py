@@ -0,0 +1,240 @@
+"""
+City and airport alias index for destination matching
+Maps city names, abbreviations ("NYC", "SF", "Philly"), accented spellings
+and IATA airport codes to one canonical location id, so the chat handler can
+match flights by comparing ids instead of substrings, and searches send the
+upstream services the city name their data actually uses.
+
+The index starts from KNOWN_LOCATIONS and learns every airport it sees in
+search results, so inventory added later resolves too.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, Optional, Set
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+# (city as stored by the services, airport codes, extra aliases)
+KNOWN_LOCATIONS = (
+    ("New York", ("JFK", "LGA"), ("nyc", "ny", "new york city", "manhattan", "big apple")),
+    ("Los Angeles", ("LAX",), ("la", "l a")),
+    ("San Francisco", ("SFO",), ("sf", "san fran", "frisco")),
+    ("Las Vegas", ("LAS",), ("vegas", "lv")),
+    ("Washington", ("DCA", "IAD"), ("dc", "washington dc", "washington d c")),
+    ("Philadelphia", ("PHL",), ("philly",)),
+    ("Chicago", ("ORD", "MDW"), ("chi", "chi town", "chitown")),
+    ("Boston", ("BOS",), ()),
+    ("Seattle", ("SEA",), ()),
+    ("Miami", ("MIA",), ()),
+    ("Atlanta", ("ATL",), ("atl",)),
+    ("Dallas", ("DFW",), ("dallas fort worth", "dfw")),
+    ("Houston", ("IAH", "HOU"), ()),
+    ("Denver", ("DEN",), ()),
+    ("Phoenix", ("PHX",), ()),
+    ("Minneapolis", ("MSP",), ("twin cities", "minneapolis saint paul", "minneapolis st paul")),
+    ("Detroit", ("DTW",), ()),
+    ("Charlotte", ("CLT",), ()),
+    ("Baltimore", ("BWI",), ()),
+    ("Salt Lake City", ("SLC",), ("salt lake", "slc")),
+    ("San Diego", ("SAN",), ()),
+    ("San Jose", ("SJC",), ()),
+    ("Portland", ("PDX",), ()),
+    ("Orlando", ("MCO",), ()),
+    ("Tampa", ("TPA",), ()),
+    ("St. Louis", ("STL",), ("saint louis", "st louis")),
+    ("New Orleans", ("MSY",), ("nola",)),
+    ("Honolulu", ("HNL",), ("oahu",)),
+    ("Kansas City", ("MCI",), ()),
+    ("London", ("LHR", "LGW"), ()),
+    ("Paris", ("CDG", "ORY"), ()),
+    ("Tokyo", ("NRT", "HND"), ()),
+    ("Sydney", ("SYD",), ()),
+    ("Mexico City", ("MEX",), ("cdmx", "ciudad de mexico")),
+    ("São Paulo", ("GRU",), ()),
+    ("Montréal", ("YUL",), ()),
+    ("Zürich", ("ZRH",), ()),
+)
+
+LOCATION_LOOKUPS = metrics.counter(
+    "location_index_lookups_total", "Place names resolved through the alias index, by outcome"
+)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_CODE = re.compile(r"^[A-Za-z]{3}$")
+# Everyday words that are also airport codes: only read as a code when typed in capitals ("SEA", not "sea")
+CODE_LIKE_WORDS = {"san", "sea", "las", "los", "new", "the", "and", "for", "any", "all", "bay", "fly", "car",
+                   "hot", "day", "now", "can", "man", "max", "sun", "top", "spa", "bus", "den"}
+
+
+def normalize_place(text: Any) -> str:
+    """Lowercase, accent-free, punctuation-free form of a place name ("São Paulo" -> "sao paulo")"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    ascii_text = decomposed.encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(_NON_ALNUM.sub(" ", ascii_text).split())
+
+
+class Location:
+    __slots__ = ("id", "city", "codes", "seen")
+
+    def __init__(self, location_id: str, city: str):
+        self.id = location_id
+        self.city = city
+        self.codes: Set[str] = set()
+        # True once the city spelling has been confirmed by a real listing
+        self.seen = False
+
+
+class LocationIndex:
+    """Alias and airport-code lookups to canonical location ids, all O(1)"""
+
+    def __init__(self, known: Iterable = KNOWN_LOCATIONS):
+        self.locations: Dict[str, Location] = {}
+        # normalized name or alias -> location id
+        self.aliases: Dict[str, str] = {}
+        # upper-case IATA code -> location id
+        self.codes: Dict[str, str] = {}
+        for city, codes, aliases in known:
+            self.add(city, codes, aliases)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def add(self, city: str, codes: Iterable[str] = (), aliases: Iterable[str] = ()) -> Optional[str]:
+        """Register a city (or extend the location it already resolves to); returns its id"""
+        key = normalize_place(city)
+        if not key:
+            return None
+        location_id = self.aliases.get(key)
+        if location_id is None:
+            location_id = key.replace(" ", "-")
+            self.locations[location_id] = Location(location_id, city)
+            self.aliases[key] = location_id
+        for alias in aliases:
+            self.aliases.setdefault(normalize_place(alias), location_id)
+        for code in codes:
+            code = code.strip().upper()
+            if code:
+                self.codes.setdefault(code, location_id)
+                self.locations[location_id].codes.add(code)
+        return location_id
+
+    def _as_code(self, raw: str) -> Optional[str]:
+        """Upper-case airport code if raw should be read as one"""
+        if not _CODE.match(raw) or (raw.lower() in CODE_LIKE_WORDS and not raw.isupper()):
+            return None
+        return raw.upper() if raw.upper() in self.codes else None
+
+    def resolve(self, text: Any) -> Optional[str]:
+        """Location id for a city name, alias or airport code (None if unknown)"""
+        if not text:
+            return None
+        raw = str(text).strip()
+        location_id = None
+        code = self._as_code(raw)
+        if code:
+            location_id = self.codes[code]
+        if location_id is None:
+            location_id = self.aliases.get(normalize_place(raw))
+        LOCATION_LOOKUPS.inc(outcome="hit" if location_id else "miss")
+        return location_id
+
+    def airport_id(self, code: Any, city: Any) -> Optional[str]:
+        """Location id of a listing's airport, learning airports not seen before"""
+        code = str(code or "").strip().upper()
+        location_id = self.codes.get(code) if code else None
+        if location_id is None:
+            location_id = self.city_id(city)
+            if location_id is not None and code:
+                self.codes[code] = location_id
+                self.locations[location_id].codes.add(code)
+        elif not self.locations[location_id].seen:
+            self._confirm(location_id, city)
+        return location_id
+
+    def city_id(self, city: Any) -> Optional[str]:
+        """Location id of a hotel or car city, learning cities not seen before"""
+        key = normalize_place(city)
+        if not key:
+            return None
+        location_id = self.aliases.get(key) or self.add(str(city))
+        if not self.locations[location_id].seen:
+            self._confirm(location_id, city)
+        return location_id
+
+    def _confirm(self, location_id: str, city: Any) -> None:
+        """Adopt the services' spelling of a city ("Sao Paulo" vs "São Paulo") for upstream params"""
+        location = self.locations[location_id]
+        if city and self.aliases.get(normalize_place(city)) == location_id:
+            location.city = str(city).strip()
+            location.seen = True
+
+    def upstream_value(self, text: Any) -> Any:
+        """
+        Value to send the services for a place: the stored city name for names
+        and aliases ("NYC" -> "New York", "philly" -> "Philadelphia"). An
+        accented spelling ("São Paulo", "Zürich") is only sent once a listing
+        has confirmed the services spell it that way; until then the user's
+        text goes out unchanged, since the services match cities by regex and
+        "Sao Paulo" data would not match "São Paulo". Known airport codes are
+        kept, as the services match them exactly.
+        """
+        if not isinstance(text, str) or not text.strip():
+            return text
+        raw = text.strip()
+        code = self._as_code(raw)
+        if code:
+            return code
+        location_id = self.resolve(raw)
+        if location_id is None:
+            return text
+        location = self.locations[location_id]
+        return location.city if location.seen or location.city.isascii() else text
+
+
+# Params that name a place, per vertical
+PLACE_PARAMS = {"flights": ("to", "from"), "hotels": ("city",), "cars": ("city",)}
+
+_location_index: Optional[LocationIndex] = None
+
+
+def get_location_index() -> LocationIndex:
+    """Get or create the process-wide location index"""
+    global _location_index
+    if _location_index is None:
+        _location_index = LocationIndex()
+        metrics.gauge(
+            "location_index_size", "Locations known to the alias index",
+            callback=lambda: len(_location_index),
+        )
+    return _location_index
+
+
+def canonical_search_params(search_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Search params with place names replaced by what the services store"""
+    places = PLACE_PARAMS.get(search_type, ())
+    if not params or not any(params.get(name) for name in places):
+        return params
+    index = get_location_index()
+    canonical = dict(params)
+    for name in places:
+        if params.get(name):
+            canonical[name] = index.upstream_value(params[name])
+    return canonical
+
+
+def observe_results(search_type: str, records: Iterable[Any]) -> None:
+    """Learn the airports and cities of real listings, confirming how the services spell them"""
+    index = get_location_index()
+    if search_type == "flights":
+        for record in records:
+            for airport in (record.departure_airport, record.arrival_airport):
+                index.airport_id(airport.code, airport.city)
+    elif search_type in ("hotels", "cars"):
+        for record in records:
+            if record.city:
+                index.city_id(record.city)
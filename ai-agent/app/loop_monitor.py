@@ -0,0 +1,175 @@
+"""
+Event-loop lag monitor and blocking-call detector
+A background task sleeps LOOP_MONITOR_INTERVAL seconds at a time and records
+how late the loop wakes it up (event_loop_lag_seconds). A late wake-up means
+some callback held the loop: a sync OpenAI call, dateutil parsing or a long
+formatting loop in an async handler.
+
+Lag alone does not say which callback it was, so a watchdog thread checks the
+monitor's next expected wake-up. Once the loop is more than
+LOOP_BLOCK_THRESHOLD seconds overdue, the watchdog reads the loop thread's
+stack with sys._current_frames() while the blocking call is still running.
+Each stall is logged with where it happened (the full stack the first time a
+location is seen), counted in event_loop_blocked_total and kept in a short
+history at GET /api/debug/loop.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Dict, Optional
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+# Seconds between lag measurements
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", 0.1))
+# A callback holding the loop this long is reported as blocking
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", 0.1))
+# Stalls kept for /api/debug/loop
+LOOP_STALL_HISTORY = int(os.getenv("LOOP_STALL_HISTORY", 20))
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOOP_LAG = metrics.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran the lag monitor's wake-up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_BLOCKED = metrics.counter(
+    "event_loop_blocked_total", "Times a callback blocked the event loop longer than LOOP_BLOCK_THRESHOLD"
+)
+
+
+def _where(stack: traceback.StackSummary) -> str:
+    """Innermost frame in the agent's own code (the call that blocked), else the innermost frame"""
+    for frame in reversed(stack):
+        if frame.filename.startswith(APP_DIR):
+            return f"{os.path.basename(frame.filename)}:{frame.lineno} ({frame.name})"
+    if stack:
+        frame = stack[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} ({frame.name})"
+    return "unknown"
+
+
+class LoopMonitor:
+    """Lag measurements on the loop, plus a watchdog thread that catches blocking callbacks"""
+
+    def __init__(self, interval: float, threshold: float, history: int):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=history)
+        self.max_lag = 0.0
+        self._seen_locations = set()
+        self._loop_thread_id: Optional[int] = None
+        # perf_counter time by which the loop should have woken the monitor
+        self._due: Optional[float] = None
+        # (due, stack) captured by the watchdog for the current stall
+        self._captured: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def run(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        while True:
+            due = time.perf_counter() + self.interval
+            self._due = due
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - due, 0.0)
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            with self._lock:
+                captured, self._captured = self._captured, None
+            if lag >= self.threshold:
+                self._report(lag, captured[1] if captured and captured[0] == due else None)
+
+    def _watch(self) -> None:
+        # Check twice per threshold so a stall is caught while it is still running
+        while not self._stop.wait(self.threshold / 2):
+            due = self._due
+            if due is None or time.perf_counter() - due < self.threshold:
+                continue
+            with self._lock:
+                if self._captured is not None and self._captured[0] == due:
+                    continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            with self._lock:
+                # Keep it only if the loop was still stuck on the same wake-up
+                if self._due == due:
+                    self._captured = (due, stack)
+
+    def _report(self, lag: float, stack: Optional[traceback.StackSummary]) -> None:
+        LOOP_BLOCKED.inc()
+        where = _where(stack) if stack else "unknown (stall ended before the watchdog saw it)"
+        self.stalls.append({
+            "at": time.time(),
+            "blocked_seconds": round(lag, 4),
+            "where": where,
+            "stack": stack.format() if stack else [],
+        })
+        print(f"⚠️ [LOOP] Event loop blocked for {lag:.3f}s in {where}", flush=True)
+        if stack and where not in self._seen_locations:
+            # Full stack once per location; repeats are counted and logged on one line
+            self._seen_locations.add(where)
+            print("".join(stack.format()), end="", flush=True)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+        if self._watchdog is None:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self._due = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "block_threshold_seconds": self.threshold,
+            "measurements": LOOP_LAG.count(),
+            "lag_p50_seconds": LOOP_LAG.quantile(0.5),
+            "lag_p99_seconds": LOOP_LAG.quantile(0.99),
+            "max_lag_seconds": round(self.max_lag, 4),
+            "blocked_total": int(LOOP_BLOCKED.value()),
+            "recent_stalls": list(reversed(self.stalls)),
+        }
+
+
+_loop_monitor = None
+
+
+def get_loop_monitor() -> Optional[LoopMonitor]:
+    """Get or create the process-wide loop monitor (None when LOOP_MONITOR_ENABLED=false)"""
+    global _loop_monitor
+    if not LOOP_MONITOR_ENABLED:
+        return None
+    if _loop_monitor is None:
+        _loop_monitor = LoopMonitor(LOOP_MONITOR_INTERVAL, LOOP_BLOCK_THRESHOLD, LOOP_STALL_HISTORY)
+        metrics.gauge(
+            "event_loop_max_lag_seconds", "Largest event loop lag seen since the worker started",
+            callback=lambda: _loop_monitor.max_lag,
+        )
+    return _loop_monitor
@@ -1,32 +1,75 @@
-from fastapi import FastAPI, HTTPException, Header, Response
+from fastapi import FastAPI, HTTPException, Header, Response, WebSocket
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+from datetime import date
+import asyncio
+import hmac
 import os
-from dotenv import load_dotenv
+import time
 
+# Load .env once, before the other modules read their settings at import time
 try:
-    from .ai_service import get_chat_response, extract_search_intent
-    from .services import get_user_data, search_flights, search_hotels, search_cars, format_search_results
-    from .nlp_parser import parse_search_query, extract_location
+    from .config import load_config
+except ImportError:
+    from config import load_config
+load_config()
+
+try:
+    from .ai_service import get_chat_response, extract_search_intent_async, FALLBACK_RESPONSES
+    from .services import get_user_data, format_search_results, run_search, search_trip, invalidate_user_context, start_speculative_search, search_page, InvalidCursor
+    from .nlp_parser import parse_search_query, extract_location, parse_trip_query
     from .query_handlers import (
         get_user_bookings, get_user_favourites, format_booking_details,
+        format_booking_page, parse_booking_filters, BOOKINGS_PAGE_SIZE,
         generate_trip_planning_checklist, suggest_trip, detect_query_type,
         get_weather_info, format_weather_response
     )
+    from .response_cache import get_response_cache, is_cacheable_question, context_scope
+    from .shared_cache import get_cache, cache_stats, close_shared_cache
+    from .destination_index import get_destination_index
+    from .event_consumer import start_cache_invalidation_consumer, stop_cache_invalidation_consumer
+    from .admission import Overloaded, admission_stats
+    from .model_router import routing_stats, set_query_type, get_route, classify_error
+    from .http_client import close_http_client
+    from .warmup import start_warmup, warmup_state
+    from .inventory_snapshot import get_inventory_snapshot
+    from .ranking import rank_results, candidate_params
+    from .location_index import get_location_index
+    from .chat_stream import serve_chat_socket, Progress
+    from .records import to_dicts
+    from .loop_monitor import get_loop_monitor
+    from .profiler import profile, profiler_authorized, collapsed, top_functions, ProfilerBusy
+    from . import metrics
 except ImportError:
     # For direct execution
-    from ai_service import get_chat_response, extract_search_intent
-    from services import get_user_data, search_flights, search_hotels, search_cars, format_search_results
-    from nlp_parser import parse_search_query, extract_location
+    from ai_service import get_chat_response, extract_search_intent_async, FALLBACK_RESPONSES
+    from services import get_user_data, format_search_results, run_search, search_trip, invalidate_user_context, start_speculative_search, search_page, InvalidCursor
+    from nlp_parser import parse_search_query, extract_location, parse_trip_query
     from query_handlers import (
         get_user_bookings, get_user_favourites, format_booking_details,
+        format_booking_page, parse_booking_filters, BOOKINGS_PAGE_SIZE,
         generate_trip_planning_checklist, suggest_trip, detect_query_type,
         get_weather_info, format_weather_response
     )
+    from response_cache import get_response_cache, is_cacheable_question, context_scope
+    from shared_cache import get_cache, cache_stats, close_shared_cache
+    from destination_index import get_destination_index
+    from event_consumer import start_cache_invalidation_consumer, stop_cache_invalidation_consumer
+    from admission import Overloaded, admission_stats
+    from model_router import routing_stats, set_query_type, get_route, classify_error
+    from http_client import close_http_client
+    from warmup import start_warmup, warmup_state
+    from inventory_snapshot import get_inventory_snapshot
+    from ranking import rank_results, candidate_params
+    from location_index import get_location_index
+    from chat_stream import serve_chat_socket, Progress
+    from records import to_dicts
+    from loop_monitor import get_loop_monitor
+    from profiler import profile, profiler_authorized, collapsed, top_functions, ProfilerBusy
+    import metrics
 
-# Load environment variables - try multiple paths
-import pathlib
 import sys
 
 # Force flush stdout for immediate logging
@@ -34,15 +77,6 @@ def log_print(*args, **kwargs):
     print(*args, **kwargs, flush=True)
     sys.stdout.flush()
 
-env_path = pathlib.Path(__file__).parent.parent / ".env"
-if env_path.exists():
-    load_dotenv(env_path)
-else:
-    # Try current directory
-    load_dotenv()
-    # Also try parent directory
-    load_dotenv(pathlib.Path(__file__).parent.parent.parent / ".env")
-
 app = FastAPI(title="Kayak AI Agent", version="1.0.0")
 
 # CORS middleware - MUST be added FIRST
@@ -85,11 +119,13 @@ class ChatRequest(BaseModel):
     message: str
     conversation_history: Optional[List[ChatMessage]] = []
     user_id: Optional[str] = None
+    cursor: Optional[str] = None  # next_cursor from a previous paginated response
 
 class ChatResponse(BaseModel):
     response: str
     search_results: Optional[Dict[str, Any]] = None
     search_type: Optional[str] = None
+    next_cursor: Optional[str] = None
 
 @app.options("/api/chat")
 async def options_chat():
@@ -104,6 +140,52 @@ async def options_chat():
         }
     )
 
+CHAT_LATENCY = metrics.histogram(
+    "chat_request_duration_seconds", "Time to answer /api/chat, by detected query type"
+)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    log_print(f"⚠️ [ADMISSION] {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The assistant is busy right now. Please try again shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if get_loop_monitor() is not None:
+        get_loop_monitor().start()
+    get_destination_index().start()
+    if get_inventory_snapshot() is not None:
+        get_inventory_snapshot().start()
+    await start_cache_invalidation_consumer()
+    # Runs after startup returns, i.e. while the server is already accepting connections
+    start_warmup()
+
+@app.on_event("shutdown")
+async def shutdown_shared_cache():
+    await stop_cache_invalidation_consumer()
+    await get_destination_index().stop()
+    if get_inventory_snapshot() is not None:
+        await get_inventory_snapshot().stop()
+    await close_shared_cache()
+    await close_http_client()
+    if get_loop_monitor() is not None:
+        await get_loop_monitor().stop()
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the background warm-up has finished"""
+    summary = warmup_state.summary()
+    return JSONResponse(status_code=200 if summary["ready"] else 503, content=summary)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics for this worker"""
+    return Response(content=metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     try:
@@ -122,6 +204,41 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
     """
     Main chat endpoint for AI agent
     """
+    started = time.perf_counter()
+    try:
+        return await handle_chat(request, authorization)
+    finally:
+        CHAT_LATENCY.observe(time.perf_counter() - started, route=detect_query_type(request.message))
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """
+    Progressive chat: intent, then each vertical's results, then the reply text
+    as separate frames (see chat_stream.py for the protocol)
+    """
+    async def run_turn(payload: Dict[str, Any], authorization: Optional[str], progress: Progress) -> ChatResponse:
+        request = ChatRequest(**payload)
+        started = time.perf_counter()
+        try:
+            return await handle_chat(request, authorization, progress)
+        finally:
+            CHAT_LATENCY.observe(time.perf_counter() - started, route=detect_query_type(request.message))
+    
+    await serve_chat_socket(websocket, run_turn)
+
+# Query types answered without a search - their intent is known once detected
+DIRECT_QUERY_TYPES = ("booking_details", "trip_planning", "trip_suggestions", "weather")
+
+async def handle_chat(request: ChatRequest, authorization: Optional[str], progress: Optional[Progress] = None) -> ChatResponse:
+    """
+    Answer one chat message. progress, if given, is awaited with each partial
+    frame (the resolved intent, then each vertical's results) as soon as it is
+    known; /ws/chat uses it to stream, /api/chat passes none.
+    """
+    async def emit(frame_type: str, **fields):
+        if progress is not None:
+            await progress(frame_type, **fields)
+    
     # Ensure extract_location is available (import at function start to avoid scoping issues)
     try:
         from .nlp_parser import extract_location as _extract_location_func
@@ -143,7 +260,11 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
         user_data = None
         log_print(f"🔍 [USER] Request user_id: {request.user_id}")
         if request.user_id:
-            user_data = await get_user_data(request.user_id, token)
+            try:
+                user_data = await get_user_data(request.user_id, token, degrade=True)
+            except Overloaded:
+                # Context only personalizes the answer - go on without it
+                log_print(f"⚠️ [ADMISSION] Upstream pool saturated, answering without user context")
             if user_data:
                 user_context = {
                     "preferences": user_data.get("travelPreferences", {}),
@@ -154,10 +275,14 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
         
         # Detect query type
         query_type = detect_query_type(request.message)
+        # LLM calls made for this message are accounted under its query type
+        set_query_type(query_type)
         log_print(f"🔍 [CHAT] Received message: '{request.message}'")
         log_print(f"🔍 [CHAT] User ID: {request.user_id}")
         log_print(f"🔍 [CHAT] Detected query type: {query_type}")
         log_print(f"🔍 [CHAT] Has token: {bool(token)}")
+        if query_type in DIRECT_QUERY_TYPES:
+            await emit("intent", query_type=query_type, search_type=None, params={})
         
         # Handle special query types
         if query_type == "booking_details":
@@ -177,37 +302,39 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
                 return ChatResponse(response=ai_response, search_results=None, search_type=None)
             
             log_print(f"🔍 [BOOKINGS] Fetching bookings for user_id: {request.user_id}")
+            next_cursor = None
             try:
                 bookings = await get_user_bookings(request.user_id, token)
                 log_print(f"✅ [BOOKINGS] Retrieved {len(bookings) if bookings else 0} bookings")
                 if bookings and len(bookings) > 0:
+                    booking_filters = parse_booking_filters(request.message, bookings)
+                    log_print(f"🔍 [BOOKINGS] Filters: {booking_filters}, cursor: {request.cursor}")
                     try:
-                        booking_text = format_booking_details(bookings)
+                        booking_text, next_cursor = format_booking_page(bookings, booking_filters, request.cursor)
                         ai_response = f"Here are your booking details:\n\n{booking_text}"
                     except Exception as format_error:
                         log_print(f"❌ [BOOKINGS] Error formatting booking details: {format_error}")
                         import traceback
                         traceback.print_exc()
                         sys.stdout.flush()
-                        # Fallback to simple format
+                        # Fallback to simple format (first page only)
                         booking_list = []
-                        for i, booking in enumerate(bookings, 1):
-                            booking_type = booking.get("type", "unknown")
-                            booking_id = booking.get("bookingId", "N/A")
-                            status = booking.get("status", "unknown")
-                            details = booking.get("details", {})
-                            price = details.get("totalAmountPaid", 0)
-                            booking_list.append(f"{i}. {booking_type.title()} {booking_id}: ${price:.2f} • {status.title()}")
+                        for i, booking in enumerate(bookings[:BOOKINGS_PAGE_SIZE], 1):
+                            booking_type = booking.type or "unknown"
+                            status = booking.status or "unknown"
+                            booking_list.append(f"{i}. {booking_type.title()} {booking.id or 'N/A'}: ${booking.amount:.2f} • {status.title()}")
                         ai_response = f"Here are your booking details:\n\n" + "\n".join(booking_list)
                 else:
                     ai_response = "You don't have any bookings yet. Would you like to search for flights, hotels, or cars?"
+            except Overloaded:
+                raise
             except Exception as booking_error:
                 log_print(f"❌ [BOOKINGS] Error fetching bookings: {booking_error}")
                 import traceback
                 traceback.print_exc()
                 sys.stdout.flush()
                 ai_response = "I'm having trouble accessing your booking information right now. Please try again in a moment."
-            return ChatResponse(response=ai_response, search_results=None, search_type=None)
+            return ChatResponse(response=ai_response, search_results=None, search_type=None, next_cursor=next_cursor)
         
         elif query_type == "trip_planning":
             # Extract destination if mentioned
@@ -257,6 +384,8 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
                             ai_response = f"I'd love to help you with weather information for {location}! However, the weather API key is not configured. Please add WEATHER_API_KEY to your .env file to enable weather queries.\n\nFor now, would you like me to search for flights, hotels, or cars in {location} instead?"
                         else:
                             ai_response = f"I couldn't fetch weather information for {location} right now. Please make sure the location name is correct, or try again later."
+                except Overloaded:
+                    raise
                 except Exception as weather_error:
                     log_print(f"❌ [WEATHER] Error fetching weather: {weather_error}")
                     import traceback
@@ -271,22 +400,68 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
                 ai_response = "I'd be happy to help you with weather information! Please specify a location, for example: 'What is the weather in Sunnyvale?' or 'Weather in New York'"
             return ChatResponse(response=ai_response, search_results=None, search_type=None)
         
+        elif query_type == "trip_search":
+            trip = parse_trip_query(request.message)
+            log_print(f"🧳 [TRIP] Parsed trip: {trip}")
+            if not trip.get("destination"):
+                await emit("intent", query_type=query_type, search_type=None, params={})
+                ai_response = "I'd love to help plan your trip! Where would you like to go, and when?"
+                return ChatResponse(response=ai_response, search_results=None, search_type=None)
+            
+            await emit("intent", query_type=query_type, search_type="trip", params=trip)
+            ranked = {}
+            async def on_vertical(search_type: str, items: List[Any], params: Dict[str, Any]):
+                # The trip's dates feed the timing feature, as in a single-vertical search
+                ranked[search_type] = rank_results(search_type, items, user_context, params)
+                await emit("results", search_type=search_type, results=to_dicts(ranked[search_type][:10]), count=len(items))
+            
+            trip_search = await search_trip(trip, on_result=on_vertical)
+            trip_results = {search_type: ranked.get(search_type, []) for search_type in trip_search["results"]}
+            ai_response = format_trip_response(trip, trip_results, trip_search["timed_out"] + trip_search["failed"])
+            search_results_data = {
+                search_type: to_dicts(items[:10]) for search_type, items in trip_results.items() if items
+            }
+            return ChatResponse(
+                response=ai_response,
+                search_results=search_results_data or None,
+                search_type="trip" if search_results_data else None
+            )
+        
         # Check if message contains search intent
         search_intent = None
+        speculative = None
+        # Intents depend on today's date ("tomorrow", "next week"), so it is part of the key
+        intent_cache = get_cache("intent")
+        intent_cache_key = f"{date.today().isoformat()}:{' '.join(request.message.lower().split())}"
         try:
-            log_print(f"🔍 [CHAT] Extracting search intent...")
-            search_intent = extract_search_intent(request.message)
-            log_print(f"✅ [CHAT] Extracted search intent: {search_intent}")
+            search_intent = await intent_cache.get(intent_cache_key)
+            if search_intent is not None:
+                log_print(f"✅ [CACHE] Intent cache hit: {search_intent}")
+            else:
+                # Start the search the rule-based parser expects while the LLM works out the intent
+                guess = parse_search_query(request.message)
+                if guess and isinstance(guess.get("params"), dict):
+                    guess["params"] = candidate_params(guess.get("type"), guess["params"])
+                speculative = start_speculative_search(guess)
+                log_print(f"🔍 [CHAT] Extracting search intent...")
+                search_intent = await extract_search_intent_async(request.message)
+                log_print(f"✅ [CHAT] Extracted search intent: {search_intent}")
+                if search_intent and isinstance(search_intent, dict) and search_intent.get("type"):
+                    await intent_cache.set(intent_cache_key, search_intent)
+        except asyncio.CancelledError:
+            if speculative:
+                speculative.discard()
+            raise
         except Exception as e:
-            error_str = str(e).lower()
-            if "quota" in error_str or "429" in error_str or "rate limit" in error_str or "insufficient_quota" in error_str:
+            reason = classify_error(e)
+            if reason == "quota":
                 log_print(f"⚠️ [CHAT] OpenAI quota exceeded, using fallback parser")
             else:
                 log_print(f"❌ [CHAT] Error in extract_search_intent: {e}")
                 import traceback
                 traceback.print_exc()
             # Fallback to basic parser
-            from .nlp_parser import parse_search_query
+            get_route("intent").record_rule_fallback(reason)
             search_intent = parse_search_query(request.message)
             log_print(f"✅ [CHAT] Fallback parser result: {search_intent}")
         
@@ -317,17 +492,16 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
             # Validate that we have required params for flights
             if search_type == "flights" and not params.get("to") and not params.get("from"):
                 print("WARNING: Flight search without destination or origin - this will return all flights!")
+            await emit("intent", query_type=query_type, search_type=search_type, params=params)
             
             # Perform search based on type
             try:
                 log_print(f"🔍 [SEARCH] Performing {search_type} search with params: {params}")
-                results = []
-                if search_type == "flights":
-                    results = await search_flights(params)
-                elif search_type == "hotels":
-                    results = await search_hotels(params)
-                elif search_type == "cars":
-                    results = await search_cars(params)
+                # Fetch a wider candidate set when the results will be ranked
+                params = candidate_params(search_type, params)
+                results = await speculative.take(search_type, params) if speculative else None
+                if results is None:
+                    results = await run_search(search_type, params)
                 log_print(f"✅ [SEARCH] Got {len(results)} results")
                 
                 # Only set search results if we actually found some
@@ -337,20 +511,27 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
                         if params.get("to"):
                             destination = params.get("to", "").lower().strip()
                             print(f"Filtering {len(results)} flights for destination: '{destination}'")
-                            # Filter to ensure results actually match the destination (exact or partial match)
-                            filtered_results = []
-                            for r in results:
-                                arrival_city = r.get("arrivalAirport", {}).get("city", "").lower().strip()
-                                # Check if destination matches arrival city
-                                if destination in arrival_city or arrival_city in destination:
-                                    filtered_results.append(r)
+                            # Filter to ensure results actually match the destination:
+                            # compare canonical location ids ("NYC", "JFK" and "New York" are the same place)
+                            location_index = get_location_index()
+                            arrival_ids = [location_index.airport_id(r.arrival_airport.code, r.arrival_airport.city) for r in results]
+                            destination_id = location_index.resolve(destination)
+                            if destination_id is not None:
+                                filtered_results = [r for r, arrival_id in zip(results, arrival_ids) if arrival_id == destination_id]
+                            else:
+                                # Place the index has never seen - fall back to a partial name match
+                                filtered_results = []
+                                for r in results:
+                                    arrival_city = r.arrival_airport.city.lower()
+                                    if destination in arrival_city or arrival_city in destination:
+                                        filtered_results.append(r)
                             
                             if filtered_results:
                                 results = filtered_results
                                 print(f"✓ Filtered to {len(results)} flights matching destination '{params.get('to')}'")
                             else:
                                 print(f"✗ WARNING: No flights match destination '{params.get('to')}'")
-                                print(f"  Sample arrival cities: {[r.get('arrivalAirport', {}).get('city') for r in results[:3]]}")
+                                print(f"  Sample arrival cities: {[r.arrival_airport.city for r in results[:3]]}")
                                 results = []
                         elif params.get("from"):
                             # If only origin specified, that's okay
@@ -367,23 +548,24 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
                             original_count = len(results)
                             filtered_results = [
                                 r for r in results
-                                if r.get("company", "").lower() == requested_make
+                                if r.company.lower() == requested_make
                             ]
                             if filtered_results:
                                 results = filtered_results
                                 print(f"✓ Double-check: Filtered {original_count} → {len(results)} cars matching make '{params.get('make')}'")
                             else:
                                 print(f"✗ No cars match make '{params.get('make')}' after filtering")
-                                print(f"  Sample makes in results: {set(r.get('company') for r in results[:10])}")
+                                print(f"  Sample makes in results: {set(r.company for r in results[:10])}")
                                 results = []
                     
                     if results and len(results) > 0:
+                        results = rank_results(search_type, results, user_context, params)
                         if search_type == "flights":
-                            search_results_data = {"flights": results[:10]}  # Limit to 10
+                            search_results_data = {"flights": to_dicts(results[:10])}  # Limit to 10
                         elif search_type == "hotels":
-                            search_results_data = {"hotels": results[:10]}
+                            search_results_data = {"hotels": to_dicts(results[:10])}
                         elif search_type == "cars":
-                            search_results_data = {"cars": results[:10]}
+                            search_results_data = {"cars": to_dicts(results[:10])}
                         
                         # Format results for LLM
                         search_results_text = format_search_results(search_type, results)
@@ -395,6 +577,8 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
                     print(f"No {search_type} found for params: {params}")
                     search_results_data = None
                     search_results_text = None
+            except Overloaded:
+                raise
             except Exception as search_error:
                 print(f"Error performing search: {search_error}")
                 import traceback
@@ -402,6 +586,14 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
                 results = []
                 search_results_data = None
                 search_results_text = None
+        else:
+            await emit("intent", query_type=query_type, search_type=None, params={})
+        
+        if speculative:
+            speculative.discard()
+        if search_type:
+            shown = (search_results_data or {}).get(search_type, [])
+            await emit("results", search_type=search_type, results=shown, count=len(results) if shown else 0)
         
         # Build conversation history
         messages = []
@@ -443,13 +635,27 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
                     enhanced_context["user_name"] = user_data.get("firstName", "") or user_data.get("name", "")
                     enhanced_context["user_email"] = user_data.get("email", "")
                 
-                log_print(f"🔍 [AI] Calling OpenAI API...")
-                ai_response = await get_chat_response(
-                    messages=messages,
-                    user_context=enhanced_context if enhanced_context else None,
-                    search_results=search_results_text
-                )
-                log_print(f"✅ [AI] Got AI response: {ai_response[:100]}...")
+                # Self-contained questions can be answered from the similarity cache
+                response_cache = get_response_cache()
+                cache_scope = context_scope(enhanced_context)
+                use_cache = response_cache is not None and is_cacheable_question(request.message)
+                if use_cache:
+                    ai_response = response_cache.get(request.message, scope=cache_scope)
+                    if ai_response:
+                        log_print(f"✅ [CACHE] Response cache hit for: '{request.message}'")
+                
+                if not ai_response:
+                    log_print(f"🔍 [AI] Calling OpenAI API...")
+                    ai_response = await get_chat_response(
+                        messages=messages,
+                        user_context=enhanced_context if enhanced_context else None,
+                        search_results=search_results_text
+                    )
+                    log_print(f"✅ [AI] Got AI response: {ai_response[:100]}...")
+                    if use_cache and ai_response and ai_response not in FALLBACK_RESPONSES:
+                        response_cache.set(request.message, ai_response, scope=cache_scope)
+            except Overloaded:
+                raise
             except Exception as ai_error:
                 error_str = str(ai_error).lower()
                 if "quota" in error_str or "429" in error_str or "rate limit" in error_str or "insufficient_quota" in error_str:
@@ -505,6 +711,8 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
             search_type=search_type
         )
         
+    except Overloaded:
+        raise
     except Exception as e:
         log_print(f"❌ [CHAT] Error in chat endpoint: {e}")
         import traceback
@@ -518,6 +726,25 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
             search_type=None
         )
 
+def format_trip_response(trip: Dict[str, Any], results: Dict[str, List[Dict[str, Any]]], unavailable: List[str]) -> str:
+    """Merged reply for a whole-trip search"""
+    destination = trip["destination"]
+    heading = f"🧳 Here's your trip to {destination}"
+    if trip.get("startDate") and trip.get("endDate"):
+        heading += f" ({trip['startDate']} to {trip['endDate']})"
+    sections = [heading + ":"]
+    
+    labels = {"flights": "✈️ Flights", "hotels": "🏨 Hotels", "cars": "🚗 Cars"}
+    for search_type, label in labels.items():
+        items = results.get(search_type, [])
+        if search_type in unavailable:
+            sections.append(f"{label}: couldn't be loaded in time - ask again in a moment to retry.")
+        elif items:
+            sections.append(f"{label} ({len(items)} found):\n{format_search_results(search_type, items, limit=3)}")
+        else:
+            sections.append(f"{label}: none found for {destination}.")
+    return "\n\n".join(sections)
+
 @app.get("/api/debug/search-intent")
 async def debug_search_intent(message: str):
     """Debug endpoint to test search intent extraction"""
@@ -533,33 +760,133 @@ async def debug_search_intent(message: str):
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/api/debug/response-cache")
+async def debug_response_cache():
+    """Debug endpoint to inspect the conversational response cache"""
+    response_cache = get_response_cache()
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+@app.get("/api/debug/caches")
+async def debug_caches():
+    """Debug endpoint to inspect the shared intent/search/user caches of this worker"""
+    snapshot = get_inventory_snapshot()
+    return {
+        "pid": os.getpid(),
+        "caches": cache_stats(),
+        "inventory_snapshot": snapshot.stats() if snapshot is not None else None,
+    }
+
+@app.get("/api/debug/admission")
+async def debug_admission():
+    """Debug endpoint to inspect admission pools of this worker"""
+    return {"pid": os.getpid(), "pools": admission_stats()}
+
+@app.get("/api/debug/models")
+async def debug_models():
+    """Debug endpoint to inspect per-task model routing of this worker"""
+    return {"pid": os.getpid(), "routes": routing_stats()}
+
+@app.get("/api/debug/loop")
+async def debug_loop():
+    """Debug endpoint to inspect event loop lag and recent blocking calls in this worker"""
+    monitor = get_loop_monitor()
+    if monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, "pid": os.getpid(), **monitor.stats()}
+
+@app.get("/api/debug/profile")
+async def debug_profile(
+    seconds: float = 10.0,
+    interval_ms: Optional[float] = None,
+    summary: bool = False,
+    top: int = 25,
+    idle: bool = False,
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Sample every thread of this worker for `seconds` and return collapsed stacks
+    (flamegraph input), or JSON with the stacks and a top-functions summary
+    when summary=true. Blocked threads are left out unless idle=true.
+    Requires Authorization: Bearer <PROFILER_TOKEN>.
+    """
+    if not profiler_authorized(authorization):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid PROFILER_TOKEN")
+    try:
+        profiler = await profile(seconds, interval_ms)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    stacks = profiler.stacks + profiler.idle_stacks if idle else profiler.stacks
+    if not summary:
+        return Response(content=collapsed(stacks), media_type="text/plain")
+    return {
+        "pid": os.getpid(),
+        "samples": profiler.samples,
+        "interval_ms": profiler.interval * 1000,
+        "busy_samples": sum(profiler.stacks.values()),
+        "idle_samples": sum(profiler.idle_stacks.values()),
+        "top_functions": top_functions(stacks, top),
+        "collapsed": collapsed(stacks),
+    }
+
+# Shared secret for debug endpoints that change state; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def admin_authorized(authorization: Optional[str]) -> bool:
+    """True when the bearer token matches ADMIN_TOKEN (always False while it is unset)"""
+    if not ADMIN_TOKEN or not authorization or not authorization.startswith("Bearer "):
+        return False
+    return hmac.compare_digest(authorization[7:].encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+@app.delete("/api/debug/caches/user/{user_id}")
+async def debug_invalidate_user(user_id: str, authorization: Optional[str] = Header(None)):
+    """
+    Drop a user's cached profile, bookings, favourites and private answers.
+    Requires Authorization: Bearer <ADMIN_TOKEN>.
+    """
+    if not admin_authorized(authorization):
+        raise HTTPException(status_code=403, detail="Invalidating user caches requires a valid ADMIN_TOKEN")
+    response_cache = get_response_cache()
+    return {
+        "user_id": user_id,
+        "user_entries": await invalidate_user_context(user_id),
+        "response_entries": response_cache.invalidate_user(user_id) if response_cache is not None else 0,
+    }
+
+class SearchRequest(BaseModel):
+    message: str
+    limit: Optional[int] = None  # page size, default SEARCH_PAGE_LIMIT
+    cursor: Optional[str] = None  # next_cursor from the previous page
+
 @app.post("/api/search")
-async def smart_search(request: ChatRequest):
+async def smart_search(request: SearchRequest):
     """
-    Smart search endpoint - parses natural language and returns search results
+    Smart search endpoint - parses natural language and returns one page of search results
     """
     try:
         # Parse query
         parsed = parse_search_query(request.message)
         search_type = parsed["type"]
         params = parsed["params"]
+        if search_type not in ("flights", "hotels", "cars"):
+            return {"success": True, "type": search_type, "results": [], "params": params, "next_cursor": None}
         
-        # Perform search
-        results = []
-        if search_type == "flights":
-            results = await search_flights(params)
-        elif search_type == "hotels":
-            results = await search_hotels(params)
-        elif search_type == "cars":
-            results = await search_cars(params)
+        # Fetch only the requested page from the service
+        results, page_params, next_cursor = await search_page(search_type, params, request.limit, request.cursor)
         
         return {
             "success": True,
             "type": search_type,
-            "results": results[:20],  # Limit to 20 results
-            "params": params
+            "results": to_dicts(results),
+            "params": page_params,
+            "next_cursor": next_cursor,
         }
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded:
+        raise
     except Exception as e:
         print(f"Error in smart search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -567,4 +894,19 @@ async def smart_search(request: ChatRequest):
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("AI_AGENT_WORKERS", os.getenv("WEB_CONCURRENCY", 1)))
+    if workers > 1:
+        # Workers are separate processes, so uvicorn needs an import string rather than the app object
+        app_path = f"{__package__}.main:app" if __package__ else "main:app"
+        log_print(f"🚀 [SERVER] Starting {workers} workers on port {port}")
+        if os.getenv("SHARED_CACHE_BACKEND", "local").lower() != "redis":
+            log_print("⚠️ [SERVER] SHARED_CACHE_BACKEND is not redis - each worker keeps its own caches")
+        uvicorn.run(
+            app_path,
+            host="0.0.0.0",
+            port=port,
+            workers=workers,
+            timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,260 @@
+"""
+Per-task model routing for OpenAI calls
+Intent extraction and chat each get their own model, max_tokens and timeout.
+When the primary model's recent p95 latency goes over the task's budget,
+calls move to the fallback model until the slow samples age out of the window.
+
+Every call is also accounted for: queue wait (admission pool and worker
+thread) and provider time, prompt/completion tokens, outcome and an estimated
+cost from LLM_PRICES, labelled by task and by the chat query type that made
+the call (set_query_type, carried into the worker thread by contextvars).
+Requests the rule-based parser answers instead (pool saturated, no API key,
+failed call) are counted as rule fallbacks with their reason.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+# task -> (max_tokens, timeout seconds, p95 latency budget seconds, temperature)
+TASK_DEFAULTS = {
+    "intent": (200, 5.0, 2.0, 0.1),
+    "chat": (500, 20.0, 8.0, 0.7),
+}
+# Cheaper/faster model used when the primary is over budget
+DEFAULT_FALLBACK_MODEL = "gpt-3.5-turbo"
+
+# Only this recent history decides whether the primary is too slow
+LATENCY_WINDOW_SECONDS = 300
+MIN_SAMPLES = 10
+
+# USD per 1M tokens (prompt, completion); the longest matching prefix of the model name wins.
+# LLM_PRICES='{"my-model": [1.0, 2.0]}' adds or overrides entries.
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4": (30.00, 60.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+LLM_LATENCY = metrics.histogram(
+    "llm_request_duration_seconds", "OpenAI provider latency by task, query type and model"
+)
+LLM_QUEUE_WAIT = metrics.histogram(
+    "llm_queue_wait_seconds", "Time an OpenAI call waited for an admission slot and a worker thread, by task and query type",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0),
+)
+LLM_REQUESTS = metrics.counter(
+    "llm_requests_total", "OpenAI calls by task, query type, model and outcome"
+)
+LLM_TOKENS = metrics.counter(
+    "llm_tokens_total", "OpenAI tokens by task, query type, model and kind (prompt/completion)"
+)
+LLM_PROMPT_TOKENS = metrics.histogram(
+    "llm_prompt_tokens", "Prompt size of OpenAI calls in tokens, by task and query type",
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000),
+)
+LLM_COST = metrics.counter(
+    "llm_cost_usd_total", "Estimated OpenAI spend in USD by task, query type and model"
+)
+LLM_FALLBACKS = metrics.counter(
+    "llm_fallback_total", "OpenAI calls routed to the fallback model because the primary was over budget"
+)
+LLM_RULE_FALLBACKS = metrics.counter(
+    "llm_rule_fallback_total", "Requests answered by the rule-based parser instead of OpenAI, by task, query type and reason"
+)
+
+
+# Chat query type of the request making LLM calls ("search", "trip_planning", ...)
+_query_type: ContextVar[str] = ContextVar("llm_query_type", default="unknown")
+
+
+def set_query_type(query_type: Optional[str]) -> None:
+    """Label the LLM calls made by the current request with its query type"""
+    _query_type.set(query_type or "unknown")
+
+
+def _load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_PRICES)
+    raw = os.getenv("LLM_PRICES")
+    if raw:
+        try:
+            prices.update({model: (float(p), float(c)) for model, (p, c) in json.loads(raw).items()})
+        except (ValueError, TypeError) as e:
+            print(f"⚠️ [LLM] Ignoring invalid LLM_PRICES: {e}", flush=True)
+    return prices
+
+
+PRICES = _load_prices()
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call (0 for models without a price)"""
+    matches = [name for name in PRICES if model.startswith(name)]
+    if not matches:
+        return 0.0
+    prompt_price, completion_price = PRICES[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def classify_error(error: Exception) -> str:
+    """Outcome label for a failed OpenAI call: quota, timeout or error"""
+    text = str(error).lower()
+    if "quota" in text or "429" in text or "rate limit" in text or type(error).__name__ == "RateLimitError":
+        return "quota"
+    if "timeout" in type(error).__name__.lower() or "timed out" in text:
+        return "timeout"
+    return "error"
+
+
+class ModelRoute:
+    """Model choice and limits for one task"""
+
+    def __init__(self, task: str, model: str, fallback_model: Optional[str], max_tokens: int,
+                 timeout: float, latency_budget: float, temperature: float):
+        self.task = task
+        self.model = model
+        self.fallback_model = fallback_model if fallback_model != model else None
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.latency_budget = latency_budget
+        self.temperature = temperature
+        # model -> deque of (timestamp, seconds)
+        self._samples: Dict[str, deque] = {}
+        # (query type, model) -> running totals for /api/debug/models
+        self._usage: Dict[Tuple[str, str], Dict[str, float]] = {}
+        # (query type, reason) -> requests answered by the rule-based parser
+        self._rule_fallbacks: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def recent_p95(self, model: str) -> Optional[float]:
+        """p95 latency of the model over the window (None with too few samples)"""
+        cutoff = time.time() - LATENCY_WINDOW_SECONDS
+        with self._lock:
+            samples = self._samples.get(model)
+            if not samples:
+                return None
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            if len(samples) < MIN_SAMPLES:
+                return None
+            durations = sorted(seconds for _, seconds in samples)
+        return durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+
+    def choose_model(self) -> str:
+        if self.fallback_model:
+            p95 = self.recent_p95(self.model)
+            if p95 is not None and p95 > self.latency_budget:
+                LLM_FALLBACKS.inc(task=self.task, model=self.model)
+                return self.fallback_model
+        return self.model
+
+    def record(self, model: str, seconds: float, outcome: str, usage: Any = None, queue_seconds: float = 0.0) -> None:
+        """
+        Account for one call. seconds is the provider time; outcome is success,
+        parse_failure, quota, timeout or error (a success on the fallback model
+        is counted as fallback).
+        """
+        query_type = _query_type.get()
+        if outcome == "success" and model == self.fallback_model:
+            outcome = "fallback"
+        prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+        completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        labels = {"task": self.task, "query_type": query_type}
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=500)).append((time.time(), seconds))
+            totals = self._usage.setdefault((query_type, model), {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+                "provider_seconds": 0.0, "queue_seconds": 0.0,
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cost_usd"] += cost
+            totals["provider_seconds"] += seconds
+            totals["queue_seconds"] += queue_seconds
+        LLM_LATENCY.observe(seconds, model=model, **labels)
+        LLM_QUEUE_WAIT.observe(queue_seconds, **labels)
+        LLM_REQUESTS.inc(model=model, outcome=outcome, **labels)
+        if usage is not None:
+            LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt", **labels)
+            LLM_TOKENS.inc(completion_tokens, model=model, kind="completion", **labels)
+            LLM_PROMPT_TOKENS.observe(prompt_tokens, **labels)
+            LLM_COST.inc(cost, model=model, **labels)
+        print(
+            f"📊 [LLM] {self.task}/{query_type} {model} {outcome}: queue {queue_seconds:.3f}s, "
+            f"provider {seconds:.3f}s, tokens {prompt_tokens}+{completion_tokens}, ~${cost:.5f}",
+            flush=True,
+        )
+
+    def record_rule_fallback(self, reason: str) -> None:
+        """
+        Account for a request the rule-based parser answered instead of the
+        model. reason is overloaded, no_api_key, or the outcome of the failed
+        call (parse_failure, quota, timeout, error), which record() has already
+        counted as a call.
+        """
+        query_type = _query_type.get()
+        with self._lock:
+            key = (query_type, reason)
+            self._rule_fallbacks[key] = self._rule_fallbacks.get(key, 0) + 1
+        LLM_RULE_FALLBACKS.inc(task=self.task, query_type=query_type, reason=reason)
+        print(f"📊 [LLM] {self.task}/{query_type} rule_fallback: {reason}", flush=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "fallback_model": self.fallback_model,
+            "max_tokens": self.max_tokens,
+            "timeout": self.timeout,
+            "latency_budget": self.latency_budget,
+            "p95": {model: self.recent_p95(model) for model in list(self._samples)},
+            "usage": [
+                {"query_type": query_type, "model": model, **{k: round(v, 6) for k, v in totals.items()}}
+                for (query_type, model), totals in list(self._usage.items())
+            ],
+            "rule_fallbacks": [
+                {"query_type": query_type, "reason": reason, "requests": count}
+                for (query_type, reason), count in list(self._rule_fallbacks.items())
+            ],
+        }
+
+
+_routes: Dict[str, ModelRoute] = {}
+
+
+def get_route(task: str) -> ModelRoute:
+    """
+    Get or create the route for a task. Configured with <TASK>_MODEL,
+    <TASK>_FALLBACK_MODEL, <TASK>_MAX_TOKENS, <TASK>_TIMEOUT and
+    <TASK>_LATENCY_BUDGET; the model defaults to OPENAI_MODEL.
+    """
+    route = _routes.get(task)
+    if route is None:
+        max_tokens, timeout, budget, temperature = TASK_DEFAULTS[task]
+        env_prefix = task.upper()
+        route = ModelRoute(
+            task,
+            model=os.getenv(f"{env_prefix}_MODEL") or os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+            fallback_model=os.getenv(f"{env_prefix}_FALLBACK_MODEL", DEFAULT_FALLBACK_MODEL) or None,
+            max_tokens=int(os.getenv(f"{env_prefix}_MAX_TOKENS", max_tokens)),
+            timeout=float(os.getenv(f"{env_prefix}_TIMEOUT", timeout)),
+            latency_budget=float(os.getenv(f"{env_prefix}_LATENCY_BUDGET", budget)),
+            temperature=temperature,
+        )
+        _routes[task] = route
+    return route
+
+
+def routing_stats() -> Dict[str, Any]:
+    return {task: route.stats() for task, route in _routes.items()}
@@ -2,9 +2,13 @@
 Natural Language Processing utilities for parsing user queries
 """
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
-from dateutil import parser as date_parser
+
+try:
+    from .location_index import get_location_index
+except ImportError:
+    from location_index import get_location_index
 
 def parse_date_mention(text: str) -> Optional[str]:
     """Extract and parse date mentions from text"""
@@ -13,6 +17,7 @@ def parse_date_mention(text: str) -> Optional[str]:
         r'\b(today|tomorrow|next week|next month)\b',
         r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b',  # MM/DD/YYYY
         r'\b(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2})(?:st|nd|rd|th)?\b',
+        r'\b(Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sept?|Oct|Nov|Dec)\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b',  # Dec 20
         r'\b(in|on|by)\s+(\d{1,2})\s+(days?|weeks?|months?)\b',
     ]
     
@@ -33,6 +38,7 @@ def parse_date_mention(text: str) -> Optional[str]:
         match = re.search(pattern, text, re.IGNORECASE)
         if match:
             try:
+                from dateutil import parser as date_parser
                 date_str = match.group(0)
                 parsed_date = date_parser.parse(date_str, fuzzy=True)
                 return parsed_date.strftime('%Y-%m-%d')
@@ -203,3 +209,114 @@ def extract_make(text: str) -> Optional[str]:
     
     return None
 
+
+# Date words that extract_location can swallow after a city ("to Denver next weekend")
+TRAILING_DATE_WORDS = {"next", "this", "on", "for", "in", "from", "tomorrow", "today", "tonight", "weekend", "week", "month",
+                       "with", "and", "please", "my", "the", "a", "around", "starting", "leaving"}
+DEFAULT_TRIP_NIGHTS = 3
+# "I want to plan a trip to X": a "to" followed by one of these starts a verb, not a place
+TO_VERBS = {"plan", "book", "go", "fly", "travel", "visit", "see", "find", "get", "help", "make", "take",
+            "stay", "rent", "drive", "spend", "explore", "do", "organize", "arrange", "schedule", "have",
+            "be", "know", "start", "head", "leave", "return", "come", "check", "look", "search", "show"}
+# Up to three words, for "Salt Lake City" / "St. Louis"
+_PLACE = r'([A-Za-z][A-Za-z.]*(?:\s+[A-Za-z][A-Za-z.]*){0,2})'
+
+def _strip_trailing_date_words(location: Optional[str]) -> Optional[str]:
+    """Drop date words captured after a location name"""
+    if not location:
+        return None
+    words = location.split()
+    while words and words[-1].lower() in TRAILING_DATE_WORDS:
+        words.pop()
+    return ' '.join(words) or None
+
+def parse_trip_dates(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """Extract a start and end date for a whole trip"""
+    text_lower = text.lower()
+    today = datetime.now()
+    start = None
+    
+    weekend_match = re.search(r'\b(this|next)\s+weekend\b', text_lower)
+    if weekend_match:
+        # Friday to Sunday; "next weekend" is the one after the coming one
+        days_to_friday = (4 - today.weekday()) % 7
+        start = today + timedelta(days=days_to_friday)
+        if weekend_match.group(1) == "next":
+            start += timedelta(days=7)
+        return start.strftime('%Y-%m-%d'), (start + timedelta(days=2)).strftime('%Y-%m-%d')
+    
+    start_str = parse_date_mention(text)
+    if not start_str:
+        return None, None
+    start = datetime.strptime(start_str, '%Y-%m-%d')
+    if start.date() < today.date() and not re.search(r'\b\d{4}\b', text):
+        # "Dec 20" said in late December means next year's
+        try:
+            start = start.replace(year=start.year + 1)
+        except ValueError:  # Feb 29
+            start = start + timedelta(days=365)
+        start_str = start.strftime('%Y-%m-%d')
+    
+    nights = DEFAULT_TRIP_NIGHTS
+    length_match = re.search(r'\bfor\s+(\d{1,2})\s+(days?|nights?|weeks?)\b', text_lower)
+    if length_match:
+        nights = int(length_match.group(1)) * (7 if length_match.group(2).startswith("week") else 1)
+    return start_str, (start + timedelta(days=nights)).strftime('%Y-%m-%d')
+
+def _known_place(phrase: Optional[str]) -> Optional[str]:
+    """
+    Longest leading part of a captured phrase that the location index knows
+    ("Salt Lake City next" -> "Salt Lake City"), else the phrase without
+    trailing date/filler words
+    """
+    place = _strip_trailing_date_words(phrase)
+    if not place:
+        return None
+    words = place.split()
+    index = get_location_index()
+    for size in range(len(words), 0, -1):
+        if index.resolve(' '.join(words[:size])):
+            return ' '.join(words[:size])
+    return ' '.join(words[:2])
+
+def _place_candidates(text: str) -> List[str]:
+    """Phrases that may name the trip destination, best first"""
+    # Anchored on the trip noun: "plan a trip to Denver", "a getaway to Miami"
+    # (lookaheads, so "to go to Denver" yields both "go to Denver" and "Denver")
+    anchored = [m.group(1) for m in re.finditer(r'(?=\b(?:trip|vacation|holiday|getaway|weekend)\s+to\s+' + _PLACE + ')', text, re.IGNORECASE)]
+    # Otherwise the last "to X" that does not start a verb ("I want to go to Denver")
+    others = [m.group(1) for m in re.finditer(r'(?=\bto\s+' + _PLACE + ')', text, re.IGNORECASE)
+              if m.group(1).split()[0].lower() not in TO_VERBS]
+    return anchored + others[::-1]
+
+def _title_place(place: Optional[str]) -> Optional[str]:
+    # "new york" -> "New York", but "NYC" stays an abbreviation
+    if not place:
+        return None
+    return ' '.join(word if word.isupper() else word.capitalize() for word in place.split())
+
+def parse_trip_query(text: str) -> Dict[str, Any]:
+    """Parse a whole-trip request ("plan a trip to Denver next weekend") into shared trip parameters"""
+    destination = None
+    for candidate in _place_candidates(text):
+        destination = _known_place(candidate)
+        if destination:
+            break
+    if not destination:
+        location = extract_location(text)
+        if location and location.split()[0].lower() not in TO_VERBS:
+            destination = _known_place(location)
+    from_match = re.search(r'\bfrom\s+' + _PLACE, text, re.IGNORECASE)
+    origin = _known_place(from_match.group(1)) if from_match else None
+    
+    start_date, end_date = parse_trip_dates(text)
+    trip = {
+        "destination": _title_place(destination),
+        "origin": _title_place(origin),
+        "startDate": start_date,
+        "endDate": end_date,
+    }
+    price_range = extract_price_range(text)
+    if price_range["maxPrice"]:
+        trip["maxPrice"] = price_range["maxPrice"]
+    return trip
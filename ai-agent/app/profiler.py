@@ -0,0 +1,181 @@
+"""
+On-demand sampling profiler (GET /api/debug/profile)
+A background thread reads every thread's current Python stack with
+sys._current_frames() at a fixed interval for N seconds and counts identical
+stacks. Nothing is installed between profiles (no tracing hook, no thread), so
+an idle worker pays nothing; while a profile runs, the cost is one stack walk
+per thread per interval, and requests keep being served (the endpoint only
+awaits the sampler).
+
+Output is the collapsed-stack format read by flamegraph.pl, speedscope and
+inferno - one line per distinct stack, root first:
+
+    MainThread;run (asyncio/runners.py:86);...;rank_results (ranking.py:212) 37
+
+Threads blocked in a known wait (locks, the event loop's select, executor
+queues) are counted separately as idle and left out unless idle=true, so the
+output shows where CPU goes. The summary adds the top functions by self
+samples (at the leaf) and total samples (anywhere on the stack).
+
+The endpoint is off unless PROFILER_TOKEN is set, and requires
+"Authorization: Bearer <PROFILER_TOKEN>". One profile runs per worker at a time.
+"""
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+# Shared secret for the profile endpoint; unset disables it
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 60))
+# Default sampling interval (100 Hz); shorter intervals cost more while profiling
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 10))
+PROFILE_MAX_DEPTH = 128
+
+PROFILES_TOTAL = metrics.counter(
+    "profiler_runs_total", "Sampling profiles taken through /api/debug/profile, by outcome"
+)
+
+# (file name, function) of leaf frames where a thread is blocked rather than running
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # concurrent.futures executor thread waiting for work
+}
+
+Stack = Tuple[str, ...]
+
+_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """A profile is already running in this worker"""
+
+
+def profiler_authorized(authorization: Optional[str]) -> bool:
+    """True when the bearer token matches PROFILER_TOKEN (always False while it is unset)"""
+    if not PROFILER_TOKEN or not authorization or not authorization.startswith("Bearer "):
+        return False
+    return hmac.compare_digest(authorization[7:].encode("utf-8"), PROFILER_TOKEN.encode("utf-8"))
+
+
+def _is_idle(code) -> bool:
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename.replace("\\", "/")
+    # Last two path parts: enough to tell asyncio/events.py from app/events.py
+    short = "/".join(filename.rsplit("/", 2)[-2:])
+    # ';' separates frames and ' ' the count in collapsed output
+    return f"{code.co_name} ({short}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Samples all threads but its own until stop()"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.idle_stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                counts = self.idle_stacks if _is_idle(frame.f_code) else self.stacks
+                stack: List[str] = []
+                while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}").replace(";", ":").replace(" ", "_"))
+                counts[tuple(reversed(stack))] += 1
+            self.samples += 1
+            next_sample += self.interval
+            # Fixed rate; if a walk overran, skip ahead rather than sampling in a burst
+            delay = next_sample - time.perf_counter()
+            if delay < 0:
+                next_sample = time.perf_counter()
+                delay = 0
+            self._stop.wait(delay)
+
+
+async def profile(seconds: float, interval_ms: Optional[float] = None) -> SamplingProfiler:
+    """Sample every thread for `seconds`; raises ProfilerBusy if one is already running"""
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    interval = max(interval_ms or PROFILE_INTERVAL_MS, 1.0) / 1000
+    if not _lock.acquire(blocking=False):
+        PROFILES_TOTAL.inc(outcome="busy")
+        raise ProfilerBusy("A profile is already running in this worker")
+    try:
+        profiler = SamplingProfiler(interval)
+        print(f"🔍 [PROFILER] Sampling all threads for {seconds:.1f}s every {interval * 1000:.0f}ms", flush=True)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    finally:
+        _lock.release()
+    PROFILES_TOTAL.inc(outcome="completed")
+    print(f"✅ [PROFILER] {profiler.samples} samples, {len(profiler.stacks)} distinct busy stacks", flush=True)
+    return profiler
+
+
+def collapsed(stacks: Counter) -> str:
+    """Collapsed-stack text (flamegraph.pl input), heaviest stacks first"""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_functions(stacks: Counter, limit: int = 25) -> List[Dict[str, Any]]:
+    """Functions by self samples (leaf frame) and total samples (anywhere on the stack)"""
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    for stack, count in stacks.items():
+        # stack[0] is the thread name
+        if len(stack) < 2:
+            continue
+        self_counts[stack[-1]] += count
+        for function in set(stack[1:]):
+            total_counts[function] += count
+    samples = sum(stacks.values()) or 1
+    ranked = sorted(total_counts, key=lambda f: (self_counts[f], total_counts[f]), reverse=True)[:limit]
+    return [{
+        "function": function,
+        "self": self_counts[function],
+        "total": total_counts[function],
+        "self_pct": round(100 * self_counts[function] / samples, 1),
+        "total_pct": round(100 * total_counts[function] / samples, 1),
+    } for function in ranked]
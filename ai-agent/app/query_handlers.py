@@ -1,11 +1,31 @@
 """
 Query handlers for different types of user queries
 """
-import httpx
 import os
-from typing import Dict, Any, Optional, List
+import re
+import json
+import base64
+import hashlib
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
+try:
+    from .renderers import render_bookings, parse_timestamp
+    from .destination_index import get_destination_index
+    from .services import cached_user_fetch, USER_NOT_FOUND
+    from .http_client import http_session
+    from .admission import get_pool
+    from .records import BookingRecord, decode_bookings
+    from .location_index import get_location_index, normalize_place
+except ImportError:
+    from renderers import render_bookings, parse_timestamp
+    from destination_index import get_destination_index
+    from services import cached_user_fetch, USER_NOT_FOUND
+    from http_client import http_session
+    from admission import get_pool
+    from records import BookingRecord, decode_bookings
+    from location_index import get_location_index, normalize_place
+
 USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://localhost:5001")
 FLIGHT_SERVICE_URL = os.getenv("FLIGHT_SERVICE_URL", "http://localhost:5002")
 HOTEL_SERVICE_URL = os.getenv("HOTEL_SERVICE_URL", "http://localhost:5003")
@@ -13,9 +33,16 @@ CAR_SERVICE_URL = os.getenv("CAR_SERVICE_URL", "http://localhost:5004")
 BILLING_SERVICE_URL = os.getenv("BILLING_SERVICE_URL", "http://localhost:5005")
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "")
 WEATHER_API_URL = "http://api.openweathermap.org/data/2.5/weather"
+BOOKINGS_PAGE_SIZE = int(os.getenv("BOOKINGS_PAGE_SIZE", 10))
 
-async def get_user_bookings(user_id: str, token: Optional[str] = None) -> List[Dict[str, Any]]:
+async def get_user_bookings(user_id: str, token: Optional[str] = None) -> List[BookingRecord]:
     """Get user's booking history"""
+    bookings = await cached_user_fetch(
+        user_id, "bookings", token, lambda: _fetch_user_bookings(user_id, token), pool="priority"
+    )
+    return decode_bookings(bookings)
+
+async def _fetch_user_bookings(user_id: str, token: Optional[str] = None) -> Any:
     try:
         import sys
         print(f"🔍 [BOOKINGS] Fetching bookings for user_id: {user_id}", flush=True)
@@ -27,7 +54,7 @@ async def get_user_bookings(user_id: str, token: Optional[str] = None) -> List[D
         if token:
             headers["Authorization"] = f"Bearer {token}"
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_session() as client:
             response = await client.get(
                 f"{USER_SERVICE_URL}/api/users/{user_id}/bookings",
                 headers=headers
@@ -35,6 +62,8 @@ async def get_user_bookings(user_id: str, token: Optional[str] = None) -> List[D
             print(f"🔍 [BOOKINGS] Response status: {response.status_code}", flush=True)
             sys.stdout.flush()
             
+            if response.status_code == 404:
+                return USER_NOT_FOUND
             if response.status_code == 200:
                 data = response.json()
                 print(f"🔍 [BOOKINGS] Response data: {data}", flush=True)
@@ -47,173 +76,213 @@ async def get_user_bookings(user_id: str, token: Optional[str] = None) -> List[D
             else:
                 print(f"❌ [BOOKINGS] Error status {response.status_code}: {response.text[:200]}", flush=True)
                 sys.stdout.flush()
-        return []
+        return None
     except Exception as e:
         import traceback
         print(f"❌ [BOOKINGS] Error fetching user bookings: {e}", flush=True)
         traceback.print_exc()
         sys.stdout.flush()
-        return []
+        return None
 
 async def get_user_favourites(user_id: str, token: Optional[str] = None) -> List[Dict[str, Any]]:
     """Get user's favourites"""
+    favourites = await cached_user_fetch(
+        user_id, "favourites", token, lambda: _fetch_user_favourites(user_id, token), pool="priority"
+    )
+    return favourites or []
+
+async def _fetch_user_favourites(user_id: str, token: Optional[str] = None) -> Any:
     try:
         headers = {}
         if token:
             headers["Authorization"] = f"Bearer {token}"
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_session() as client:
             response = await client.get(
                 f"{USER_SERVICE_URL}/api/users/{user_id}/favourites",
                 headers=headers
             )
+            if response.status_code == 404:
+                return USER_NOT_FOUND
             if response.status_code == 200:
                 data = response.json()
                 if data.get("success"):
                     return data.get("data", [])
-        return []
+        return None
     except Exception as e:
         print(f"Error fetching user favourites: {e}")
-        return []
+        return None
 
-def format_booking_details(bookings: List[Dict[str, Any]]) -> str:
-    """Format booking details for AI response - showing important details without being too verbose"""
-    if not bookings:
-        return "You don't have any bookings yet."
+BOOKING_TYPE_KEYWORDS = {
+    "flight": ["flight", "flights", "fly", "airline"],
+    "hotel": ["hotel", "hotels", "stay", "stays", "accommodation"],
+    "car": ["car", "cars", "rental", "rentals", "vehicle"],
+}
+# Up to three words after "to"/"in"/"at"/"for" that may name a destination (lookahead, so matches can overlap)
+_DESTINATION_MENTION = re.compile(r"\b(?:to|in|at|for)\s+(?=([A-Za-z][\w.'-]*(?:\s+[A-Za-z][\w.'-]*){0,2}))", re.IGNORECASE)
+
+def _booking_destination(message: str, bookings: Optional[List[BookingRecord]] = None) -> Optional[str]:
+    """
+    Destination named in a bookings question: a phrase after "to"/"in"/... that
+    is a city the user has booked or a place the location index knows. Anything
+    else ("to see my bookings", "in total") is ordinary wording, not a filter.
+    """
+    booked = {normalize_place(booking.city): booking.city for booking in bookings or () if booking.city}
+    index = get_location_index()
+    for match in _DESTINATION_MENTION.finditer(message):
+        words = match.group(1).split()
+        # Longest phrase first, so "New York" wins over "New"
+        for size in range(len(words), 0, -1):
+            phrase = " ".join(words[:size])
+            key = normalize_place(phrase)
+            if key in booked:
+                return booked[key]
+            location_id = index.resolve(phrase)
+            if location_id:
+                return index.locations[location_id].city
+    return None
+
+def parse_booking_filters(message: str, bookings: Optional[List[BookingRecord]] = None) -> Dict[str, Any]:
+    """
+    Extract upcoming/past, booking type and destination filters from a bookings
+    question. bookings, when given, lets a destination match cities the user
+    has booked that the location index does not know.
+    """
+    message_lower = message.lower()
+    filters = {}
     
-    from datetime import datetime
+    if any(word in message_lower for word in ["upcoming", "future", "next trip", "coming up"]):
+        filters["when"] = "upcoming"
+    elif any(word in message_lower for word in ["past", "previous", "completed", "last trip"]):
+        filters["when"] = "past"
     
-    formatted = []
-    formatted.append(f"📋 You have {len(bookings)} booking(s):\n")
+    for booking_type, keywords in BOOKING_TYPE_KEYWORDS.items():
+        if any(re.search(rf"\b{kw}\b", message_lower) for kw in keywords):
+            filters["type"] = booking_type
+            break
     
-    for i, booking in enumerate(bookings, 1):
-        booking_type = booking.get("type", "unknown")
-        booking_id = booking.get("bookingId", "N/A")
-        status = booking.get("status", "unknown")
-        details = booking.get("details", {})
-        
-        if booking_type == "flight":
-            origin = details.get("departureAirport", {}).get("city", "Unknown")
-            dest = details.get("arrivalAirport", {}).get("city", "Unknown")
-            airline = details.get("airline", "Unknown Airline")
-            departure_date = details.get("departureDateTime", details.get("departureDate", ""))
-            price = details.get("totalAmountPaid", details.get("ticketPrice", 0))
-            
-            # Format date
-            date_str = ""
-            if departure_date:
-                try:
-                    # Handle both date-only (YYYY-MM-DD) and datetime strings
-                    date_str_raw = str(departure_date).replace('Z', '').replace('+00:00', '')
-                    if 'T' in date_str_raw:
-                        dt = datetime.fromisoformat(date_str_raw)
-                    else:
-                        dt = datetime.strptime(date_str_raw[:10], '%Y-%m-%d')
-                    date_str = dt.strftime('%b %d, %Y')
-                except Exception as e:
-                    date_str = str(departure_date)[:10] if departure_date else ""
-            
-            formatted.append(
-                f"✈️ Flight {booking_id}: {origin} → {dest}\n"
-                f"   {airline} • {date_str} • ${price:.2f} • {status.title()}\n"
-            )
-            
-        elif booking_type == "hotel":
-            hotel_name = details.get("hotelName", "Unknown Hotel")
-            city = details.get("city", "Unknown")
-            state = details.get("state", "")
-            star_rating = details.get("starRating", 0)
-            check_in = details.get("checkIn", "")
-            check_out = details.get("checkOut", "")
-            guests = details.get("guests", 1)
-            price = details.get("totalAmountPaid", details.get("pricePerNight", 0))
-            
-            # Format dates
-            check_in_str = ""
-            check_out_str = ""
-            if check_in:
-                try:
-                    # Handle both date-only (YYYY-MM-DD) and datetime strings
-                    date_str = str(check_in).replace('Z', '').replace('+00:00', '')
-                    if 'T' in date_str:
-                        dt = datetime.fromisoformat(date_str)
-                    else:
-                        dt = datetime.strptime(date_str[:10], '%Y-%m-%d')
-                    check_in_str = dt.strftime('%b %d')
-                except Exception as e:
-                    check_in_str = str(check_in)[:10] if check_in else ""
-            if check_out:
-                try:
-                    # Handle both date-only (YYYY-MM-DD) and datetime strings
-                    date_str = str(check_out).replace('Z', '').replace('+00:00', '')
-                    if 'T' in date_str:
-                        dt = datetime.fromisoformat(date_str)
-                    else:
-                        dt = datetime.strptime(date_str[:10], '%Y-%m-%d')
-                    check_out_str = dt.strftime('%b %d')
-                except Exception as e:
-                    check_out_str = str(check_out)[:10] if check_out else ""
-            
-            location = f"{city}, {state}" if state else city
-            stars = "⭐" * star_rating if star_rating else ""
-            dates = f"{check_in_str} - {check_out_str}" if check_in_str and check_out_str else ""
-            
-            formatted.append(
-                f"🏨 Hotel {booking_id}: {hotel_name} {stars}\n"
-                f"   {location} • {dates} • {guests} guest(s) • ${price:.2f} • {status.title()}\n"
-            )
-            
-        elif booking_type == "car":
-            company = details.get("company", "")
-            model = details.get("model", "")
-            car_type = details.get("carType", "")
-            car_name = f"{company} {model}".strip() if company and model else f"{car_type} Rental"
-            location = details.get("location", {})
-            city = location.get("city", "Unknown")
-            state = location.get("state", "")
-            pickup_date = details.get("pickupDate", "")
-            return_date = details.get("returnDate", "")
-            price = details.get("totalAmountPaid", details.get("dailyRentalPrice", 0))
-            
-            # Format dates
-            pickup_str = ""
-            return_str = ""
-            if pickup_date:
-                try:
-                    # Handle both date-only (YYYY-MM-DD) and datetime strings
-                    date_str = str(pickup_date).replace('Z', '').replace('+00:00', '')
-                    if 'T' in date_str:
-                        dt = datetime.fromisoformat(date_str)
-                    else:
-                        dt = datetime.strptime(date_str[:10], '%Y-%m-%d')
-                    pickup_str = dt.strftime('%b %d')
-                except Exception as e:
-                    pickup_str = str(pickup_date)[:10] if pickup_date else ""
-            if return_date:
-                try:
-                    # Handle both date-only (YYYY-MM-DD) and datetime strings
-                    date_str = str(return_date).replace('Z', '').replace('+00:00', '')
-                    if 'T' in date_str:
-                        dt = datetime.fromisoformat(date_str)
-                    else:
-                        dt = datetime.strptime(date_str[:10], '%Y-%m-%d')
-                    return_str = dt.strftime('%b %d')
-                except Exception as e:
-                    return_str = str(return_date)[:10] if return_date else ""
-            
-            location_str = f"{city}, {state}" if state else city
-            dates = f"{pickup_str} - {return_str}" if pickup_str and return_str else ""
-            
-            formatted.append(
-                f"🚗 Car {booking_id}: {car_name}\n"
-                f"   {location_str} • {dates} • ${price:.2f} • {status.title()}\n"
-            )
-        else:
-            formatted.append(
-                f"📦 {booking_type.title()} {booking_id}: {status.title()}\n"
-            )
+    destination = _booking_destination(message, bookings)
+    if destination:
+        filters["destination"] = destination
+    
+    return filters
+
+def _booking_trip_end(booking: BookingRecord) -> Optional[datetime]:
+    """Last day of the trip a booking covers (falls back to the start date)"""
+    for value in (booking.ends, booking.starts, booking.booked_at):
+        parsed = parse_timestamp(value) if value else None
+        if parsed:
+            return parsed
+    return None
+
+def filter_bookings(bookings: List[BookingRecord], filters: Dict[str, Any]) -> List[BookingRecord]:
+    """Apply booking filters, keeping the upstream order so cursors stay stable"""
+    when = filters.get("when")
+    booking_type = filters.get("type")
+    destination = normalize_place(filters.get("destination"))
+    now = datetime.now()
+    
+    matched = []
+    for booking in bookings:
+        if booking_type and booking.type != booking_type:
+            continue
+        if destination:
+            booking_city = normalize_place(booking.city)
+            if not booking_city or (destination not in booking_city and booking_city not in destination):
+                continue
+        if when:
+            # Only parse dates when the filter needs them
+            status = booking.status
+            if when == "upcoming" and status == "cancelled":
+                continue
+            trip_end = _booking_trip_end(booking)
+            if trip_end is None:
+                is_past = status == "past"
+            else:
+                is_past = trip_end.date() < now.date()
+            if (when == "past") != is_past:
+                continue
+        matched.append(booking)
+    return matched
+
+def _filters_fingerprint(filters: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(filters, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+def encode_booking_cursor(offset: int, filters: Dict[str, Any]) -> str:
+    """Opaque cursor for the next page of a filtered booking list"""
+    payload = json.dumps({"o": offset, "f": _filters_fingerprint(filters)})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_booking_cursor(cursor: Optional[str], filters: Dict[str, Any]) -> int:
+    """Offset encoded in a cursor; a cursor issued for different filters starts over"""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload.get("f") != _filters_fingerprint(filters):
+            return 0
+        return max(int(payload.get("o", 0)), 0)
+    except Exception:
+        return 0
+
+def booking_summary_header(bookings: List[BookingRecord], matched_count: int, filters: Dict[str, Any],
+                           start: int, page_count: int) -> str:
+    """Short summary line for a page of bookings"""
+    counts = {}
+    for booking in bookings:
+        booking_type = booking.type or "other"
+        counts[booking_type] = counts.get(booking_type, 0) + 1
+    breakdown = ", ".join(f"{count} {booking_type}" for booking_type, count in sorted(counts.items()))
+    
+    header = f"📋 You have {len(bookings)} booking(s)"
+    if breakdown:
+        header += f" ({breakdown})"
+    
+    filter_parts = []
+    if filters.get("when"):
+        filter_parts.append(filters["when"])
+    if filters.get("type"):
+        filter_parts.append(filters["type"])
+    if filters.get("destination"):
+        filter_parts.append(f"to {filters['destination']}")
+    if filter_parts:
+        header += f"\n🔎 {matched_count} matching: {' '.join(filter_parts)}"
     
-    return "\n".join(formatted)
+    if page_count and page_count < matched_count:
+        header += f"\nShowing {start + 1}-{start + page_count} of {matched_count}"
+    return header
+
+def format_booking_page(bookings: List[BookingRecord], filters: Optional[Dict[str, Any]] = None,
+                        cursor: Optional[str] = None, page_size: Optional[int] = None) -> Tuple[str, Optional[str]]:
+    """
+    Filter bookings and format only the requested page.
+    Returns the text and the cursor for the next page (None on the last page).
+    """
+    filters = filters or {}
+    page_size = page_size or BOOKINGS_PAGE_SIZE
+    matched = filter_bookings(bookings, filters)
+    start = decode_booking_cursor(cursor, filters)
+    if start >= len(matched):
+        start = 0
+    page = matched[start:start + page_size]
+    
+    header = booking_summary_header(bookings, len(matched), filters, start, len(page))
+    if not page:
+        return f"{header}\n\nNo bookings match those filters.", None
+    
+    next_cursor = None
+    if start + len(page) < len(matched):
+        next_cursor = encode_booking_cursor(start + len(page), filters)
+    
+    body = format_booking_details(page, header=header)
+    if next_cursor:
+        body += f"\n…and {len(matched) - start - len(page)} more booking(s)."
+    return body, next_cursor
+
+def format_booking_details(bookings: List[BookingRecord], header: Optional[str] = None) -> str:
+    """Format booking details for AI response - showing important details without being too verbose"""
+    return render_bookings(bookings, header=header)
 
 def generate_trip_planning_checklist(destination: Optional[str] = None) -> str:
     """Generate a trip planning checklist"""
@@ -259,24 +328,16 @@ async def suggest_trip(user_context: Optional[Dict[str, Any]] = None) -> str:
     """Generate trip suggestions based on user preferences and history"""
     suggestions = []
     
-    # Get popular destinations
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            # Get some sample flights to popular destinations
-            response = await client.get(f"{FLIGHT_SERVICE_URL}/api/flights", params={"limit": 5})
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success"):
-                    flights = data.get("data", [])
-                    destinations = set()
-                    for flight in flights[:10]:
-                        dest = flight.get("arrivalAirport", {}).get("city")
-                        if dest:
-                            destinations.add(dest)
-                    if destinations:
-                        suggestions.append(f"🌍 Popular Destinations: {', '.join(list(destinations)[:5])}")
-    except:
-        pass
+    # Popular destinations come from the background-refreshed index - no upstream call here
+    popular = get_destination_index().top(5)
+    if popular:
+        names = []
+        for destination in popular:
+            if destination.get("min_fare") is not None:
+                names.append(f"{destination['city']} (from ${destination['min_fare']:.0f})")
+            else:
+                names.append(destination["city"])
+        suggestions.append(f"🌍 Popular Destinations: {', '.join(names)}")
     
     # Based on user history
     if user_context and user_context.get("booking_history"):
@@ -300,6 +361,13 @@ async def suggest_trip(user_context: Optional[Dict[str, Any]] = None) -> str:
     
     return "\n".join(suggestions)
 
+# Words that name a single search vertical in a trip message
+TRIP_VERTICAL_PATTERNS = {
+    "flights": r"\b(?:flights?|fly|flying|airfare)\b",
+    "hotels": r"\b(?:hotels?|rooms?|accommodations?)\b",
+    "cars": r"\b(?:cars?|rentals?)\b",
+}
+
 def detect_query_type(message: str) -> str:
     """Detect what type of query the user is asking"""
     message_lower = message.lower()
@@ -316,6 +384,19 @@ def detect_query_type(message: str) -> str:
     if "weather" in message_lower or "temperature" in message_lower:
         return "weather"
     
+    # Whole-trip searches ("plan a trip to Denver next weekend") - flights, hotels and cars at once
+    trip_words = ["trip", "vacation", "getaway", "holiday", "weekend away"]
+    trip_verbs = ["plan", "book", "organize", "organise", "arrange", "set up"]
+    checklist_words = ["checklist", "pack", "prepare", "suggest", "recommend", "where should", "ideas"]
+    # A message naming one vertical ("book a flight to Miami for my holiday") is a single search
+    named_verticals = {vertical for vertical, pattern in TRIP_VERTICAL_PATTERNS.items() if re.search(pattern, message_lower)}
+    if (any(word in message_lower for word in trip_words)
+            and any(verb in message_lower for verb in trip_verbs)
+            and len(named_verticals) != 1
+            and re.search(r"\bto\s+[a-z]", message_lower)
+            and not any(word in message_lower for word in checklist_words)):
+        return "trip_search"
+    
     # Trip planning queries
     if any(phrase in message_lower for phrase in ["checklist", "planning", "prepare", "what to pack", "trip planning"]):
         return "trip_planning"
@@ -356,7 +437,11 @@ def detect_query_type(message: str) -> str:
     return "conversation"
 
 async def get_weather_info(location: str) -> Optional[Dict[str, Any]]:
-    """Get weather information for a location using OpenWeatherMap API"""
+    """Get weather information for a location using OpenWeatherMap API (in the "priority" pool)"""
+    async with get_pool("priority").slot():
+        return await _fetch_weather_info(location)
+
+async def _fetch_weather_info(location: str) -> Optional[Dict[str, Any]]:
     import sys
     
     # Get API key dynamically (in case .env was loaded after module import)
@@ -374,7 +459,7 @@ async def get_weather_info(location: str) -> Optional[Dict[str, Any]]:
     sys.stdout.flush()
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_session() as client:
             params = {
                 "q": location,
                 "appid": api_key,
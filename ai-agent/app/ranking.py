@@ -0,0 +1,262 @@
+"""
+Personalized ranking of search results
+Scores the whole candidate set returned by a search with NumPy and orders it
+best first, instead of keeping the upstream order. Each candidate gets five
+features in [0, 1] and the score is their weighted sum:
+
+- preference: matches the user's usual flight class, hotel star level or car
+  type (from booking history and favourites), and their meal preference
+- price: cheaper than the other candidates
+- rating: average customer rating
+- timing: flights only - close to the requested day and short
+- affinity: airline, hotel or rental company the user booked or saved before
+
+Weights come from RANKING_WEIGHT_<FEATURE>. Without numpy, or when the query
+asks for an explicit sort order, results are returned unchanged.
+"""
+import os
+import time
+from collections import Counter
+from operator import attrgetter
+from typing import Any, Dict, List, Optional
+
+try:
+    from . import metrics
+    from .config import env_flag
+except ImportError:
+    import metrics
+    from config import env_flag
+
+# numpy is imported on the first ranked search (see _load_numpy)
+np = None
+_numpy_missing = False
+
+FEATURES = ("preference", "price", "rating", "timing", "affinity")
+DEFAULT_WEIGHTS = {"preference": 1.0, "price": 1.0, "rating": 0.8, "timing": 0.5, "affinity": 1.2}
+
+RANKING_ENABLED = env_flag("RANKING_ENABLED", True)
+# Listings requested from a search when its results are going to be ranked
+RANKING_CANDIDATES = int(os.getenv("RANKING_CANDIDATES", 100))
+
+RANKING_SECONDS = metrics.histogram(
+    "ranking_duration_seconds", "Time to score and order a candidate set, by vertical",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+RANKING_CANDIDATES_SEEN = metrics.histogram(
+    "ranking_candidates", "Candidates scored per ranked search",
+    buckets=(10, 20, 50, 100, 200, 500, 1000, 5000),
+)
+
+# Per vertical: booking type, the booking-detail fields the user profile reads,
+# and the record attributes (see records.py) the same features read on listings
+VERTICAL_FIELDS = {
+    "flights": {"type": "flight", "affinity": "airline", "preference": "flightClass",
+                "listing_affinity": "airline", "listing_preference": "flight_class"},
+    "hotels": {"type": "hotel", "affinity": "hotelName", "preference": "starRating",
+               "listing_affinity": "name", "listing_preference": "star_rating"},
+    "cars": {"type": "car", "affinity": "company", "preference": "carType",
+             "listing_affinity": "company", "listing_preference": "car_type"},
+}
+
+
+def load_weights() -> Dict[str, float]:
+    return {
+        name: float(os.getenv(f"RANKING_WEIGHT_{name.upper()}", default))
+        for name, default in DEFAULT_WEIGHTS.items()
+    }
+
+
+RANKING_WEIGHTS = load_weights()
+
+
+def _load_numpy() -> bool:
+    global np, _numpy_missing
+    if np is None and not _numpy_missing:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:  # optional dependency
+            _numpy_missing = True
+            print("⚠️ [RANKING] numpy is not installed, search results keep the upstream order", flush=True)
+    return np is not None
+
+
+def _get(doc: Any, path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _day(value: Any):
+    """YYYY-MM-DD (or ISO timestamp) to a numpy day, None if it isn't one"""
+    try:
+        return np.datetime64(str(value)[:10], "D") if value else None
+    except ValueError:
+        return None
+
+
+def _key(value: Any) -> str:
+    return str(value if value is not None else "").strip().lower()
+
+
+class UserProfile:
+    """What a user's history says about one vertical"""
+
+    def __init__(self, affinity: Dict[str, float], preferred: Optional[str], favourite_ids: set, wants_meal: bool):
+        self.affinity = affinity
+        self.preferred = preferred
+        self.favourite_ids = favourite_ids
+        self.wants_meal = wants_meal
+
+    @classmethod
+    def from_context(cls, search_type: str, user_context: Optional[Dict[str, Any]]) -> "UserProfile":
+        fields = VERTICAL_FIELDS[search_type]
+        context = user_context or {}
+        past: List[Dict[str, Any]] = []
+        for booking in context.get("booking_history") or []:
+            if isinstance(booking, dict) and booking.get("type") == fields["type"] and booking.get("status") != "cancelled":
+                past.append(booking.get("details") or {})
+        favourite_ids = set()
+        for favourite in context.get("favourites") or []:
+            if isinstance(favourite, dict) and favourite.get("type") == fields["type"]:
+                past.append(favourite.get("itemData") or {})
+                if favourite.get("itemId"):
+                    favourite_ids.add(str(favourite["itemId"]))
+
+        counts = Counter(_key(_get(item, fields["affinity"])) for item in past)
+        counts.pop("", None)
+        top = max(counts.values(), default=0)
+        affinity = {name: count / top for name, count in counts.items()}
+        preferences = Counter(_key(_get(item, fields["preference"])) for item in past)
+        preferences.pop("", None)
+        preferred = preferences.most_common(1)[0][0] if preferences else None
+
+        meal = _key((context.get("preferences") or {}).get("mealPreference"))
+        return cls(affinity, preferred, favourite_ids, wants_meal=bool(meal) and meal != "no preference")
+
+
+def _inverted_minmax(values):
+    """Lowest value -> 1, highest -> 0; missing values score 0"""
+    present = ~np.isnan(values)
+    scores = np.zeros(len(values))
+    if present.any():
+        low, high = values[present].min(), values[present].max()
+        if high > low:
+            scores[present] = (high - values[present]) / (high - low)
+        else:
+            scores[present] = 1.0
+    return scores
+
+
+def _floats(values: List[Any]):
+    try:
+        return np.array(values, dtype=np.float64)  # None becomes NaN
+    except (TypeError, ValueError):
+        return np.array([_number(v) for v in values], dtype=np.float64)
+
+
+def _encode(values: List[Any], score) -> Any:
+    """Score each distinct value once, then broadcast by dictionary code"""
+    codes: Dict[Any, int] = {}
+    indexes = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int64, count=len(values))
+    lookup = np.array([score(v) for v in codes], dtype=np.float64)
+    return lookup[indexes]
+
+
+def feature_matrix(search_type: str, results: List[Any], profile: UserProfile, params: Dict[str, Any]):
+    """(n candidates x len(FEATURES)) array of feature scores in [0, 1]"""
+    fields = VERTICAL_FIELDS[search_type]
+    n = len(results)
+    matrix = np.zeros((n, len(FEATURES)))
+
+    # Only attribute reads are per listing; everything after this is vectorized
+    prices = [r.price for r in results]
+    ratings = [r.rating for r in results]
+    affinity_keys = list(map(attrgetter(fields["listing_affinity"]), results))
+    preference_keys = list(map(attrgetter(fields["listing_preference"]), results))
+    ids = [r.id for r in results]
+
+    matrix[:, FEATURES.index("price")] = _inverted_minmax(_floats(prices))
+    matrix[:, FEATURES.index("rating")] = np.clip(np.nan_to_num(_floats(ratings) / 5.0), 0.0, 1.0)
+
+    if profile.affinity or profile.favourite_ids:
+        affinity = _encode(affinity_keys, lambda value: profile.affinity.get(_key(value), 0.0))
+        if profile.favourite_ids:
+            saved = np.fromiter((str(i) in profile.favourite_ids for i in ids), dtype=bool, count=n)
+            affinity[saved] = 1.0
+        matrix[:, FEATURES.index("affinity")] = affinity
+
+    signals = []
+    if profile.preferred is not None:
+        if search_type == "hotels":
+            # Star levels are ordinal: one star off is still a partial match
+            preferred = _number(profile.preferred)
+            signals.append(np.nan_to_num(1.0 - np.abs(_floats(preference_keys) - preferred) / 4.0).clip(0.0, 1.0))
+        else:
+            signals.append(_encode(preference_keys, lambda value: float(_key(value) == profile.preferred)))
+    if search_type == "flights" and profile.wants_meal:
+        # Few distinct amenity lists, so each is checked once
+        amenities = [r.amenities for r in results]
+        signals.append(_encode(amenities, lambda value: float(any("meal" in _key(a) for a in value))))
+    if signals:
+        matrix[:, FEATURES.index("preference")] = np.mean(signals, axis=0)
+
+    if search_type == "flights":
+        timing = [_inverted_minmax(_floats([r.duration_minutes for r in results]))]
+        requested = _day(params.get("departureDate"))
+        if requested is not None:
+            departures = [r.departure_time[:10] for r in results]
+            days = np.array([d if len(d) == 10 else "NaT" for d in departures], dtype="datetime64[D]")
+            days_off = np.abs((days - requested).astype(np.float64))
+            timing.append(np.nan_to_num(1.0 / (1.0 + days_off)))
+        matrix[:, FEATURES.index("timing")] = np.mean(timing, axis=0)
+
+    return matrix
+
+
+def should_rank(search_type: str, params: Optional[Dict[str, Any]]) -> bool:
+    """Rank unless disabled or the user asked for a specific sort order"""
+    return RANKING_ENABLED and search_type in VERTICAL_FIELDS and not (params or {}).get("sortBy")
+
+
+def candidate_params(search_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Search params widened to RANKING_CANDIDATES results when they will be ranked"""
+    if not should_rank(search_type, params) or params.get("limit"):
+        return params
+    return {**params, "limit": RANKING_CANDIDATES}
+
+
+def rank_results(
+    search_type: str,
+    results: List[Any],
+    user_context: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    weights: Optional[Dict[str, float]] = None,
+) -> List[Any]:
+    """Order search result records best first for this user (ties keep the upstream order)"""
+    params = params or {}
+    if len(results) < 2 or not should_rank(search_type, params) or not _load_numpy():
+        return results
+    started = time.perf_counter()
+    try:
+        profile = UserProfile.from_context(search_type, user_context)
+        weights = weights or RANKING_WEIGHTS
+        weight_vector = np.array([weights.get(name, 0.0) for name in FEATURES])
+        scores = feature_matrix(search_type, results, profile, params) @ weight_vector
+        order = np.argsort(-scores, kind="stable")
+        ranked = [results[i] for i in order]
+    except Exception as e:
+        print(f"⚠️ [RANKING] Ranking {search_type} failed, keeping upstream order: {e}", flush=True)
+        return results
+    RANKING_SECONDS.observe(time.perf_counter() - started, vertical=search_type)
+    RANKING_CANDIDATES_SEEN.observe(len(results), vertical=search_type)
+    return ranked
@@ -0,0 +1,257 @@
+"""
+Compact records for search results and bookings
+Service listings carry much more than the agent reads: flights have a seat
+map and passenger reviews, hotels and cars have reviews, images and (cars)
+their booking list. run_search decodes each listing once into a slotted
+record with only the fields used by filtering, ranking, rendering and the
+chat UI, so the rest of the request (and the local search cache) holds a
+fraction of the memory. Repeated strings (cities, airlines, classes) are
+interned, so a large result set shares one copy of each.
+
+to_dict() gives the API view (same field names as the services) for
+responses and for the Redis search cache; the constructors accept either
+form. Missing fields are "" or None here - display defaults are the
+renderers' job.
+"""
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _text(value: Any, default: str = "") -> str:
+    """Interned string for a categorical field"""
+    if value is None:
+        return default
+    return sys.intern(str(value).strip())
+
+
+def _number(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _optional_number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _rating(doc: Dict[str, Any], key: str) -> Tuple[Optional[float], int]:
+    rating = doc.get(key) or {}
+    if not isinstance(rating, dict):
+        return None, 0
+    return _optional_number(rating.get("average")), int(_number(rating.get("count")))
+
+
+def _strings(values: Any) -> Tuple[str, ...]:
+    return tuple(_text(v) for v in values or () if v is not None)
+
+
+def _timestamp(value: Any) -> str:
+    return str(value) if value else ""
+
+
+class Airport:
+    __slots__ = ("code", "name", "city", "country")
+
+    def __init__(self, code: str, name: str, city: str, country: str):
+        self.code = code
+        self.name = name
+        self.city = city
+        self.country = country
+
+    @classmethod
+    def from_doc(cls, doc: Any) -> "Airport":
+        doc = doc if isinstance(doc, dict) else {}
+        return cls(_text(doc.get("code")).upper(), _text(doc.get("name")),
+                   _text(doc.get("city")), _text(doc.get("country")))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"code": self.code, "name": self.name, "city": self.city, "country": self.country}
+
+
+class FlightRecord:
+    __slots__ = ("id", "flight_id", "airline", "departure_airport", "arrival_airport", "departure_time",
+                 "arrival_time", "duration_minutes", "flight_class", "price", "available_seats",
+                 "rating", "rating_count", "amenities")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.id = _text(doc.get("_id"))
+        self.flight_id = _text(doc.get("flightId") or doc.get("flightNumber"))
+        self.airline = _text(doc.get("airline"))
+        self.departure_airport = Airport.from_doc(doc.get("departureAirport"))
+        self.arrival_airport = Airport.from_doc(doc.get("arrivalAirport"))
+        self.departure_time = _timestamp(doc.get("departureDateTime") or doc.get("departureTime"))
+        self.arrival_time = _timestamp(doc.get("arrivalDateTime") or doc.get("arrivalTime"))
+        duration = doc.get("duration")
+        if isinstance(duration, dict):
+            self.duration_minutes = _optional_number(duration.get("hours"))
+            if self.duration_minutes is not None:
+                self.duration_minutes = self.duration_minutes * 60 + _number(duration.get("minutes"))
+        else:
+            self.duration_minutes = None
+        self.flight_class = _text(doc.get("flightClass"))
+        self.price = _optional_number(doc.get("ticketPrice", doc.get("price", doc.get("fare"))))
+        self.available_seats = int(_number(doc.get("availableSeats")))
+        self.rating, self.rating_count = _rating(doc, "flightRating")
+        self.amenities = _strings(doc.get("amenities"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "_id": self.id,
+            "flightId": self.flight_id,
+            "airline": self.airline,
+            "departureAirport": self.departure_airport.to_dict(),
+            "arrivalAirport": self.arrival_airport.to_dict(),
+            "departureDateTime": self.departure_time,
+            "arrivalDateTime": self.arrival_time,
+            "flightClass": self.flight_class,
+            "ticketPrice": self.price,
+            "availableSeats": self.available_seats,
+            "flightRating": {"average": self.rating, "count": self.rating_count},
+            "amenities": list(self.amenities),
+        }
+        if self.duration_minutes is not None:
+            hours, minutes = divmod(int(self.duration_minutes), 60)
+            data["duration"] = {"hours": hours, "minutes": minutes}
+        return data
+
+
+class HotelRecord:
+    __slots__ = ("id", "hotel_id", "name", "city", "state", "star_rating", "price",
+                 "available_rooms", "rating", "rating_count", "amenities")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.id = _text(doc.get("_id"))
+        self.hotel_id = _text(doc.get("hotelId"))
+        self.name = _text(doc.get("hotelName"))
+        self.city = _text(doc.get("city"))
+        self.state = _text(doc.get("state"))
+        self.star_rating = _optional_number(doc.get("starRating"))
+        self.price = _optional_number(doc.get("pricePerNight"))
+        self.available_rooms = int(_number(doc.get("availableRooms")))
+        self.rating, self.rating_count = _rating(doc, "hotelRating")
+        self.amenities = _strings(doc.get("amenities"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "_id": self.id,
+            "hotelId": self.hotel_id,
+            "hotelName": self.name,
+            "city": self.city,
+            "state": self.state,
+            "starRating": self.star_rating,
+            "pricePerNight": self.price,
+            "availableRooms": self.available_rooms,
+            "hotelRating": {"average": self.rating, "count": self.rating_count},
+            "amenities": list(self.amenities),
+        }
+
+
+class CarRecord:
+    __slots__ = ("id", "car_id", "car_type", "company", "model", "year", "transmission",
+                 "fuel", "seats", "price", "rating", "rating_count", "city", "state", "status")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.id = _text(doc.get("_id"))
+        self.car_id = _text(doc.get("carId"))
+        self.car_type = _text(doc.get("carType"))
+        self.company = _text(doc.get("company"))
+        self.model = _text(doc.get("model"))
+        self.year = int(_number(doc.get("year")))
+        self.transmission = _text(doc.get("transmissionType"))
+        self.fuel = _text(doc.get("fuelType"))
+        self.seats = int(_number(doc.get("numberOfSeats")))
+        self.price = _optional_number(doc.get("dailyRentalPrice"))
+        self.rating, self.rating_count = _rating(doc, "carRating")
+        location = doc.get("location") if isinstance(doc.get("location"), dict) else {}
+        self.city = _text(location.get("city"))
+        self.state = _text(location.get("state"))
+        self.status = _text(doc.get("availabilityStatus"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "_id": self.id,
+            "carId": self.car_id,
+            "carType": self.car_type,
+            "company": self.company,
+            "model": self.model,
+            "year": self.year,
+            "transmissionType": self.transmission,
+            "fuelType": self.fuel,
+            "numberOfSeats": self.seats,
+            "dailyRentalPrice": self.price,
+            "carRating": {"average": self.rating, "count": self.rating_count},
+            "location": {"city": self.city, "state": self.state},
+            "availabilityStatus": self.status,
+        }
+
+
+RECORD_TYPES = {"flights": FlightRecord, "hotels": HotelRecord, "cars": CarRecord}
+LISTING_RECORDS = tuple(RECORD_TYPES.values())
+
+
+def decode_results(search_type: str, items: Optional[Iterable[Any]]) -> List[Any]:
+    """Records for a search's listings (records already decoded are kept as they are)"""
+    record_type = RECORD_TYPES.get(search_type)
+    if record_type is None or not items:
+        return []
+    return [item if isinstance(item, record_type) else record_type(item)
+            for item in items if isinstance(item, (dict, record_type))]
+
+
+def to_dicts(records: Iterable[Any]) -> List[Dict[str, Any]]:
+    """API view of a list of records"""
+    return [record.to_dict() for record in records]
+
+
+class BookingRecord:
+    """
+    One booking, flattened across types: title is the airline, hotel or car
+    name, city the destination ("" if unknown), starts/ends the trip dates as sent
+    """
+    __slots__ = ("id", "type", "status", "booked_at", "starts", "ends", "origin", "city",
+                 "state", "title", "stars", "guests", "amount")
+
+    def __init__(self, doc: Dict[str, Any]):
+        details = doc.get("details") if isinstance(doc.get("details"), dict) else {}
+        self.id = _text(doc.get("bookingId"))
+        self.type = _text(doc.get("type"))
+        self.status = _text(doc.get("status"))
+        self.booked_at = _timestamp(doc.get("bookingDate"))
+        self.title = self.origin = self.city = self.state = self.starts = self.ends = ""
+        self.stars = 0
+        self.guests = 1
+        self.amount = 0.0
+        if self.type == "flight":
+            self.title = _text(details.get("airline"))
+            self.origin = Airport.from_doc(details.get("departureAirport")).city
+            self.city = Airport.from_doc(details.get("arrivalAirport")).city
+            self.starts = _timestamp(details.get("departureDateTime") or details.get("departureDate"))
+            self.ends = _timestamp(details.get("arrivalDateTime"))
+            self.amount = _number(details.get("totalAmountPaid", details.get("ticketPrice")))
+        elif self.type == "hotel":
+            self.title = _text(details.get("hotelName"))
+            self.city = _text(details.get("city"))
+            self.state = _text(details.get("state"))
+            self.stars = int(_number(details.get("starRating")))
+            self.guests = int(_number(details.get("guests"), 1))
+            self.starts = _timestamp(details.get("checkIn"))
+            self.ends = _timestamp(details.get("checkOut"))
+            self.amount = _number(details.get("totalAmountPaid", details.get("pricePerNight")))
+        elif self.type == "car":
+            company, model = _text(details.get("company")), _text(details.get("model"))
+            self.title = f"{company} {model}" if company and model else f"{_text(details.get('carType'))} Rental"
+            location = details.get("location") if isinstance(details.get("location"), dict) else {}
+            self.city = _text(location.get("city"))
+            self.state = _text(location.get("state"))
+            self.starts = _timestamp(details.get("pickupDate"))
+            self.ends = _timestamp(details.get("returnDate"))
+            self.amount = _number(details.get("totalAmountPaid", details.get("dailyRentalPrice")))
+
+
+def decode_bookings(items: Optional[Iterable[Any]]) -> List[BookingRecord]:
+    return [item if isinstance(item, BookingRecord) else BookingRecord(item)
+            for item in items or () if isinstance(item, (dict, BookingRecord))]
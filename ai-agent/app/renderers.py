@@ -0,0 +1,182 @@
+"""
+Result rendering for search results and bookings
+Per-vertical formatters are built once at import time and share a memoized
+timestamp normalizer, so a timestamp that repeats across a result set
+(same departure slot, same check-in date) is only parsed once.
+"""
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .records import BookingRecord, CarRecord, FlightRecord, HotelRecord
+except ImportError:
+    from records import BookingRecord, CarRecord, FlightRecord, HotelRecord
+
+TIME_FORMAT = '%I:%M %p'
+FULL_DATE_FORMAT = '%b %d, %Y'
+SHORT_DATE_FORMAT = '%b %d'
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """
+    Parse an ISO datetime or YYYY-MM-DD string into a naive datetime.
+    Timezone suffixes are dropped so every vertical shows the stored wall time.
+    """
+    raw = value.strip().replace('Z', '').replace('+00:00', '')
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        pass
+    for fmt, width in (('%Y-%m-%d %H:%M', 16), ('%Y-%m-%d', 10)):
+        try:
+            return datetime.strptime(raw[:width], fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _format_timestamp(value: str, fmt: str, fallback_width: int) -> str:
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        return value[:fallback_width]
+    return parsed.strftime(fmt)
+
+
+def format_timestamp(value: Any, fmt: str, fallback_width: int = 10) -> str:
+    """Format a timestamp, falling back to the leading characters of the raw value"""
+    if not value:
+        return ""
+    return _format_timestamp(str(value), fmt, fallback_width)
+
+
+def _money(value: Optional[float]) -> str:
+    return f"${value or 0:.2f}"
+
+
+# ---------------------------------------------------------------------------
+# Search results (LLM context)
+# ---------------------------------------------------------------------------
+
+def _render_flight_result(i: int, item: FlightRecord) -> str:
+    origin, destination = item.departure_airport, item.arrival_airport
+    route = origin.city or "Unknown"
+    if origin.code:
+        route += f" ({origin.code})"
+    route += " → " + (destination.city or "Unknown")
+    if destination.code:
+        route += f" ({destination.code})"
+
+    dep_time_str = format_timestamp(item.departure_time, TIME_FORMAT, fallback_width=5)
+    arr_time_str = format_timestamp(item.arrival_time, TIME_FORMAT, fallback_width=5)
+
+    flight_info = f"{i}. {item.airline or 'Unknown Airline'} {item.flight_id or 'N/A'}"
+    if dep_time_str and arr_time_str:
+        flight_info += f"\n   {route} • {dep_time_str} - {arr_time_str}"
+    else:
+        flight_info += f"\n   {route}"
+    if item.duration_minutes:
+        # The services store duration as {"hours", "minutes"}; render it as text, not the dict
+        hours, minutes = divmod(int(item.duration_minutes), 60)
+        flight_info += f" • {hours}h {minutes:02d}m"
+    flight_info += f" • {_money(item.price)}"
+    return flight_info
+
+
+def _render_hotel_result(i: int, item: HotelRecord) -> str:
+    return (
+        f"{i}. {item.name or 'Unknown Hotel'} ({item.star_rating or 0:g}★) "
+        f"in {item.city or 'Unknown'}, {_money(item.price)}/night "
+        f"(ID: {item.hotel_id or 'N/A'})"
+    )
+
+
+def _render_car_result(i: int, item: CarRecord) -> str:
+    # Car listings have no "make"; the brand is in "company"
+    name = f"{item.company} {item.model}".strip()
+    return (
+        f"{i}. {name} in {item.city or 'Unknown'}, {_money(item.price)}/day "
+        f"(ID: {item.car_id or 'N/A'})"
+    )
+
+
+SEARCH_RESULT_RENDERERS: Dict[str, Callable[[int, Any], str]] = {
+    "flights": _render_flight_result,
+    "hotels": _render_hotel_result,
+    "cars": _render_car_result,
+}
+
+
+def render_search_results(search_type: str, results: List[Any], limit: int = 5) -> str:
+    """Render search result records for LLM context"""
+    if not results:
+        return f"No {search_type} found matching your criteria."
+    renderer = SEARCH_RESULT_RENDERERS.get(search_type)
+    if renderer is None:
+        return ""
+    return "\n".join(renderer(i, item) for i, item in enumerate(results[:limit], 1))
+
+
+# ---------------------------------------------------------------------------
+# Bookings
+# ---------------------------------------------------------------------------
+
+def _render_flight_booking(booking: BookingRecord) -> str:
+    date_str = format_timestamp(booking.starts, FULL_DATE_FORMAT)
+    return (
+        f"✈️ Flight {booking.id or 'N/A'}: {booking.origin or 'Unknown'} → {booking.city or 'Unknown'}\n"
+        f"   {booking.title or 'Unknown Airline'} • {date_str} • {_money(booking.amount)} • {(booking.status or 'unknown').title()}\n"
+    )
+
+
+def _render_hotel_booking(booking: BookingRecord) -> str:
+    check_in_str = format_timestamp(booking.starts, SHORT_DATE_FORMAT)
+    check_out_str = format_timestamp(booking.ends, SHORT_DATE_FORMAT)
+
+    city = booking.city or "Unknown"
+    location = f"{city}, {booking.state}" if booking.state else city
+    stars = "⭐" * booking.stars if booking.stars else ""
+    dates = f"{check_in_str} - {check_out_str}" if check_in_str and check_out_str else ""
+    return (
+        f"🏨 Hotel {booking.id or 'N/A'}: {booking.title or 'Unknown Hotel'} {stars}\n"
+        f"   {location} • {dates} • {booking.guests} guest(s) • {_money(booking.amount)} • {(booking.status or 'unknown').title()}\n"
+    )
+
+
+def _render_car_booking(booking: BookingRecord) -> str:
+    pickup_str = format_timestamp(booking.starts, SHORT_DATE_FORMAT)
+    return_str = format_timestamp(booking.ends, SHORT_DATE_FORMAT)
+
+    city = booking.city or "Unknown"
+    location_str = f"{city}, {booking.state}" if booking.state else city
+    dates = f"{pickup_str} - {return_str}" if pickup_str and return_str else ""
+    return (
+        f"🚗 Car {booking.id or 'N/A'}: {booking.title}\n"
+        f"   {location_str} • {dates} • {_money(booking.amount)} • {(booking.status or 'unknown').title()}\n"
+    )
+
+
+BOOKING_RENDERERS: Dict[str, Callable[[BookingRecord], str]] = {
+    "flight": _render_flight_booking,
+    "hotel": _render_hotel_booking,
+    "car": _render_car_booking,
+}
+
+
+def render_booking(booking: BookingRecord) -> str:
+    """Render a single booking"""
+    renderer = BOOKING_RENDERERS.get(booking.type)
+    if renderer is None:
+        return f"📦 {(booking.type or 'unknown').title()} {booking.id or 'N/A'}: {(booking.status or 'unknown').title()}\n"
+    return renderer(booking)
+
+
+def render_bookings(bookings: List[BookingRecord], header: Optional[str] = None) -> str:
+    """Render a list of bookings under a header"""
+    if not bookings:
+        return "You don't have any bookings yet."
+    formatted = [f"{header}\n" if header else f"📋 You have {len(bookings)} booking(s):\n"]
+    formatted.extend(render_booking(booking) for booking in bookings)
+    return "\n".join(formatted)
@@ -0,0 +1,262 @@
+"""
+Similarity-based response cache for conversational questions
+Matches near-duplicate questions ("what should I pack for Hawaii" vs
+"what to pack for hawaii?") using MinHash signatures over normalized word
+shingles, so paraphrased FAQ-style questions can skip the OpenAI call.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+
+# MinHash / LSH layout: NUM_BANDS * ROWS_PER_BAND permutations
+NUM_PERMUTATIONS = 64
+ROWS_PER_BAND = 4
+NUM_BANDS = NUM_PERMUTATIONS // ROWS_PER_BAND
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so every process derives the same permutations
+_rng = random.Random(1729)
+_PERMUTATIONS = [
+    (_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+# Filler words that don't change what is being asked
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "is", "are", "am",
+    "be", "it", "its", "to", "for", "of", "in", "on", "at", "by", "with", "about",
+    "what", "whats", "which", "do", "does", "did", "should", "shall", "would", "could",
+    "can", "will", "please", "tell", "know", "need", "want", "like", "some", "any",
+    "there", "really", "just", "hey", "hi", "hello", "thanks", "thank",
+}
+
+# Words that usually refer back to earlier turns - answers depend on history
+FOLLOW_UP_MARKERS = {
+    "that", "this", "those", "these", "them", "they", "there", "then", "also",
+    "instead", "same", "again", "else", "more", "another", "other", "above",
+}
+FOLLOW_UP_PHRASES = ("what about", "how about", "and if", "and what", "as well")
+
+MIN_CONTENT_TOKENS = 2
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.lower().replace("'", "")
+    text = re.sub(r"[^a-z0-9\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _stem(token: str) -> str:
+    """Very light stemming so 'packing'/'packs'/'pack' collapse together"""
+    for suffix in ("ing", "es", "s"):
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def content_tokens(text: str) -> List[str]:
+    """Tokens that carry the meaning of the question"""
+    return [_stem(tok) for tok in normalize_question(text).split() if tok not in STOPWORDS]
+
+
+def shingles(text: str) -> frozenset:
+    """Word shingles for a question - order-insensitive so reworded questions line up"""
+    return frozenset(content_tokens(text))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    """Exact Jaccard similarity between two shingle sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signature(shingle_set: set) -> Tuple[int, ...]:
+    """Compute a MinHash signature for a shingle set"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") & _MAX_HASH
+        for s in shingle_set
+    ]
+    if not hashes:
+        return tuple([_MAX_HASH] * NUM_PERMUTATIONS)
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def _band_keys(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [
+        (band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+        for band in range(NUM_BANDS)
+    ]
+
+
+def is_cacheable_question(message: str) -> bool:
+    """
+    Only self-contained questions are safe to answer from cache.
+    Follow-ups ("what about in winter?") depend on earlier turns.
+    """
+    normalized = normalize_question(message)
+    if any(phrase in normalized for phrase in FOLLOW_UP_PHRASES):
+        return False
+    words = set(normalized.split())
+    if words & FOLLOW_UP_MARKERS:
+        return False
+    return len(content_tokens(message)) >= MIN_CONTENT_TOKENS
+
+
+def context_scope(user_context: Optional[Dict[str, Any]]) -> str:
+    """
+    Cache scope for a request. Anonymous requests share the public scope;
+    personalised answers stay private to the user and the context they were built from.
+    """
+    if not user_context:
+        return "public"
+    user_id = user_context.get("user_id") or "unknown"
+    fingerprint = hashlib.sha256(
+        json.dumps(user_context, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"user:{user_id}:{fingerprint}"
+
+
+class _Entry:
+    __slots__ = ("scope", "signature", "shingles", "question", "response", "expires_at")
+
+    def __init__(self, scope, signature, shingle_set, question, response, expires_at):
+        self.scope = scope
+        self.signature = signature
+        self.shingles = shingle_set
+        self.question = question
+        self.response = response
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of chat responses keyed by question similarity.
+
+    MinHash bands pick candidates cheaply; the exact Jaccard score of the
+    shingle sets decides the match. With the default threshold a one-word swap
+    ("... travel to Mexico" vs "... travel to Canada") stays below the bar.
+    """
+
+    def __init__(self, threshold: float = 0.85, ttl_seconds: int = 3600, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._bands: Dict[Tuple, set] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for band_key in _band_keys(entry.signature):
+            ids = self._bands.get((entry.scope,) + band_key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._bands[(entry.scope,) + band_key]
+
+    def get(self, question: str, scope: str = "public") -> Optional[str]:
+        """Return a cached response for a near-duplicate question, if any"""
+        shingle_set = shingles(question)
+        signature = minhash_signature(shingle_set)
+
+        candidates = set()
+        for band_key in _band_keys(signature):
+            candidates |= self._bands.get((scope,) + band_key, set())
+
+        now = time.time()
+        best_id, best_score = None, 0.0
+        for entry_id in candidates:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                continue
+            if entry.expires_at <= now:
+                self._remove(entry_id)
+                continue
+            score = jaccard(shingle_set, entry.shingles)
+            if score > best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is not None and best_score >= self.threshold:
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].response
+
+        self.misses += 1
+        return None
+
+    def set(self, question: str, response: str, scope: str = "public") -> None:
+        """Store a response for a question"""
+        shingle_set = shingles(question)
+        signature = minhash_signature(shingle_set)
+        entry_id = self._next_id
+        self._next_id += 1
+
+        self._entries[entry_id] = _Entry(
+            scope, signature, shingle_set, question, response, time.time() + self.ttl_seconds
+        )
+        for band_key in _band_keys(signature):
+            self._bands.setdefault((scope,) + band_key, set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            oldest_id = next(iter(self._entries))
+            self._remove(oldest_id)
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop every private entry belonging to a user"""
+        prefix = f"user:{user_id}:"
+        stale = [entry_id for entry_id, entry in self._entries.items() if entry.scope.startswith(prefix)]
+        for entry_id in stale:
+            self._remove(entry_id)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bands.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# Created lazily so settings from .env are picked up
+_response_cache = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get or create the response cache (None when disabled)"""
+    global _response_cache
+    if os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.85")),
+            ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+        )
+    return _response_cache
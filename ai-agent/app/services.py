@@ -2,31 +2,132 @@
 Service integration functions for AI Agent
 Connects to existing microservices
 """
-import httpx
+import asyncio
+import base64
+import hashlib
 import os
+import re
 import sys
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
+import time
+from typing import Optional, Dict, Any, List, Awaitable, Callable, Tuple
 import json
 
+try:
+    from .shared_cache import get_cache
+    from .renderers import render_search_results
+    from .admission import get_pool
+    from .http_client import http_session
+    from .inventory_snapshot import get_inventory_snapshot, VERTICALS
+    from .location_index import canonical_search_params, observe_results
+    from .records import decode_results
+    from .ranking import candidate_params
+    from . import metrics
+except ImportError:
+    from shared_cache import get_cache
+    from renderers import render_search_results
+    from admission import get_pool
+    from http_client import http_session
+    from inventory_snapshot import get_inventory_snapshot, VERTICALS
+    from location_index import canonical_search_params, observe_results
+    from records import decode_results
+    from ranking import candidate_params
+    import metrics
+
 # Service URLs
 USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://localhost:5001")
 FLIGHT_SERVICE_URL = os.getenv("FLIGHT_SERVICE_URL", "http://localhost:5002")
 HOTEL_SERVICE_URL = os.getenv("HOTEL_SERVICE_URL", "http://localhost:5003")
 CAR_SERVICE_URL = os.getenv("CAR_SERVICE_URL", "http://localhost:5004")
+# One deadline shared by all verticals of a whole-trip search
+TRIP_SEARCH_DEADLINE = float(os.getenv("TRIP_SEARCH_DEADLINE", 6.0))
+
+# Ids the user service can look up (MongoDB ObjectIds); anything else is a guaranteed miss
+OBJECT_ID_PATTERN = re.compile(r"^[0-9a-fA-F]{24}$")
+
+# Returned by a user fetch when the user service answers 404 (user not found)
+USER_NOT_FOUND = object()
+
+NEGATIVE_CACHE_HITS = metrics.counter(
+    "negative_cache_hits_total", "Searches and user lookups answered as empty without calling upstream, by cache and reason"
+)
+NEGATIVE_CACHE_STORES = metrics.counter(
+    "negative_cache_stores_total", "Negative cache entries stored, by cache"
+)
+
 
-async def get_user_data(user_id: str, token: Optional[str] = None) -> Optional[Dict[str, Any]]:
-    """Get user data including preferences and booking history"""
+def user_cache_key(user_id: str, kind: str, token: Optional[str] = None) -> str:
+    """
+    Key in the "user" cache: "<user_id>:<kind>:<auth scope>". The auth scope is a
+    hash of the token, so data fetched with one token is never served to another.
+    """
+    scope = hashlib.sha256(token.encode()).hexdigest()[:16] if token else "anon"
+    return f"{user_id}:{kind}:{scope}"
+
+
+async def cached_user_fetch(
+    user_id: str, kind: str, token: Optional[str], fetch, pool: str = "upstream", degrade: bool = False
+) -> Any:
+    """
+    Return cached user context, calling fetch() on a miss. Failures (None) are
+    not cached; a 404 (USER_NOT_FOUND) is remembered in the "user_miss" cache for
+    every kind, and ids that are not ObjectIds are never sent upstream.
+    The fetch holds a slot in `pool`; with degrade=True a saturated pool raises
+    Overloaded at once instead of queueing (for optional context).
+    """
+    if not OBJECT_ID_PATTERN.match(user_id or ""):
+        NEGATIVE_CACHE_HITS.inc(cache="user", reason="invalid_id")
+        return None
+    misses = get_cache("user_miss")
+    if await misses.get(user_id) is not None:
+        NEGATIVE_CACHE_HITS.inc(cache="user", reason="not_found")
+        return None
+    cache = get_cache("user")
+    key = user_cache_key(user_id, kind, token)
+    cached = await cache.get(key)
+    if cached is not None:
+        print(f"✅ [USER CACHE] Hit for {kind} of user {user_id}", flush=True)
+        return cached
+    async with get_pool(pool).slot(degrade=degrade):
+        value = await fetch()
+    if value is USER_NOT_FOUND:
+        print(f"⚠️ [USER CACHE] User {user_id} not found, caching the miss for {misses.ttl_seconds}s", flush=True)
+        await misses.set(user_id, True)
+        NEGATIVE_CACHE_STORES.inc(cache="user")
+        return None
+    if value is not None:
+        await cache.set(key, value)
+    return value
+
+
+async def invalidate_user_context(user_id: str) -> int:
+    """Drop every cached profile/bookings/favourites entry of a user (all auth scopes), and a cached 404"""
+    await get_cache("user_miss").delete(user_id)
+    return await get_cache("user").delete_prefix(f"{user_id}:")
+
+
+async def get_user_data(user_id: str, token: Optional[str] = None, degrade: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Get user data including preferences and booking history. With degrade=True
+    (personalization only), a saturated upstream pool raises Overloaded at once.
+    """
+    return await cached_user_fetch(
+        user_id, "profile", token, lambda: _fetch_user_data(user_id, token), degrade=degrade
+    )
+
+
+async def _fetch_user_data(user_id: str, token: Optional[str] = None) -> Any:
     try:
         headers = {}
         if token:
             headers["Authorization"] = f"Bearer {token}"
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_session() as client:
             response = await client.get(
                 f"{USER_SERVICE_URL}/api/users/{user_id}",
                 headers=headers
             )
+            if response.status_code == 404:
+                return USER_NOT_FOUND
             if response.status_code == 200:
                 data = response.json()
                 if data and isinstance(data, dict) and data.get("success"):
@@ -36,15 +137,15 @@ async def get_user_data(user_id: str, token: Optional[str] = None) -> Optional[D
         print(f"Error fetching user data: {e}")
         return None
 
-async def search_flights(params: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Search flights with given parameters"""
+async def search_flights(params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Search flights with given parameters (None if the service could not be asked)"""
     try:
         # Clean params - remove None values and ensure strings are properly formatted
         clean_params = {k: v for k, v in params.items() if v is not None and v != ""}
         print(f"🔍 Searching flights with params: {clean_params}")
         print(f"   URL: {FLIGHT_SERVICE_URL}/api/flights")
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_session() as client:
             response = await client.get(
                 f"{FLIGHT_SERVICE_URL}/api/flights",
                 params=clean_params
@@ -55,7 +156,7 @@ async def search_flights(params: Dict[str, Any]) -> List[Dict[str, Any]]:
                 data = response.json()
                 if data is None:
                     print(f"   Response data is None")
-                    return []
+                    return None
                 print(f"   Response success: {data.get('success') if data else 'N/A'}")
                 
                 if data and data.get("success"):
@@ -85,18 +186,18 @@ async def search_flights(params: Dict[str, Any]) -> List[Dict[str, Any]]:
             
             print(f"⚠️ [FLIGHTS] No flights found for params: {clean_params}", flush=True)
             sys.stdout.flush()
-            return []
+            return None
     except Exception as e:
         import traceback
         print(f"❌ [FLIGHTS] Error searching flights: {e}", flush=True)
         traceback.print_exc()
         sys.stdout.flush()
-        return []
+        return None
 
-async def search_hotels(params: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Search hotels with given parameters"""
+async def search_hotels(params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Search hotels with given parameters (None if the service could not be asked)"""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_session() as client:
             response = await client.get(
                 f"{HOTEL_SERVICE_URL}/api/hotels",
                 params=params
@@ -106,13 +207,13 @@ async def search_hotels(params: Dict[str, Any]) -> List[Dict[str, Any]]:
                 if data.get("success"):
                     hotels = data.get("data", [])
                     return hotels if isinstance(hotels, list) else []
-            return []
+            return None
     except Exception as e:
         print(f"Error searching hotels: {e}")
-        return []
+        return None
 
-async def search_cars(params: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Search cars with given parameters"""
+async def search_cars(params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Search cars with given parameters (None if the service could not be asked)"""
     try:
         if params is None:
             params = {}
@@ -129,7 +230,7 @@ async def search_cars(params: Dict[str, Any]) -> List[Dict[str, Any]]:
             print(f"   [CARS] Will filter by make: {make_filter}", flush=True)
             sys.stdout.flush()
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_session() as client:
             response = await client.get(
                 f"{CAR_SERVICE_URL}/api/cars",
                 params=search_params
@@ -164,98 +265,321 @@ async def search_cars(params: Dict[str, Any]) -> List[Dict[str, Any]]:
                     print(f"✅ [CARS] Found {len(cars_list)} cars", flush=True)
                     sys.stdout.flush()
                     return cars_list
-            return []
+            return None
     except Exception as e:
         print(f"Error searching cars: {e}")
         import traceback
         traceback.print_exc()
+        return None
+
+def search_cache_key(search_type: str, params: Dict[str, Any]) -> str:
+    """Stable cache key for a search - vertical first so it can be evicted by prefix"""
+    clean_params = {k: v for k, v in (params or {}).items() if v is not None and v != ""}
+    return f"{search_type}:{json.dumps(clean_params, sort_keys=True, default=str)}"
+
+async def run_search(search_type: str, params: Dict[str, Any]) -> List[Any]:
+    """
+    Run a flights/hotels/cars search, serving repeats from the shared search cache.
+    Listings are returned as compact records (see records.py), decoded once here.
+    """
+    search_functions = {
+        "flights": search_flights,
+        "hotels": search_hotels,
+        "cars": search_cars,
+    }
+    search_function = search_functions.get(search_type)
+    if search_function is None:
         return []
+    # "NYC", "sao paulo" -> the city names the services store (also shares cache entries)
+    params = canonical_search_params(search_type, params)
+    
+    snapshot = get_inventory_snapshot()
+    if snapshot is not None:
+        results = snapshot.search(search_type, params)
+        if results is not None:
+            results = decode_results(search_type, results)
+            observe_results(search_type, results)
+            return results
+    
+    cache = get_cache("search")
+    cache_key = search_cache_key(search_type, params)
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        print(f"✅ [CACHE] Search cache hit: {cache_key}", flush=True)
+        # Records from the local cache, API dicts from Redis
+        return decode_results(search_type, cached)
+    # Searches that recently found nothing (unserved destination, unknown make)
+    misses = get_cache("search_miss")
+    if await misses.get(cache_key) is not None:
+        NEGATIVE_CACHE_HITS.inc(cache="search", reason="empty")
+        print(f"✅ [CACHE] Negative search cache hit: {cache_key}", flush=True)
+        return []
+    
+    async with get_pool("upstream").slot():
+        items = await search_function(params)
+    results = decode_results(search_type, items)
+    observe_results(search_type, results)
+    if results:
+        # Tag with every returned item so a booking event can evict exactly these searches
+        item_tags = [f"item:{item.id}" for item in results if item.id]
+        await cache.set(cache_key, results, tags=item_tags)
+    elif items is not None:
+        # The service answered and found nothing (a failed call is not remembered)
+        await misses.set(cache_key, True)
+        NEGATIVE_CACHE_STORES.inc(cache="search")
+    return results
 
-def format_search_results(search_type: str, results: List[Dict[str, Any]], limit: int = 5) -> str:
-    """Format search results for LLM context"""
-    if not results:
-        return f"No {search_type} found matching your criteria."
+
+# /api/search page size (the services also default to 20) and the largest page a client may ask for
+SEARCH_PAGE_LIMIT = int(os.getenv("SEARCH_PAGE_LIMIT", 20))
+SEARCH_PAGE_MAX_LIMIT = int(os.getenv("SEARCH_PAGE_MAX_LIMIT", 100))
+
+
+class InvalidCursor(ValueError):
+    """A search cursor that is malformed or was issued for a different search"""
+
+
+def _search_fingerprint(search_type: str, params: Dict[str, Any]) -> str:
+    query = {k: v for k, v in params.items() if k not in ("page", "limit")}
+    return hashlib.sha256(search_cache_key(search_type, query).encode("utf-8")).hexdigest()[:12]
+
+
+def encode_search_cursor(state: Dict[str, Any]) -> str:
+    payload = json.dumps(state, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Cursor state with the page size clamped to [1, SEARCH_PAGE_MAX_LIMIT].
+    Cursors are not signed, so a client can edit one: page and limit are
+    checked here rather than trusted.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        page, limit, fingerprint = int(state["p"]), int(state["l"]), state["f"]
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if page < 2 or not isinstance(fingerprint, str):
+        # Cursors only ever point past the first page
+        raise InvalidCursor("Malformed cursor")
+    state["p"], state["l"] = page, min(max(limit, 1), SEARCH_PAGE_MAX_LIMIT)
+    return state
+
+
+async def search_page(
+    search_type: str, params: Dict[str, Any], limit: Optional[int] = None, cursor: Optional[str] = None
+) -> Tuple[List[Any], Dict[str, Any], Optional[str]]:
+    """
+    One page of a search, fetched with the services' own page/limit params.
+    Returns (records, params sent upstream, cursor for the next page or None).
+
+    The first page pins the sort order (the service default unless the query
+    asked for one) and the cursor carries it with the page size, so every page
+    is cut from the same ordering. The cursor also remembers the last listing
+    returned: if new inventory shifted it onto the next page, the listings up
+    to it are dropped instead of being returned twice. Raises InvalidCursor
+    for a cursor issued for a different search.
+    """
+    query = dict(params or {})
+    if not query.get("sortBy"):
+        query["sortBy"], query["sortOrder"] = VERTICALS[search_type].default_sort
+    fingerprint = _search_fingerprint(search_type, query)
+    after = None
+    if cursor:
+        state = decode_search_cursor(cursor)
+        if state["f"] != fingerprint:
+            raise InvalidCursor("Cursor was issued for a different search")
+        page, limit, after = state["p"], state["l"], state.get("a")
+    else:
+        page = 1
+        limit = min(max(int(limit or SEARCH_PAGE_LIMIT), 1), SEARCH_PAGE_MAX_LIMIT)
+    page_params = {**query, "page": page, "limit": limit}
     
-    from datetime import datetime
+    results = await run_search(search_type, page_params)
+    full_page = len(results) >= limit
+    if after:
+        ids = [item.id for item in results]
+        if after in ids:
+            results = results[ids.index(after) + 1:]
     
-    formatted = []
-    for i, item in enumerate(results[:limit], 1):
-        if search_type == "flights":
-            origin_city = item.get("departureAirport", {}).get("city", "Unknown")
-            origin_code = item.get("departureAirport", {}).get("code", "")
-            dest_city = item.get("arrivalAirport", {}).get("city", "Unknown")
-            dest_code = item.get("arrivalAirport", {}).get("code", "")
-            price = item.get("ticketPrice", item.get("price", item.get("fare", 0)))
-            airline = item.get("airline", "Unknown Airline")
-            flight_id = item.get("flightId", item.get("flightNumber", "N/A"))
-            departure_time = item.get("departureDateTime", item.get("departureTime", ""))
-            arrival_time = item.get("arrivalDateTime", item.get("arrivalTime", ""))
-            duration = item.get("duration", item.get("flightDuration", ""))
-            
-            # Format times
-            dep_time_str = ""
-            arr_time_str = ""
-            if departure_time:
-                try:
-                    if isinstance(departure_time, str):
-                        if 'T' in departure_time:
-                            dt = datetime.fromisoformat(departure_time.replace('Z', '+00:00'))
-                        else:
-                            dt = datetime.strptime(departure_time[:16], '%Y-%m-%d %H:%M')
-                        dep_time_str = dt.strftime('%I:%M %p')
-                except:
-                    dep_time_str = str(departure_time)[:5] if len(str(departure_time)) > 5 else str(departure_time)
-            
-            if arrival_time:
-                try:
-                    if isinstance(arrival_time, str):
-                        if 'T' in arrival_time:
-                            dt = datetime.fromisoformat(arrival_time.replace('Z', '+00:00'))
-                        else:
-                            dt = datetime.strptime(arrival_time[:16], '%Y-%m-%d %H:%M')
-                        arr_time_str = dt.strftime('%I:%M %p')
-                except:
-                    arr_time_str = str(arrival_time)[:5] if len(str(arrival_time)) > 5 else str(arrival_time)
-            
-            # Format route
-            route = f"{origin_city}"
-            if origin_code:
-                route += f" ({origin_code})"
-            route += " → "
-            route += f"{dest_city}"
-            if dest_code:
-                route += f" ({dest_code})"
-            
-            # Build flight info
-            flight_info = f"{i}. {airline} {flight_id}"
-            if dep_time_str and arr_time_str:
-                flight_info += f"\n   {route} • {dep_time_str} - {arr_time_str}"
-            else:
-                flight_info += f"\n   {route}"
-            
-            if duration:
-                flight_info += f" • {duration}"
-            
-            flight_info += f" • ${price:.2f}"
-            
-            formatted.append(flight_info)
-        elif search_type == "hotels":
-            name = item.get("hotelName", "Unknown Hotel")
-            city = item.get("city", "Unknown")
-            price = item.get("pricePerNight", 0)
-            rating = item.get("starRating", 0)
-            hotel_id = item.get("hotelId", "N/A")
-            formatted.append(
-                f"{i}. {name} ({rating}★) in {city}, ${price:.2f}/night (ID: {hotel_id})"
-            )
-        elif search_type == "cars":
-            name = f"{item.get('make', '')} {item.get('model', '')}".strip()
-            city = item.get("location", {}).get("city", "Unknown")
-            price = item.get("dailyRentalPrice", 0)
-            car_id = item.get("carId", "N/A")
-            formatted.append(
-                f"{i}. {name} in {city}, ${price:.2f}/day (ID: {car_id})"
+    next_cursor = None
+    # The car service drops booked cars after paging, so a short car page is not the last one
+    if results and (full_page or search_type == "cars"):
+        next_cursor = encode_search_cursor({"f": fingerprint, "p": page + 1, "l": limit, "a": results[-1].id})
+    return results, page_params, next_cursor
+
+
+SPECULATIVE_SEARCHES = metrics.counter(
+    "speculative_search_total", "Searches started from the rule-based parse before the LLM intent, by outcome"
+)
+# Params that make a rule-based parse specific enough to search on
+SPECULATION_ANCHORS = ("to", "from", "city")
+
+
+def _normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare params regardless of case, padding and int/float spelling"""
+    normalized = {}
+    for key, value in (params or {}).items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            value = value.strip().lower()
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        normalized[key] = value
+    return normalized
+
+
+class SpeculativeSearch:
+    """
+    Upstream search started from the rule-based parse while the LLM is still
+    extracting the intent. Its results are only used if the LLM asks for the
+    same search; otherwise it is cancelled.
+    """
+
+    def __init__(self, search_type: str, params: Dict[str, Any]):
+        self.search_type = search_type
+        self.params = _normalize_params(params)
+        self.resolved = False
+        self.task = asyncio.ensure_future(run_search(search_type, params))
+        # Retrieve the exception of an abandoned task so asyncio doesn't warn about it
+        self.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def matches(self, search_type: str, params: Dict[str, Any]) -> bool:
+        return search_type == self.search_type and _normalize_params(params) == self.params
+
+    async def take(self, search_type: str, params: Dict[str, Any]) -> Optional[List[Any]]:
+        """The speculative results if they answer this search, else None (and cancel)"""
+        if self.resolved:
+            return None
+        if not self.matches(search_type, params):
+            self.discard()
+            return None
+        self.resolved = True
+        try:
+            results = await self.task
+        except Exception as e:
+            SPECULATIVE_SEARCHES.inc(outcome="error")
+            print(f"⚠️ [SPECULATE] Speculative {search_type} search failed: {e}", flush=True)
+            return None
+        SPECULATIVE_SEARCHES.inc(outcome="hit")
+        print(f"✅ [SPECULATE] Reusing speculative {search_type} search", flush=True)
+        return results
+
+    def discard(self) -> None:
+        if self.resolved:
+            return
+        self.resolved = True
+        self.task.cancel()
+        SPECULATIVE_SEARCHES.inc(outcome="miss")
+
+
+def start_speculative_search(parsed: Dict[str, Any]) -> Optional[SpeculativeSearch]:
+    """Start a search for a rule-based parse if it names a place to search"""
+    if not parsed or parsed.get("type") not in ("flights", "hotels", "cars"):
+        return None
+    params = parsed.get("params") or {}
+    if not any(params.get(anchor) for anchor in SPECULATION_ANCHORS):
+        SPECULATIVE_SEARCHES.inc(outcome="skipped")
+        return None
+    return SpeculativeSearch(parsed["type"], params)
+
+
+def speculation_hit_ratio() -> float:
+    hits = SPECULATIVE_SEARCHES.value(outcome="hit")
+    started = hits + SPECULATIVE_SEARCHES.value(outcome="miss") + SPECULATIVE_SEARCHES.value(outcome="error")
+    return hits / started if started else 0.0
+
+
+metrics.gauge(
+    "speculative_search_hit_ratio", "Share of speculative searches whose results were used",
+    callback=speculation_hit_ratio,
+)
+
+def build_trip_search_params(trip: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Map shared trip parameters onto each vertical's search parameters, widened
+    to the ranking candidate set like a single-vertical chat search
+    """
+    destination = trip.get("destination")
+    start_date = trip.get("startDate")
+    end_date = trip.get("endDate")
+    flight_params = {"to": destination, "from": trip.get("origin"), "departureDate": start_date}
+    hotel_params = {"city": destination, "checkIn": start_date, "checkOut": end_date}
+    car_params = {"city": destination, "pickupDate": start_date, "returnDate": end_date}
+    if trip.get("maxPrice"):
+        hotel_params["maxPrice"] = trip["maxPrice"]
+    params_by_type = {
+        "flights": {k: v for k, v in flight_params.items() if v},
+        "hotels": {k: v for k, v in hotel_params.items() if v},
+        "cars": {k: v for k, v in car_params.items() if v},
+    }
+    return {search_type: candidate_params(search_type, params) for search_type, params in params_by_type.items()}
+
+async def search_trip(
+    trip: Dict[str, Any],
+    deadline: Optional[float] = None,
+    on_result: Optional[Callable[[str, List[Any], Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Search flights, hotels and cars for one trip concurrently under a shared deadline.
+    Verticals that miss the deadline are cancelled and reported in "timed_out",
+    so the caller can still answer with partial results. on_result, if given, is
+    awaited with each vertical's results and search params as soon as that
+    search returns.
+    """
+    deadline = deadline if deadline is not None else TRIP_SEARCH_DEADLINE
+    params_by_type = build_trip_search_params(trip)
+    started = time.perf_counter()
+    tasks = {
+        asyncio.ensure_future(run_search(search_type, params)): search_type
+        for search_type, params in params_by_type.items()
+    }
+    done, pending = set(), set(tasks)
+    try:
+        while pending:
+            remaining = deadline - (time.perf_counter() - started)
+            if remaining <= 0:
+                break
+            finished, pending = await asyncio.wait(
+                pending, timeout=remaining,
+                return_when=asyncio.FIRST_COMPLETED if on_result else asyncio.ALL_COMPLETED,
             )
+            done |= finished
+            if on_result:
+                for task in finished:
+                    if not task.cancelled() and task.exception() is None:
+                        await on_result(tasks[task], task.result() or [], params_by_type[tasks[task]])
+    finally:
+        # Also reached when the caller is cancelled (e.g. the chat socket closed)
+        for task in pending:
+            task.cancel()
     
-    return "\n".join(formatted)
+    results = {search_type: [] for search_type in params_by_type}
+    failed = []
+    for task in done:
+        search_type = tasks[task]
+        try:
+            results[search_type] = task.result() or []
+        except Exception as e:
+            print(f"❌ [TRIP] {search_type} search failed: {e}", flush=True)
+            failed.append(search_type)
+    timed_out = sorted(tasks[task] for task in pending)
+    
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    counts = {search_type: len(items) for search_type, items in results.items()}
+    print(f"✅ [TRIP] Trip search to {trip.get('destination')} in {elapsed_ms:.0f}ms: {counts}"
+          + (f", timed out: {timed_out}" if timed_out else ""), flush=True)
+    sys.stdout.flush()
+    return {
+        "results": results,
+        "params": params_by_type,
+        "timed_out": timed_out,
+        "failed": sorted(failed),
+    }
 
+def format_search_results(search_type: str, results: List[Any], limit: int = 5) -> str:
+    """Format search results for LLM context"""
+    return render_search_results(search_type, results, limit)
@@ -0,0 +1,278 @@
+"""
+Namespaced TTL caches that can be shared between uvicorn/gunicorn workers
+Uses Redis (the same cache the backend services run against) when
+SHARED_CACHE_BACKEND=redis, otherwise a bounded in-process LRU per worker.
+"""
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+KEY_PREFIX = "kayak:ai"
+
+# namespace -> (default TTL seconds, default max local entries)
+CACHE_DEFAULTS = {
+    "intent": (1800, 2000),
+    "search": (60, 500),
+    "user": (300, 1000),
+    # Negative entries: searches that found nothing and user ids the user service
+    # does not know. Short-lived and tiny, so they get their own TTL and bound
+    # instead of pushing real results out of "search"/"user"
+    "search_miss": (30, 2000),
+    "user_miss": (120, 5000),
+}
+
+# After a Redis failure, stay on the local cache for this long before retrying
+REDIS_RETRY_SECONDS = 30
+
+
+class LocalTTLCache:
+    """Bounded LRU cache with per-entry expiry and tags, private to one process"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        # key -> (value, expires_at, tags)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+
+    def _drop(self, key: str) -> bool:
+        item = self._data.pop(key, None)
+        if item is None:
+            return False
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at, _ = item
+        if expires_at <= time.time():
+            self._drop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: int, tags: Iterable[str] = ()) -> None:
+        self._drop(key)
+        tags = tuple(tags)
+        self._data[key] = (value, time.time() + ttl_seconds, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_entries:
+            self._drop(next(iter(self._data)))
+
+    def delete(self, key: str) -> bool:
+        return self._drop(key)
+
+    def delete_prefix(self, prefix: str) -> int:
+        stale = [key for key in self._data if key.startswith(prefix)]
+        for key in stale:
+            self._drop(key)
+        return len(stale)
+
+    def delete_tag(self, tag: str) -> int:
+        stale = list(self._tags.get(tag, ()))
+        for key in stale:
+            self._drop(key)
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _json_default(value: Any) -> Any:
+    # Search results are records (see records.py); Redis stores their API view
+    to_dict = getattr(value, "to_dict", None)
+    return to_dict() if to_dict is not None else str(value)
+
+
+_redis_client = None
+_redis_down_until = 0.0
+
+
+def get_redis_client():
+    """Get or create the async Redis client (None when Redis is not in use)"""
+    global _redis_client
+    if os.getenv("SHARED_CACHE_BACKEND", "local").lower() != "redis":
+        return None
+    if time.time() < _redis_down_until:
+        return None
+    if _redis_client is None:
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            print("⚠️ [CACHE] SHARED_CACHE_BACKEND=redis but the redis package is not installed, using local cache", flush=True)
+            return None
+        _redis_client = redis_asyncio.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+            password=os.getenv("REDIS_PASSWORD") or None,
+            db=int(os.getenv("REDIS_DB", 0)),
+            socket_timeout=float(os.getenv("REDIS_TIMEOUT", "0.5")),
+            socket_connect_timeout=float(os.getenv("REDIS_TIMEOUT", "0.5")),
+        )
+    return _redis_client
+
+
+def _mark_redis_down(error: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.time() + REDIS_RETRY_SECONDS
+    print(f"⚠️ [CACHE] Redis unavailable ({error}), using local cache for {REDIS_RETRY_SECONDS}s", flush=True)
+    sys.stdout.flush()
+
+
+class SharedCache:
+    """
+    Async cache for one namespace. Values must be JSON-serializable so every
+    worker reads the same thing regardless of which backend is active.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: int, max_entries: int):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.local = LocalTTLCache(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: str) -> str:
+        return f"{KEY_PREFIX}:{self.namespace}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{KEY_PREFIX}:{self.namespace}:tag:{tag}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = None
+        client = get_redis_client()
+        if client is not None:
+            try:
+                raw = await client.get(self._key(key))
+                value = json.loads(raw) if raw is not None else None
+            except Exception as e:
+                self.errors += 1
+                _mark_redis_down(e)
+                value = self.local.get(key)
+        else:
+            value = self.local.get(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        """Store a value; tags let delete_tag evict it later (e.g. every search that returned an item)"""
+        ttl = ttl_seconds or self.ttl_seconds
+        tags = tuple(tags)
+        client = get_redis_client()
+        if client is not None:
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.set(self._key(key), json.dumps(value, default=_json_default), ex=ttl)
+                    for tag in tags:
+                        pipe.sadd(self._tag_key(tag), self._key(key))
+                        pipe.expire(self._tag_key(tag), ttl)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                self.errors += 1
+                _mark_redis_down(e)
+        self.local.set(key, value, ttl, tags)
+
+    async def delete(self, key: str) -> None:
+        self.local.delete(key)
+        client = get_redis_client()
+        if client is not None:
+            try:
+                await client.delete(self._key(key))
+            except Exception as e:
+                self.errors += 1
+                _mark_redis_down(e)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        """Evict every key in this namespace that starts with prefix"""
+        removed = self.local.delete_prefix(prefix)
+        client = get_redis_client()
+        if client is not None:
+            try:
+                keys = [k async for k in client.scan_iter(match=self._key(prefix) + "*", count=500)]
+                if keys:
+                    removed += await client.delete(*keys)
+            except Exception as e:
+                self.errors += 1
+                _mark_redis_down(e)
+        return removed
+
+    async def delete_tag(self, tag: str) -> int:
+        """Evict every entry stored with this tag"""
+        removed = self.local.delete_tag(tag)
+        client = get_redis_client()
+        if client is not None:
+            try:
+                keys = await client.smembers(self._tag_key(tag))
+                if keys:
+                    removed += await client.delete(*keys)
+                await client.delete(self._tag_key(tag))
+            except Exception as e:
+                self.errors += 1
+                _mark_redis_down(e)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": "redis" if get_redis_client() is not None else "local",
+            "ttl_seconds": self.ttl_seconds,
+            "local_entries": len(self.local),
+            "local_max_entries": self.local.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_caches: Dict[str, SharedCache] = {}
+
+
+def get_cache(namespace: str) -> SharedCache:
+    """
+    Get or create the cache for a namespace. TTL and local bounds come from
+    <NAMESPACE>_CACHE_TTL and <NAMESPACE>_CACHE_MAX_ENTRIES.
+    """
+    cache = _caches.get(namespace)
+    if cache is None:
+        default_ttl, default_max = CACHE_DEFAULTS.get(namespace, (300, 1000))
+        env_prefix = namespace.upper()
+        cache = SharedCache(
+            namespace,
+            ttl_seconds=int(os.getenv(f"{env_prefix}_CACHE_TTL", default_ttl)),
+            max_entries=int(os.getenv(f"{env_prefix}_CACHE_MAX_ENTRIES", default_max)),
+        )
+        _caches[namespace] = cache
+    return cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Stats for every cache created in this worker"""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
+
+
+async def close_shared_cache() -> None:
+    """Close the Redis connection pool on shutdown"""
+    global _redis_client
+    if _redis_client is not None:
+        try:
+            await _redis_client.close()
+        except Exception:
+            pass
+        _redis_client = None
@@ -0,0 +1,114 @@
+"""
+Background warm-up after the server starts listening
+Imports the lazily loaded dependencies and opens connections (DNS, TCP, TLS)
+to OpenAI and the platform services before the first user request needs
+them. GET /ready reports 503 until warm-up has finished.
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+try:
+    from .config import env_flag
+    from .http_client import get_http_client
+    from . import metrics
+except ImportError:
+    from config import env_flag
+    from http_client import get_http_client
+    import metrics
+
+# Per-target timeout - warm-up must never hold readiness back for long
+WARMUP_TIMEOUT = 5.0
+
+WARMUP_DURATION = metrics.histogram(
+    "warmup_duration_seconds", "Time taken by each warm-up step"
+)
+
+
+class WarmupState:
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmup_seconds": round(self.finished_at - self.started_at, 3) if self.ready and self.started_at else None,
+            "steps": self.steps,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _service_urls() -> Dict[str, str]:
+    return {
+        "user-service": os.getenv("USER_SERVICE_URL", "http://localhost:5001"),
+        "flight-service": os.getenv("FLIGHT_SERVICE_URL", "http://localhost:5002"),
+        "hotel-service": os.getenv("HOTEL_SERVICE_URL", "http://localhost:5003"),
+        "car-service": os.getenv("CAR_SERVICE_URL", "http://localhost:5004"),
+        "admin-service": os.getenv("ADMIN_SERVICE_URL", "http://localhost:5006"),
+    }
+
+
+async def _step(name: str, coro) -> None:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(coro, timeout=WARMUP_TIMEOUT)
+        outcome = "ok"
+    except Exception as e:
+        outcome = f"error: {type(e).__name__}"
+    elapsed = time.perf_counter() - started
+    WARMUP_DURATION.observe(elapsed, step=name)
+    warmup_state.steps[name] = {"outcome": outcome, "ms": round(elapsed * 1000, 1)}
+
+
+async def _warm_service(url: str) -> None:
+    # Any response means DNS and the TCP connection are done and pooled
+    await get_http_client().get(f"{url}/health")
+
+
+def _warm_openai() -> None:
+    try:
+        from .ai_service import get_client
+    except ImportError:
+        from ai_service import get_client
+    client = get_client()
+    # Cheapest authenticated call - opens the TLS connection the chat calls will reuse
+    client.with_options(timeout=WARMUP_TIMEOUT, max_retries=0).models.list()
+
+
+def _warm_imports() -> None:
+    import httpx  # noqa: F401
+    from dateutil import parser  # noqa: F401
+    if os.getenv("OPENAI_API_KEY"):
+        import openai  # noqa: F401
+
+
+async def warm_up() -> None:
+    warmup_state.started_at = time.time()
+    await _step("imports", asyncio.to_thread(_warm_imports))
+    steps = [_step(name, _warm_service(url)) for name, url in _service_urls().items()]
+    if os.getenv("OPENAI_API_KEY"):
+        steps.append(_step("openai", asyncio.to_thread(_warm_openai)))
+    await asyncio.gather(*steps)
+    warmup_state.finished_at = time.time()
+    print(f"✅ [WARMUP] Finished in {warmup_state.finished_at - warmup_state.started_at:.2f}s: {warmup_state.steps}", flush=True)
+    sys.stdout.flush()
+
+
+def start_warmup() -> None:
+    """Schedule warm-up without blocking startup (WARMUP_ENABLED=false marks the worker ready at once)"""
+    if not env_flag("WARMUP_ENABLED", True):
+        warmup_state.started_at = warmup_state.finished_at = time.time()
+        return
+    if warmup_state._task is None:
+        warmup_state._task = asyncio.ensure_future(warm_up())
@@ -0,0 +1,28 @@
+# Production launcher for the AI agent: gunicorn managing uvicorn workers.
+#
+#   gunicorn -c gunicorn.conf.py app.main:app
+#
+# Graceful restart (new workers start, old ones finish in-flight requests):
+#   kill -HUP <gunicorn master pid>
+#
+# Set SHARED_CACHE_BACKEND=redis so intent/search/user caches are shared by
+# all workers instead of each worker warming its own copy.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("AI_AGENT_WORKERS", os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count())))
+
+# Seconds a worker gets to finish in-flight requests on restart/shutdown
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+# LLM calls can be slow; only kill workers that are truly stuck
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+keepalive = 5
+
+# Recycle workers periodically (jittered so they don't all restart together)
+max_requests = int(os.getenv("WORKER_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", 500))
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for search result records
+Builds service-shaped listings (seat maps, reviews, room types, car bookings -
+see the backend models), decodes them the way run_search does, and uses
+tracemalloc to compare the memory a result set keeps for the rest of a
+request (and in the local search cache) as raw JSON dicts vs. records. Also
+reports the peak of one whole request path: JSON decode, record decode,
+ranking, rendering and the API view of the top 10.
+
+Usage (from the ai-agent directory):
+    python scripts/bench_result_memory.py [--listings 500] [--repeat 3]
+"""
+import argparse
+import gc
+import json
+import pathlib
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+AGENT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AGENT_DIR))
+
+from app.records import decode_results, to_dicts  # noqa: E402
+from app.renderers import render_search_results  # noqa: E402
+from app.ranking import rank_results  # noqa: E402
+
+CITIES = [("New York", "JFK"), ("Los Angeles", "LAX"), ("Chicago", "ORD"), ("Miami", "MIA"),
+          ("Seattle", "SEA"), ("Boston", "BOS"), ("Denver", "DEN"), ("Atlanta", "ATL")]
+AIRLINES = ["Delta", "United", "American Airlines", "JetBlue", "Alaska Airlines", "Southwest"]
+COMPANIES = ["Hertz", "Avis", "Enterprise", "Budget"]
+
+
+def _reviews(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    return [{
+        "userId": f"{rng.getrandbits(96):024x}", "userName": f"Traveler {rng.randint(1, 9999)}",
+        "rating": rng.randint(1, 5), "comment": "Great experience, would book again. " * rng.randint(1, 4),
+        "createdAt": f"2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T10:00:00.000Z",
+    } for _ in range(count)]
+
+
+def flight_doc(rng: random.Random, i: int) -> Dict[str, Any]:
+    (origin, origin_code), (city, code) = rng.sample(CITIES, 2)
+    flight_class = rng.choice(["Economy", "Business", "First"])
+    return {
+        "_id": f"{rng.getrandbits(96):024x}", "flightId": f"FL{i:05d}", "airline": rng.choice(AIRLINES),
+        "departureAirport": {"code": origin_code, "name": f"{origin} International", "city": origin, "country": "USA"},
+        "arrivalAirport": {"code": code, "name": f"{city} International", "city": city, "country": "USA"},
+        "departureDateTime": f"2026-11-{rng.randint(10, 28)}T{rng.randint(6, 21):02d}:00:00.000Z",
+        "arrivalDateTime": f"2026-11-{rng.randint(10, 28)}T{rng.randint(6, 21):02d}:30:00.000Z",
+        "duration": {"hours": rng.randint(1, 6), "minutes": rng.choice([0, 15, 30, 45])},
+        "flightClass": flight_class, "ticketPrice": round(rng.uniform(89, 1200), 2),
+        "totalAvailableSeats": 60, "availableSeats": rng.randint(1, 60),
+        "seatMap": [{"seatNumber": f"{row}{col}", "row": row, "column": col, "class": flight_class,
+                     "isAvailable": rng.random() > 0.3, "bookingId": None}
+                    for row in range(1, 11) for col in "ABCDEF"],
+        "flightRating": {"average": round(rng.uniform(2.5, 5), 1), "count": rng.randint(0, 500)},
+        "passengerReviews": _reviews(rng, 5),
+        "amenities": ["WiFi", "Meal", "Entertainment", "Power outlets"][:rng.randint(1, 4)],
+        "createdAt": "2025-01-01T00:00:00.000Z", "updatedAt": "2025-06-01T00:00:00.000Z",
+    }
+
+
+def hotel_doc(rng: random.Random, i: int) -> Dict[str, Any]:
+    city, _ = rng.choice(CITIES)
+    return {
+        "_id": f"{rng.getrandbits(96):024x}", "hotelId": f"HT{i:05d}", "hotelName": f"Hotel {i}",
+        "address": f"{rng.randint(1, 999)} Main St", "city": city, "state": "NY", "zipCode": "10001",
+        "starRating": rng.randint(1, 5), "numberOfRooms": 200, "availableRooms": rng.randint(1, 200), "maxGuests": 4,
+        "roomTypes": [{"type": t, "pricePerNight": rng.uniform(80, 600), "available": 10, "maxGuests": 2}
+                      for t in ("SINGLE", "DOUBLE", "SUITE")],
+        "pricePerNight": round(rng.uniform(80, 600), 2),
+        "amenities": ["WiFi", "Pool", "Gym", "Spa", "Parking", "Breakfast", "Bar", "Restaurant"],
+        "hotelRating": {"average": round(rng.uniform(2.5, 5), 1), "count": rng.randint(0, 900)},
+        "guestReviews": _reviews(rng, 10),
+        "images": [f"https://images.example.com/hotels/{i}/{n}.jpg" for n in range(5)],
+        "createdAt": "2025-01-01T00:00:00.000Z", "updatedAt": "2025-06-01T00:00:00.000Z",
+    }
+
+
+def car_doc(rng: random.Random, i: int) -> Dict[str, Any]:
+    city, _ = rng.choice(CITIES)
+    return {
+        "_id": f"{rng.getrandbits(96):024x}", "carId": f"CR{i:05d}", "carType": rng.choice(["SUV", "Sedan", "Compact"]),
+        "company": rng.choice(COMPANIES), "model": f"Model {rng.randint(1, 30)}", "year": rng.randint(2018, 2025),
+        "transmissionType": "Automatic", "fuelType": "Gasoline", "numberOfSeats": 5,
+        "dailyRentalPrice": round(rng.uniform(25, 250), 2),
+        "carRating": {"average": round(rng.uniform(2.5, 5), 1), "count": rng.randint(0, 300)},
+        "customerReviews": _reviews(rng, 5), "availabilityStatus": "available",
+        "bookings": [{"pickupDate": "2025-03-01T00:00:00.000Z", "returnDate": "2025-03-05T00:00:00.000Z",
+                      "bookingId": f"BK{n}", "userId": f"{rng.getrandbits(96):024x}",
+                      "createdAt": "2025-02-01T00:00:00.000Z"} for n in range(3)],
+        "location": {"city": city, "state": "NY", "address": f"{rng.randint(1, 999)} Airport Rd"},
+        "features": ["GPS", "Bluetooth", "Backup camera", "Heated seats"],
+        "images": [f"https://images.example.com/cars/{i}/{n}.jpg" for n in range(3)],
+        "createdAt": "2025-01-01T00:00:00.000Z", "updatedAt": "2025-06-01T00:00:00.000Z",
+    }
+
+
+BUILDERS: Dict[str, Callable[[random.Random, int], Dict[str, Any]]] = {
+    "flights": flight_doc, "hotels": hotel_doc, "cars": car_doc,
+}
+
+
+def retained(build: Callable[[], Any]) -> Tuple[int, Any]:
+    """Bytes still allocated by build() once it returns (its result kept alive)"""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, value
+
+
+def request_peak(search_type: str, payload: str) -> int:
+    """Peak bytes of one request's path over a result set"""
+    gc.collect()
+    tracemalloc.start()
+    results = decode_results(search_type, json.loads(payload)["data"])
+    results = rank_results(search_type, results, None, {})
+    render_search_results(search_type, results)
+    to_dicts(results[:10])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--listings", type=int, default=500, help="listings per result set")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'vertical':<9} {'raw dicts':>12} {'records':>12} {'saved':>7} {'decode':>9} {'request peak':>13}")
+    for search_type, builder in BUILDERS.items():
+        payload = json.dumps({"success": True, "data": [builder(rng, i) for i in range(args.listings)]})
+        raw_sizes, record_sizes, decode_times, peaks = [], [], [], []
+        for _ in range(args.repeat):
+            raw_size, _ = retained(lambda: json.loads(payload)["data"])
+
+            def decoded():
+                docs = json.loads(payload)["data"]
+                started = time.perf_counter()
+                records = decode_results(search_type, docs)
+                decode_times.append(time.perf_counter() - started)
+                return records
+
+            record_size, _ = retained(decoded)
+            raw_sizes.append(raw_size)
+            record_sizes.append(record_size)
+            peaks.append(request_peak(search_type, payload))
+        raw_size, record_size = min(raw_sizes), min(record_sizes)
+        print(f"{search_type:<9} {raw_size / 1024:>9.0f} KB {record_size / 1024:>9.0f} KB "
+              f"{1 - record_size / raw_size:>6.0%} {min(decode_times) * 1000:>6.1f} ms "
+              f"{min(peaks) / 1024:>10.0f} KB")
+    print(f"\n{args.listings} listings per set. 'raw dicts'/'records' = memory the result set keeps "
+          f"for the rest of the request and in the local search cache.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the AI agent
+Imports app.main in fresh interpreters (python -X importtime), reports the
+median time and the slowest modules, and exits non-zero if the startup
+budget is exceeded or a lazily loaded dependency is imported eagerly again.
+
+Usage (from the ai-agent directory):
+    python scripts/check_import_time.py [--runs 5] [--budget-ms 1200]
+"""
+import argparse
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+AGENT_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+# Must only be imported on first use, never while importing app.main
+LAZY_MODULES = ("openai", "httpx", "dateutil", "numpy")
+
+
+def measure_once() -> Tuple[float, Dict[str, float]]:
+    """Return (total ms for app.main, cumulative ms per top-level package)"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=AGENT_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        sys.exit(f"Importing app.main failed with exit code {result.returncode}")
+
+    total_ms = 0.0
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            cumulative_ms = int(cumulative) / 1000
+        except ValueError:
+            continue
+        module = name.strip()
+        if module == "app.main":
+            total_ms = cumulative_ms
+        # The outermost entry of a package has the largest cumulative time
+        top_level = module.split(".")[0]
+        packages[top_level] = max(packages.get(top_level, 0.0), cumulative_ms)
+    return total_ms, packages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the AI agent's import-time budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 1200)))
+    args = parser.parse_args()
+
+    totals: List[float] = []
+    packages: Dict[str, float] = {}
+    for _ in range(args.runs):
+        total_ms, packages = measure_once()
+        totals.append(total_ms)
+
+    median_ms = statistics.median(totals)
+    print(f"import app.main: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}, budget {args.budget_ms:.0f})")
+    print("Slowest packages (last run):")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {name:<24} {ms:8.1f} ms")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in packages]
+    if eager:
+        print(f"FAIL: imported at startup but meant to be lazy: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: import time {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,6 +34,8 @@ exports.getCars = async (req, res) => {
 
     const sort = {};
     sort[sortBy] = sortOrder === 'desc' ? -1 : 1;
+    // Tie-break on _id so skip/limit pages are deterministic (listings often share a price or rating)
+    if (sortBy !== '_id') sort._id = 1;
     const skip = (page - 1) * limit;
 
     // First, get all cars matching the basic criteria
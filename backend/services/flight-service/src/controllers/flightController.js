@@ -418,6 +418,8 @@ exports.getFlights = async (req, res) => {
     // Sort options
     const sort = {};
     sort[sortBy] = sortOrder === 'desc' ? -1 : 1;
+    // Tie-break on _id so skip/limit pages are deterministic (listings often share a price or rating)
+    if (sortBy !== '_id') sort._id = 1;
 
     // Pagination
     const skip = (page - 1) * limit;
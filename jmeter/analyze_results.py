@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Streaming JMeter results analyzer
+Reads JTL files (CSV with or without a header row, or XML) one sample at a
+time, so memory stays constant however large the file is. Latencies go into
+log-linear histograms: exact up to 100 ms, then buckets 1% wide, so
+percentiles are accurate to within 1%.
+
+Usage (from the jmeter directory):
+    python analyze_results.py report results-base.csv results-base-plus-redis.csv
+    python analyze_results.py compare results-base.csv results-base-plus-redis.csv \\
+        --max-regression 10 --max-error-rate-increase 1
+
+compare exits with status 1 when the candidate is slower than the baseline by
+more than --max-regression percent on any checked percentile, or its error
+rate rose by more than --max-error-rate-increase percentage points.
+"""
+import argparse
+import csv
+import json
+import math
+import pathlib
+import sys
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PERCENTILES = (50, 90, 99)
+TOTAL = "TOTAL"
+
+# Columns of a JMeter CSV saved without a header row (default save configuration)
+DEFAULT_COLUMNS = [
+    "timeStamp", "elapsed", "label", "responseCode", "responseMessage", "threadName",
+    "dataType", "success", "failureMessage", "bytes", "sentBytes", "grpThreads",
+    "allThreads", "URL", "Latency", "IdleTime", "Connect",
+]
+
+# Sample = (label, start timestamp ms, elapsed ms, success)
+Sample = Tuple[str, int, float, bool]
+
+
+class LatencyHistogram:
+    """Constant-size latency histogram with bounded relative error"""
+
+    EXACT_LIMIT = 100  # values up to this many ms get their own bucket
+    PRECISION = 0.01   # relative bucket width above EXACT_LIMIT
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _bucket(self, value: float) -> int:
+        if value <= self.EXACT_LIMIT:
+            return int(math.ceil(value))
+        log_base = math.log1p(self.PRECISION)
+        return self.EXACT_LIMIT + int(math.ceil(math.log(value / self.EXACT_LIMIT) / log_base))
+
+    def _bucket_value(self, bucket: int) -> float:
+        """Upper bound of a bucket, in ms"""
+        if bucket <= self.EXACT_LIMIT:
+            return float(bucket)
+        return self.EXACT_LIMIT * (1 + self.PRECISION) ** (bucket - self.EXACT_LIMIT)
+
+    def record(self, value: float) -> None:
+        value = max(value, 0.0)
+        bucket = self._bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, pct: float) -> float:
+        """Smallest bucket value with at least pct% of samples at or below it"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * pct / 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # Never report beyond the real extremes
+                return min(max(self._bucket_value(bucket), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class LabelStats:
+    """Aggregates for one sampler label (or the whole run)"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.first_start: Optional[int] = None
+        self.last_end: Optional[int] = None
+
+    def record(self, start: int, elapsed: float, success: bool) -> None:
+        self.latency.record(elapsed)
+        if not success:
+            self.errors += 1
+        end = start + int(elapsed)
+        self.first_start = start if self.first_start is None else min(self.first_start, start)
+        self.last_end = end if self.last_end is None else max(self.last_end, end)
+
+    @property
+    def count(self) -> int:
+        return self.latency.count
+
+    @property
+    def error_rate(self) -> float:
+        """Failed samples, in percent"""
+        return 100.0 * self.errors / self.count if self.count else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Samples per second over the label's active window (as JMeter computes it)"""
+        if self.first_start is None or self.last_end is None:
+            return 0.0
+        window = (self.last_end - self.first_start) / 1000
+        return self.count / window if window > 0 else float(self.count)
+
+    def summary(self) -> Dict[str, float]:
+        result = {
+            "samples": self.count,
+            "mean": round(self.latency.mean, 2),
+            "min": self.latency.min if self.count else 0,
+            "max": self.latency.max if self.count else 0,
+        }
+        for pct in PERCENTILES:
+            result[f"p{pct}"] = round(self.latency.percentile(pct), 2)
+        result["throughput"] = round(self.throughput, 2)
+        result["error_rate"] = round(self.error_rate, 2)
+        return result
+
+
+def _iter_csv(path: pathlib.Path) -> Iterator[Sample]:
+    with path.open(newline="", encoding="utf-8-sig") as handle:
+        reader = csv.reader(handle)
+        first = next(reader, None)
+        if first is None:
+            return
+        if first and first[0].strip().isdigit():
+            columns, pending = DEFAULT_COLUMNS, [first]
+        else:
+            columns, pending = [c.strip() for c in first], []
+        try:
+            ts_i, elapsed_i, label_i, success_i = (
+                columns.index("timeStamp"), columns.index("elapsed"),
+                columns.index("label"), columns.index("success"),
+            )
+        except ValueError as e:
+            raise ValueError(f"{path}: missing JMeter column ({e})") from None
+        width = max(ts_i, elapsed_i, label_i, success_i)
+        for row in pending or ():
+            yield row[label_i], int(row[ts_i]), float(row[elapsed_i]), row[success_i].strip().lower() == "true"
+        for row in reader:
+            if len(row) <= width:
+                continue  # truncated line (e.g. test still running)
+            try:
+                yield row[label_i], int(row[ts_i]), float(row[elapsed_i]), row[success_i].strip().lower() == "true"
+            except ValueError:
+                continue
+
+
+def _iter_xml(path: pathlib.Path) -> Iterator[Sample]:
+    depth = 0
+    for event, element in ET.iterparse(str(path), events=("start", "end")):
+        if element.tag not in ("httpSample", "sample"):
+            continue
+        # Sub-samples (redirects, embedded resources) are counted in their parent
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            yield (
+                element.get("lb", ""), int(element.get("ts", 0)),
+                float(element.get("t", 0)), element.get("s", "true").lower() == "true",
+            )
+            element.clear()
+
+
+def iter_samples(path: pathlib.Path) -> Iterator[Sample]:
+    with path.open("rb") as handle:
+        head = handle.read(256).lstrip()
+    if head.startswith(b"<?xml") or head.startswith(b"<testResults"):
+        return _iter_xml(path)
+    return _iter_csv(path)
+
+
+def analyze(path: pathlib.Path) -> Dict[str, LabelStats]:
+    """Per-label stats for one results file, plus a TOTAL entry"""
+    stats: Dict[str, LabelStats] = {}
+    total = LabelStats()
+    for label, start, elapsed, success in iter_samples(path):
+        stats.setdefault(label, LabelStats()).record(start, elapsed, success)
+        total.record(start, elapsed, success)
+    stats[TOTAL] = total
+    return stats
+
+
+def config_name(path: pathlib.Path) -> str:
+    name = path.stem
+    return name[len("results-"):] if name.startswith("results-") else name
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.2f}" if isinstance(value, float) and not value.is_integer() else f"{value:g}"
+
+
+def report_markdown(results: Dict[str, Dict[str, LabelStats]]) -> str:
+    lines = [
+        "| Configuration | Label | Samples | Mean (ms) | p50 (ms) | p90 (ms) | p99 (ms) | Max (ms) | Throughput (req/s) | Error Rate |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for name, stats in results.items():
+        for label in sorted(stats, key=lambda l: (l == TOTAL, l)):
+            s = stats[label].summary()
+            lines.append(
+                f"| {name} | {'**TOTAL**' if label == TOTAL else label} | {s['samples']} | {_fmt(s['mean'])} | "
+                f"{_fmt(s['p50'])} | {_fmt(s['p90'])} | {_fmt(s['p99'])} | {_fmt(s['max'])} | "
+                f"{_fmt(s['throughput'])} | {s['error_rate']:.2f}% |"
+            )
+    return "\n".join(lines)
+
+
+def _change(base: float, candidate: float) -> Optional[float]:
+    """Relative change in percent (None when the baseline is zero)"""
+    if base == 0:
+        return None if candidate == 0 else math.inf
+    return 100.0 * (candidate - base) / base
+
+
+def compare(
+    baseline: Dict[str, LabelStats],
+    candidate: Dict[str, LabelStats],
+    metrics: List[str],
+    max_regression: float,
+    max_error_increase: float,
+    min_samples: int,
+) -> Tuple[List[Dict], List[str]]:
+    """Rows of the diff and the list of threshold violations"""
+    rows, violations = [], []
+    labels = sorted(set(baseline) & set(candidate), key=lambda l: (l == TOTAL, l))
+    for label in labels:
+        base, cand = baseline[label].summary(), candidate[label].summary()
+        row = {"label": label, "samples": (base["samples"], cand["samples"])}
+        enough = min(base["samples"], cand["samples"]) >= min_samples
+        for metric in metrics + ["throughput"]:
+            delta = _change(base[metric], cand[metric])
+            row[metric] = (base[metric], cand[metric], delta)
+            if metric in metrics and enough and delta is not None and delta > max_regression:
+                violations.append(
+                    f"{label}: {metric} {_fmt(base[metric])} -> {_fmt(cand[metric])} ms "
+                    f"(+{delta:.1f}% > {max_regression:g}%)"
+                )
+        error_delta = cand["error_rate"] - base["error_rate"]
+        row["error_rate"] = (base["error_rate"], cand["error_rate"], error_delta)
+        if enough and error_delta > max_error_increase:
+            violations.append(
+                f"{label}: error rate {base['error_rate']:.2f}% -> {cand['error_rate']:.2f}% "
+                f"(+{error_delta:.2f} pp > {max_error_increase:g} pp)"
+            )
+        rows.append(row)
+    for label in sorted(set(baseline) - set(candidate)):
+        print(f"note: label '{label}' only in baseline", file=sys.stderr)
+    for label in sorted(set(candidate) - set(baseline)):
+        print(f"note: label '{label}' only in candidate", file=sys.stderr)
+    return rows, violations
+
+
+def compare_json(rows: List[Dict], violations: List[str]) -> str:
+    """JSON diff; a change from a zero baseline is "new", as in the Markdown table (JSON has no Infinity)"""
+    def change(delta: Optional[float]):
+        return "new" if delta is not None and math.isinf(delta) else delta
+
+    rows = [{key: (value[0], value[1], change(value[2])) if key not in ("label", "samples") else value
+             for key, value in row.items()} for row in rows]
+    return json.dumps({"rows": rows, "violations": violations}, indent=2, allow_nan=False)
+
+
+def compare_markdown(rows: List[Dict], metrics: List[str], base_name: str, cand_name: str) -> str:
+    header = "| Label | " + " | ".join(f"{m} (ms)" for m in metrics) + " | Throughput (req/s) | Error Rate |"
+    lines = [f"Baseline **{base_name}** vs candidate **{cand_name}**", "", header,
+             "|---|" + "---|" * (len(metrics) + 2)]
+    for row in rows:
+        cells = []
+        for metric in metrics + ["throughput"]:
+            base, cand, delta = row[metric]
+            change = "n/a" if delta is None else ("new" if math.isinf(delta) else f"{delta:+.1f}%")
+            cells.append(f"{_fmt(base)} → {_fmt(cand)} ({change})")
+        base, cand, delta = row["error_rate"]
+        cells.append(f"{base:.2f}% → {cand:.2f}% ({delta:+.2f} pp)")
+        label = "**TOTAL**" if row["label"] == TOTAL else row["label"]
+        lines.append(f"| {label} | " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Analyze and compare JMeter results (JTL/CSV)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="per-label percentiles, throughput and error rate")
+    report.add_argument("files", nargs="+", type=pathlib.Path)
+    report.add_argument("--json", action="store_true", help="print JSON instead of a Markdown table")
+
+    diff = commands.add_parser("compare", help="diff a candidate run against a baseline run")
+    diff.add_argument("baseline", type=pathlib.Path)
+    diff.add_argument("candidate", type=pathlib.Path)
+    diff.add_argument("--metrics", default="p50,p90,p99",
+                      help="latency metrics to gate on (comma-separated: mean,p50,p90,p99,max)")
+    diff.add_argument("--max-regression", type=float, default=10.0,
+                      help="allowed slowdown per metric, in percent (default 10)")
+    diff.add_argument("--max-error-rate-increase", type=float, default=1.0,
+                      help="allowed error-rate increase, in percentage points (default 1)")
+    diff.add_argument("--min-samples", type=int, default=20,
+                      help="labels with fewer samples in either run are reported but not gated")
+    diff.add_argument("--json", action="store_true", help="print JSON instead of a Markdown table")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "report":
+            results = {config_name(path): analyze(path) for path in args.files}
+            if args.json:
+                print(json.dumps({
+                    name: {label: s.summary() for label, s in stats.items()} for name, stats in results.items()
+                }, indent=2))
+            else:
+                print(report_markdown(results))
+            return 0
+
+        metrics = [m.strip() for m in args.metrics.split(",") if m.strip()]
+        unknown = [m for m in metrics if m not in ("mean", "max") + tuple(f"p{p}" for p in PERCENTILES)]
+        if unknown:
+            parser.error(f"unknown metric(s): {', '.join(unknown)}")
+        rows, violations = compare(
+            analyze(args.baseline), analyze(args.candidate), metrics,
+            args.max_regression, args.max_error_rate_increase, args.min_samples,
+        )
+    except (OSError, ValueError, ET.ParseError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    if args.json:
+        print(compare_json(rows, violations))
+    else:
+        print(compare_markdown(rows, metrics, config_name(args.baseline), config_name(args.candidate)))
+        print()
+        if violations:
+            print(f"FAIL: {len(violations)} regression(s) over the threshold")
+            for violation in violations:
+                print(f"  - {violation}")
+        else:
+            print("OK: no regression over the threshold")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
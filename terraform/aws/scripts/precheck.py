@@ -2,14 +2,38 @@
 """
 AWS Account Precheck Script
 Detects current AWS account and generates terraform.tfvars with VPC, subnets, and security groups.
+
+Independent AWS CLI calls run concurrently, and the discovered VPC, subnets and
+security group are cached per account and region in a local file
+(PRECHECK_CACHE_TTL seconds, default 3600), so repeat prechecks skip discovery.
+Set AWS_CLI to another executable (e.g. fake_aws/aws) to run offline.
+
+Two backends make the AWS calls: "cli" runs the AWS CLI per call, "sdk"
+makes them in-process through boto3 with one reused session (--backend or
+PRECHECK_BACKEND). The SDK backend can target a local moto server with
+--endpoint-url / AWS_ENDPOINT_URL.
 """
 
+import argparse
 import json
+import os
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
 
+AWS_CLI = os.environ.get('AWS_CLI', 'aws')
+CACHE_FILE = Path(os.environ.get('PRECHECK_CACHE_FILE', Path(__file__).parent / '.precheck-cache.json'))
+CACHE_TTL = int(os.environ.get('PRECHECK_CACHE_TTL', 3600))
+BACKEND = os.environ.get('PRECHECK_BACKEND', 'cli')
+KAFKA_PORTS = [9092, 9094, 9096]
+
+# MSK doesn't support us-east-1e in us-east-1
+UNSUPPORTED_AZS = {'us-east-1e'}
+
 
 class Colors:
     """ANSI color codes for terminal output"""
@@ -25,6 +49,8 @@ class Colors:
 
 def run_aws_command(command: List[str]) -> Optional[Dict]:
     """Run AWS CLI command and return JSON output"""
+    if command and command[0] == 'aws':
+        command = [AWS_CLI] + command[1:]
     try:
         result = subprocess.run(
             command,
@@ -40,12 +66,187 @@ def run_aws_command(command: List[str]) -> Optional[Dict]:
     except json.JSONDecodeError as e:
         print(f"{Colors.FAIL}Error parsing JSON: {e}{Colors.ENDC}")
         return None
+    except FileNotFoundError:
+        print(f"{Colors.FAIL}AWS CLI not found: {AWS_CLI}{Colors.ENDC}")
+        return None
+
+
+class CliBackend:
+    """AWS calls through the AWS CLI - one process per call"""
+    name = 'cli'
+
+    def caller_identity(self) -> Optional[Dict]:
+        return run_aws_command(['aws', 'sts', 'get-caller-identity'])
+
+    def configured_region(self) -> Optional[str]:
+        try:
+            result = subprocess.run(
+                [AWS_CLI, 'configure', 'get', 'region'],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+            return result.stdout.strip() or None
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return None
+
+    def describe_vpcs(self, region: str) -> Optional[Dict]:
+        return run_aws_command(['aws', 'ec2', 'describe-vpcs', '--region', region])
+
+    def describe_subnets(self, region: str) -> Optional[Dict]:
+        return run_aws_command(['aws', 'ec2', 'describe-subnets', '--region', region])
+
+    def describe_security_groups(self, region: str, group_name: str) -> Optional[Dict]:
+        return run_aws_command([
+            'aws', 'ec2', 'describe-security-groups',
+            '--region', region,
+            '--filters', f'Name=group-name,Values={group_name}'
+        ])
+
+    def create_security_group(self, region: str, group_name: str, description: str, vpc_id: str) -> Optional[Dict]:
+        return run_aws_command([
+            'aws', 'ec2', 'create-security-group',
+            '--region', region,
+            '--group-name', group_name,
+            '--description', description,
+            '--vpc-id', vpc_id
+        ])
+
+    def authorize_ingress(self, region: str, group_id: str, ports: List[int]):
+        # One CLI call per port - independent, so run them together
+        with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+            list(pool.map(run_aws_command, [
+                [
+                    'aws', 'ec2', 'authorize-security-group-ingress',
+                    '--region', region,
+                    '--group-id', group_id,
+                    '--protocol', 'tcp',
+                    '--port', str(port),
+                    '--cidr', '0.0.0.0/0'
+                ]
+                for port in ports
+            ]))
+
+
+class SdkBackend:
+    """
+    The same calls in-process through boto3: one session, one client per
+    service and region, paginated describes and a single ingress call for all
+    ports. Returns the same shapes as the CLI's JSON output.
+    """
+    name = 'sdk'
+
+    def __init__(self, endpoint_url: Optional[str] = None):
+        import boto3
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        self.session = boto3.Session()
+        self.endpoint_url = endpoint_url
+        self.errors = (BotoCoreError, ClientError)
+        self._clients: Dict[tuple, object] = {}
+        # Creating clients from one session isn't thread-safe; using them is
+        self._lock = threading.Lock()
+
+    def client(self, service: str, region: Optional[str] = None):
+        key = (service, region)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = self.session.client(
+                    service, region_name=region or self.session.region_name or 'us-east-1',
+                    endpoint_url=self.endpoint_url,
+                )
+            return self._clients[key]
+
+    def _call(self, description: str, call):
+        try:
+            return call()
+        except self.errors as e:
+            print(f"{Colors.FAIL}Error calling AWS: {description}{Colors.ENDC}")
+            print(f"{Colors.FAIL}{e}{Colors.ENDC}")
+            return None
+
+    def _paginate(self, region: str, operation: str, key: str, **kwargs) -> Optional[Dict]:
+        def collect():
+            items = []
+            for page in self.client('ec2', region).get_paginator(operation).paginate(**kwargs):
+                items.extend(page.get(key, []))
+            return {key: items}
+        return self._call(f"ec2 {operation}", collect)
+
+    def caller_identity(self) -> Optional[Dict]:
+        return self._call("sts get-caller-identity", lambda: self.client('sts').get_caller_identity())
+
+    def configured_region(self) -> Optional[str]:
+        # Read from the environment and ~/.aws/config, no process or network call
+        return self.session.region_name
+
+    def describe_vpcs(self, region: str) -> Optional[Dict]:
+        return self._paginate(region, 'describe_vpcs', 'Vpcs')
+
+    def describe_subnets(self, region: str) -> Optional[Dict]:
+        return self._paginate(region, 'describe_subnets', 'Subnets')
+
+    def describe_security_groups(self, region: str, group_name: str) -> Optional[Dict]:
+        return self._paginate(
+            region, 'describe_security_groups', 'SecurityGroups',
+            Filters=[{'Name': 'group-name', 'Values': [group_name]}],
+        )
+
+    def create_security_group(self, region: str, group_name: str, description: str, vpc_id: str) -> Optional[Dict]:
+        return self._call("ec2 create-security-group", lambda: self.client('ec2', region).create_security_group(
+            GroupName=group_name, Description=description, VpcId=vpc_id,
+        ))
+
+    def authorize_ingress(self, region: str, group_id: str, ports: List[int]):
+        # All ports in one request
+        self._call("ec2 authorize-security-group-ingress", lambda: self.client('ec2', region).authorize_security_group_ingress(
+            GroupId=group_id,
+            IpPermissions=[
+                {'IpProtocol': 'tcp', 'FromPort': port, 'ToPort': port, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}
+                for port in ports
+            ],
+        ))
+
+
+def make_backend(name: str, endpoint_url: Optional[str] = None):
+    """CliBackend or SdkBackend; exits if the SDK backend is asked for without boto3"""
+    if name == 'sdk':
+        try:
+            return SdkBackend(endpoint_url)
+        except ImportError:
+            print(f"{Colors.FAIL}--backend sdk needs boto3 (uv run precheck.py installs it, or pip install boto3){Colors.ENDC}")
+            sys.exit(1)
+    return CliBackend()
+
+
+def load_cached_discovery(account_id: str, region: str, ttl: int) -> Optional[Dict]:
+    """Discovery results for this account and region if cached less than ttl seconds ago"""
+    try:
+        entry = json.loads(CACHE_FILE.read_text()).get(f"{account_id}:{region}")
+    except (OSError, ValueError):
+        return None
+    if not entry or time.time() - entry.get('saved_at', 0) > ttl:
+        return None
+    return entry.get('discovery')
+
+
+def save_cached_discovery(account_id: str, region: str, discovery: Dict):
+    """Store discovery results under account:region, keeping other entries"""
+    try:
+        entries = json.loads(CACHE_FILE.read_text())
+    except (OSError, ValueError):
+        entries = {}
+    entries[f"{account_id}:{region}"] = {'saved_at': time.time(), 'discovery': discovery}
+    try:
+        CACHE_FILE.write_text(json.dumps(entries, indent=2))
+    except OSError as e:
+        print(f"{Colors.WARNING}⚠ Could not write cache {CACHE_FILE}: {e}{Colors.ENDC}")
 
 
-def get_current_account_id() -> Optional[str]:
+def get_current_account_id(backend) -> Optional[str]:
     """Get current AWS account ID"""
     print(f"{Colors.OKBLUE}Detecting current AWS account...{Colors.ENDC}")
-    result = run_aws_command(['aws', 'sts', 'get-caller-identity'])
+    result = backend.caller_identity()
     if result:
         account_id = result.get('Account')
         print(f"{Colors.OKGREEN}✓ Current AWS Account ID: {account_id}{Colors.ENDC}")
@@ -53,33 +254,21 @@ def get_current_account_id() -> Optional[str]:
     return None
 
 
-def get_region() -> Optional[str]:
+def get_region(backend) -> Optional[str]:
     """Get current AWS region"""
-    try:
-        result = subprocess.run(
-            ['aws', 'configure', 'get', 'region'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        region = result.stdout.strip()
-        if region:
-            print(f"{Colors.OKGREEN}✓ Region: {region}{Colors.ENDC}")
-            return region
-        
-        # Fallback to default region
-        print(f"{Colors.WARNING}No region configured, using us-east-1{Colors.ENDC}")
-        return "us-east-1"
-    except subprocess.CalledProcessError:
-        print(f"{Colors.WARNING}No region configured, using us-east-1{Colors.ENDC}")
-        return "us-east-1"
-
-
-def get_default_vpc(region: str) -> Optional[Dict]:
-    """Get default VPC or first available VPC"""
-    print(f"{Colors.OKBLUE}Looking for VPC...{Colors.ENDC}")
-    result = run_aws_command(['aws', 'ec2', 'describe-vpcs', '--region', region])
+    # Same precedence as the AWS CLI; skips a CLI start when the region is in the environment
+    region = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or backend.configured_region()
+    if region:
+        print(f"{Colors.OKGREEN}✓ Region: {region}{Colors.ENDC}")
+        return region
     
+    # Fallback to default region
+    print(f"{Colors.WARNING}No region configured, using us-east-1{Colors.ENDC}")
+    return "us-east-1"
+
+
+def select_vpc(result: Optional[Dict], region: str) -> Optional[Dict]:
+    """Default VPC or first available VPC from describe-vpcs output"""
     if not result or not result.get('Vpcs'):
         print(f"{Colors.FAIL}No VPCs found in region {region}{Colors.ENDC}")
         return None
@@ -96,24 +285,17 @@ def get_default_vpc(region: str) -> Optional[Dict]:
     return vpc
 
 
-def get_subnets(vpc_id: str, region: str, min_count: int = 3) -> List[str]:
-    """Get available subnets in the VPC, filtering out unsupported AZs"""
-    # MSK doesn't support us-east-1e in us-east-1
-    UNSUPPORTED_AZS = {'us-east-1e'}
-    
-    print(f"{Colors.OKBLUE}Looking for subnets in VPC {vpc_id}...{Colors.ENDC}")
-    result = run_aws_command([
-        'aws', 'ec2', 'describe-subnets',
-        '--region', region,
-        '--filters', f'Name=vpc-id,Values={vpc_id}'
-    ])
-    
-    if not result or not result.get('Subnets'):
+def select_subnets(result: Optional[Dict], vpc_id: str, min_count: int = 3) -> List[Dict]:
+    """Subnets of the VPC from describe-subnets output, filtering out unsupported AZs"""
+    all_subnets = [
+        subnet for subnet in (result or {}).get('Subnets', [])
+        if subnet.get('VpcId') == vpc_id
+    ]
+    if not all_subnets:
         print(f"{Colors.FAIL}No subnets found in VPC {vpc_id}{Colors.ENDC}")
         return []
     
     # Filter out subnets in unsupported availability zones
-    all_subnets = result['Subnets']
     supported_subnets = [
         subnet for subnet in all_subnets 
         if subnet.get('AvailabilityZone') not in UNSUPPORTED_AZS
@@ -123,47 +305,28 @@ def get_subnets(vpc_id: str, region: str, min_count: int = 3) -> List[str]:
         filtered_count = len(all_subnets) - len(supported_subnets)
         print(f"{Colors.WARNING}⚠ Filtered out {filtered_count} subnet(s) in unsupported AZs (us-east-1e){Colors.ENDC}")
     
-    subnet_ids = [subnet['SubnetId'] for subnet in supported_subnets[:min_count]]
-    
-    if len(subnet_ids) < min_count:
-        print(f"{Colors.WARNING}⚠ Found only {len(subnet_ids)} supported subnet(s), MSK requires at least 2{Colors.ENDC}")
+    return [
+        {'SubnetId': subnet['SubnetId'], 'AvailabilityZone': subnet.get('AvailabilityZone', 'unknown')}
+        for subnet in supported_subnets[:min_count]
+    ]
+
+
+def report_subnets(subnets: List[Dict], min_count: int = 3):
+    if len(subnets) < min_count:
+        print(f"{Colors.WARNING}⚠ Found only {len(subnets)} supported subnet(s), MSK requires at least 2{Colors.ENDC}")
     else:
-        print(f"{Colors.OKGREEN}✓ Found {len(subnet_ids)} supported subnets{Colors.ENDC}")
-    
-    for i, subnet in enumerate(supported_subnets[:min_count]):
-        az = subnet.get('AvailabilityZone', 'unknown')
-        print(f"  - {subnet['SubnetId']} ({az})")
+        print(f"{Colors.OKGREEN}✓ Found {len(subnets)} supported subnets{Colors.ENDC}")
     
-    return subnet_ids
+    for subnet in subnets:
+        print(f"  - {subnet['SubnetId']} ({subnet['AvailabilityZone']})")
 
 
-def get_or_create_security_group(vpc_id: str, region: str, project: str, environment: str) -> Optional[str]:
-    """Get existing MSK security group or create a new one"""
-    sg_name = f"{project}-{environment}-msk-sg"
-    
-    print(f"{Colors.OKBLUE}Looking for security group '{sg_name}'...{Colors.ENDC}")
-    
-    # Check if security group exists
-    result = run_aws_command([
-        'aws', 'ec2', 'describe-security-groups',
-        '--region', region,
-        '--filters', f'Name=vpc-id,Values={vpc_id}', f'Name=group-name,Values={sg_name}'
-    ])
-    
-    if result and result.get('SecurityGroups'):
-        sg_id = result['SecurityGroups'][0]['GroupId']
-        print(f"{Colors.OKGREEN}✓ Found existing security group: {sg_id}{Colors.ENDC}")
-        return sg_id
-    
-    # Create new security group
+def create_security_group(backend, vpc_id: str, region: str, sg_name: str, project: str, environment: str) -> Optional[str]:
+    """Create the MSK security group with ingress rules for the Kafka ports"""
     print(f"{Colors.OKBLUE}Creating new security group '{sg_name}'...{Colors.ENDC}")
-    result = run_aws_command([
-        'aws', 'ec2', 'create-security-group',
-        '--region', region,
-        '--group-name', sg_name,
-        '--description', f'Security group for {project} {environment} MSK cluster',
-        '--vpc-id', vpc_id
-    ])
+    result = backend.create_security_group(
+        region, sg_name, f'Security group for {project} {environment} MSK cluster', vpc_id
+    )
     
     if not result:
         return None
@@ -173,20 +336,45 @@ def get_or_create_security_group(vpc_id: str, region: str, project: str, environ
     
     # Add ingress rules for Kafka (9092, 9094, 9096)
     print(f"{Colors.OKBLUE}Adding ingress rules for Kafka ports...{Colors.ENDC}")
-    for port in [9092, 9094, 9096]:
-        run_aws_command([
-            'aws', 'ec2', 'authorize-security-group-ingress',
-            '--region', region,
-            '--group-id', sg_id,
-            '--protocol', 'tcp',
-            '--port', str(port),
-            '--cidr', '0.0.0.0/0'
-        ])
+    backend.authorize_ingress(region, sg_id, KAFKA_PORTS)
     
     print(f"{Colors.OKGREEN}✓ Security group configured{Colors.ENDC}")
     return sg_id
 
 
+def discover_network(backend, region: str, project: str, environment: str) -> Optional[Dict]:
+    """
+    Find the VPC, its subnets and the MSK security group (creating it if needed).
+    The three describe calls don't depend on each other, so they run concurrently;
+    subnets and security groups are matched to the chosen VPC afterwards.
+    """
+    sg_name = f"{project}-{environment}-msk-sg"
+    print(f"{Colors.OKBLUE}Looking for VPC, subnets and security group '{sg_name}'...{Colors.ENDC}")
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        vpcs = pool.submit(backend.describe_vpcs, region)
+        subnets = pool.submit(backend.describe_subnets, region)
+        groups = pool.submit(backend.describe_security_groups, region, sg_name)
+    
+    vpc = select_vpc(vpcs.result(), region)
+    if not vpc:
+        return None
+    vpc_id = vpc['VpcId']
+    
+    subnet_list = select_subnets(subnets.result(), vpc_id)
+    
+    existing = [
+        group for group in (groups.result() or {}).get('SecurityGroups', [])
+        if group.get('VpcId') == vpc_id
+    ]
+    if existing:
+        sg_id = existing[0]['GroupId']
+        print(f"{Colors.OKGREEN}✓ Found existing security group: {sg_id}{Colors.ENDC}")
+    else:
+        sg_id = create_security_group(backend, vpc_id, region, sg_name, project, environment)
+    
+    return {'vpc_id': vpc_id, 'subnets': subnet_list, 'security_group_id': sg_id}
+
+
 def get_previous_account_id(tf_dir: Path) -> Optional[str]:
     """Extract account ID from existing terraform.tfvars if it exists"""
     tfvars_path = tf_dir / 'terraform.tfvars'
@@ -209,11 +397,8 @@ def get_previous_account_id(tf_dir: Path) -> Optional[str]:
     return None
 
 
-def clean_terraform_state(current_account_id: str):
+def clean_terraform_state(current_account_id: str, tf_dir: Path):
     """Remove old Terraform state files only if account changed"""
-    script_dir = Path(__file__).parent
-    tf_dir = script_dir.parent
-    
     previous_account = get_previous_account_id(tf_dir)
     
     # If same account and state exists, skip cleanup
@@ -302,51 +487,80 @@ log_retention_in_days = 7
     return tfvars_content
 
 
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AWS account precheck and terraform.tfvars generator")
+    parser.add_argument('--refresh', action='store_true', help='ignore cached discovery results')
+    parser.add_argument('--cache-ttl', type=int, default=CACHE_TTL, help='seconds cached discovery stays valid')
+    parser.add_argument('--tf-dir', type=Path, default=Path(__file__).parent.parent,
+                        help='directory to write terraform.tfvars to')
+    parser.add_argument('--backend', choices=['cli', 'sdk'], default=BACKEND,
+                        help='run the AWS CLI per call (cli) or use boto3 in-process (sdk)')
+    parser.add_argument('--endpoint-url', default=os.environ.get('AWS_ENDPOINT_URL'),
+                        help='AWS endpoint for the sdk backend, e.g. a local moto server')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
     """Main execution function"""
+    args = parse_args(argv)
+    tf_dir = args.tf_dir
+    backend = make_backend(args.backend, args.endpoint_url)
+    started = time.perf_counter()
+    
     print(f"{Colors.HEADER}{Colors.BOLD}")
     print("=" * 60)
     print("AWS Account Precheck & Terraform Configuration Generator")
     print("=" * 60)
     print(f"{Colors.ENDC}")
     
-    # Get current AWS account
-    account_id = get_current_account_id()
+    # Account and region don't depend on each other
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        account_future = pool.submit(get_current_account_id, backend)
+        region_future = pool.submit(get_region, backend)
+    account_id = account_future.result()
+    region = region_future.result()
+    
     if not account_id:
         print(f"{Colors.FAIL}Failed to detect AWS account. Please check your AWS credentials.{Colors.ENDC}")
         sys.exit(1)
     
-    # Get region
-    region = get_region()
     if not region:
         print(f"{Colors.FAIL}Failed to detect AWS region.{Colors.ENDC}")
         sys.exit(1)
     
     # Clean old Terraform state (only if account changed)
-    clean_terraform_state(account_id)
+    clean_terraform_state(account_id, tf_dir)
     
-    # Get VPC
-    vpc = get_default_vpc(region)
-    if not vpc:
-        print(f"{Colors.FAIL}Failed to find VPC.{Colors.ENDC}")
-        sys.exit(1)
+    project = "kayak"
+    environment = "dev"
     
-    vpc_id = vpc['VpcId']
+    # VPC, subnets and security group - from the cache if discovered recently
+    discovery = None if args.refresh else load_cached_discovery(account_id, region, args.cache_ttl)
+    if discovery:
+        print(f"{Colors.OKGREEN}✓ Using cached discovery for {account_id}/{region} (--refresh to rediscover){Colors.ENDC}")
+    else:
+        discovery = discover_network(backend, region, project, environment)
+        if not discovery:
+            print(f"{Colors.FAIL}Failed to find VPC.{Colors.ENDC}")
+            sys.exit(1)
+    
+    vpc_id = discovery['vpc_id']
+    subnets = discovery['subnets']
+    sg_id = discovery['security_group_id']
     
-    # Get subnets
-    subnet_ids = get_subnets(vpc_id, region)
+    report_subnets(subnets)
+    subnet_ids = [subnet['SubnetId'] for subnet in subnets]
     if len(subnet_ids) < 2:
         print(f"{Colors.FAIL}MSK requires at least 2 subnets. Found {len(subnet_ids)}.{Colors.ENDC}")
         sys.exit(1)
     
-    # Get or create security group
-    project = "kayak"
-    environment = "dev"
-    sg_id = get_or_create_security_group(vpc_id, region, project, environment)
     if not sg_id:
         print(f"{Colors.FAIL}Failed to get/create security group.{Colors.ENDC}")
         sys.exit(1)
     
+    # Only complete results are cached, so a failed run is retried in full next time
+    save_cached_discovery(account_id, region, discovery)
+    
     # Generate terraform.tfvars
     print(f"\n{Colors.OKBLUE}Generating terraform.tfvars...{Colors.ENDC}")
     tfvars_content = generate_tfvars(
@@ -359,8 +573,6 @@ def main():
     )
     
     # Write to file
-    script_dir = Path(__file__).parent
-    tf_dir = script_dir.parent
     tfvars_path = tf_dir / 'terraform.tfvars'
     
     # Backup existing tfvars if it exists
@@ -382,6 +594,7 @@ def main():
     print(f"{Colors.OKGREEN}VPC: {vpc_id}{Colors.ENDC}")
     print(f"{Colors.OKGREEN}Subnets: {len(subnet_ids)}{Colors.ENDC}")
     print(f"{Colors.OKGREEN}Security Group: {sg_id}{Colors.ENDC}")
+    print(f"{Colors.OKGREEN}Precheck took {time.perf_counter() - started:.2f}s ({backend.name} backend){Colors.ENDC}")
     print(f"\n{Colors.OKCYAN}Ready to run: make init && make plan{Colors.ENDC}\n")
 
 